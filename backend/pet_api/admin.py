@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Pet, Interaction
+from .models import Pet, Interaction, ArchivedPet, PetEvent, TickRun
 
 @admin.register(Pet)
 class PetAdmin(admin.ModelAdmin):
@@ -11,4 +11,20 @@ class PetAdmin(admin.ModelAdmin):
 class InteractionAdmin(admin.ModelAdmin):
     list_display = ('pet', 'action', 'timestamp')
     list_filter = ('action',)
-    search_fields = ('pet__name',)
\ No newline at end of file
+    search_fields = ('pet__name',)
+
+@admin.register(ArchivedPet)
+class ArchivedPetAdmin(admin.ModelAdmin):
+    list_display = ('name', 'pet_type', 'owner', 'stage', 'deceased_at', 'archived_at')
+    list_filter = ('pet_type', 'stage')
+    search_fields = ('name', 'owner__username')
+
+@admin.register(PetEvent)
+class PetEventAdmin(admin.ModelAdmin):
+    list_display = ('pet', 'kind', 'created_at')
+    list_filter = ('kind',)
+    search_fields = ('pet__name',)
+
+@admin.register(TickRun)
+class TickRunAdmin(admin.ModelAdmin):
+    list_display = ('generation', 'started_at', 'finished_at', 'last_pet_id', 'ticked', 'failed')
@@ -0,0 +1,75 @@
+# pet_api/alerts.py
+"""
+Exact-time critical stat alerts.
+
+Rather than waiting for the next 5-minute tick, we work out when the first stat
+will cross CRITICAL_STAT_THRESHOLD (``Pet.critical_stat_etas``) and queue a single
+delayed ``send_critical_alert`` task for that moment. The pending task's id is
+kept in Redis; rescheduling just replaces it, and a task whose id no longer
+matches quietly does nothing, which is how outdated alerts get cancelled.
+"""
+import math
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+
+from .redis_client import get_redis
+
+ALERT_KEY = 'pet_api:critical_alert:{pet_id}'
+
+
+def is_enabled():
+    return getattr(settings, 'PET_EXACT_CRITICAL_ALERTS', False)
+
+
+def next_alert_time(pet, after=None):
+    """Earliest moment after ``after`` at which one of the pet's stats goes critical"""
+    after = after or timezone.now()
+    etas = [eta for eta in pet.critical_stat_etas().values() if eta > after]
+    return min(etas) if etas else None
+
+
+def schedule_critical_alert(pet, after=None):
+    """(Re)schedule the pet's next critical alert after its trajectory changed"""
+    if not is_enabled():
+        return
+
+    from .tasks import send_critical_alert
+
+    try:
+        key = ALERT_KEY.format(pet_id=pet.id)
+        redis = get_redis()
+        eta = next_alert_time(pet, after) if pet.status != 'deceased' else None
+        if eta is None:
+            redis.delete(key)
+            return
+
+        # Round up so the alert never fires a hair before the stat has crossed
+        eta_ts = math.ceil(eta.timestamp())
+        current = redis.hgetall(key)
+        if current and int(current['eta']) == eta_ts:
+            return  # Already scheduled for that moment
+
+        # Long delays are split up so the broker never holds a task for hours
+        run_at = min(eta_ts, timezone.now().timestamp() + settings.PET_CRITICAL_ALERT_MAX_DELAY.total_seconds())
+        result = send_critical_alert.apply_async(
+            args=[pet.id],
+            eta=datetime.fromtimestamp(run_at, tz=dt_timezone.utc),
+        )
+        redis.hset(key, mapping={'task_id': result.id, 'eta': eta_ts})
+    except Exception as e:
+        # Alerts are best-effort; the regular tick still sends warnings
+        print(f"Could not schedule critical alert for pet {pet.id}: {str(e)}")
+
+
+def get_scheduled_alert(pet_id):
+    """Return (task_id, eta timestamp) for the pet's pending alert, or (None, None)"""
+    current = get_redis().hgetall(ALERT_KEY.format(pet_id=pet_id))
+    if not current:
+        return None, None
+    return current['task_id'], int(current['eta'])
+
+
+def clear_critical_alert(pet_id):
+    get_redis().delete(ALERT_KEY.format(pet_id=pet_id))
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class PetApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'pet_api'
+
+    def ready(self):
+        # Register signal handlers
+        from . import signals  # noqa: F401
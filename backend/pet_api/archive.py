@@ -0,0 +1,76 @@
+# pet_api/archive.py
+"""
+Moves long-deceased pets out of the hot Pet and Interaction tables.
+
+A pet that has been deceased for longer than PET_ARCHIVE_AFTER is copied to
+ArchivedPet, with its interaction history packed into a JSON list on the same
+row, and then deleted together with its Interaction rows. Archived pets stay
+readable through the read-only ``api/archived-pets/`` endpoint.
+"""
+from celery.utils.log import get_task_logger
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ArchivedPet, Interaction, Pet
+
+logger = get_task_logger(__name__)
+
+FINAL_STAT_FIELDS = ['hunger', 'happiness', 'hygiene', 'sleep', 'health']
+
+
+def archivable_pets(now=None, older_than=None):
+    """Deceased pets old enough to be archived"""
+    now = now or timezone.now()
+    if older_than is None:
+        older_than = settings.PET_ARCHIVE_AFTER
+    return Pet.objects.filter(status='deceased', deceased_at__lte=now - older_than)
+
+
+def _archive_batch(pets):
+    history = {}
+    rows = Interaction.objects.filter(pet__in=pets).order_by('pet_id', 'timestamp', 'id')
+    for pet_id, action, timestamp in rows.values_list('pet_id', 'action', 'timestamp'):
+        history.setdefault(pet_id, []).append([action, int(timestamp.timestamp())])
+
+    ArchivedPet.objects.bulk_create([
+        ArchivedPet(
+            id=pet.id,
+            owner_id=pet.owner_id,
+            name=pet.name,
+            pet_type=pet.pet_type,
+            stage=pet.stage,
+            experience=pet.experience,
+            created_at=pet.created_at,
+            deceased_at=pet.deceased_at,
+            final_stats={field: getattr(pet, field) for field in FINAL_STAT_FIELDS},
+            interactions=history.get(pet.id, []),
+            interaction_count=len(history.get(pet.id, [])),
+        )
+        for pet in pets
+    ])
+    # Interactions go with their pet (on_delete=CASCADE)
+    Pet.objects.filter(id__in=[pet.id for pet in pets]).delete()
+
+
+def archive_deceased_pets(older_than=None, batch_size=None):
+    """Archive every pet returned by archivable_pets(), one transaction per batch"""
+    batch_size = batch_size or settings.PET_ARCHIVE_BATCH_SIZE
+    now = timezone.now()
+    archived = 0
+    while True:
+        try:
+            with transaction.atomic():
+                # Concurrent archivers skip each other's batches
+                pets = list(
+                    archivable_pets(now, older_than).select_for_update(skip_locked=True).order_by('id')[:batch_size]
+                )
+                if not pets:
+                    break
+                _archive_batch(pets)
+        except Exception:
+            logger.exception("Archiving stopped after %s pets", archived)
+            raise
+        archived += len(pets)
+        logger.info("Archived %s deceased pets so far", archived)
+    return archived
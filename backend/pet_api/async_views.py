@@ -0,0 +1,217 @@
+# pet_api/async_views.py
+"""
+Async-native versions of the hot pet endpoints, served under ``api/async/``.
+
+Under ASGI the DRF viewset runs every request in the thread pool and blocks on
+channel-layer sends. These plain Django async views use the async ORM and
+await WebSocket notifications directly, so one ASGI worker can serve many
+concurrent requests. Responses are identical to the PetViewSet ones.
+Token authentication only (``Authorization: Token <key>``).
+"""
+import functools
+import json
+import math
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework.authtoken.models import Token
+
+from . import idempotency, metrics, pet_cache, scheduler, throttling
+from .alerts import schedule_critical_alert
+from .models import Pet, Interaction, InteractionRejected, anotify_critical_stats
+from .renderers import ORJSONRenderer
+from .serializers import PetSerializer, PET_ROW_FIELDS, acheck_pets_stats, pet_row_to_dict
+
+
+def render(data, status=200):
+    """Render with the PetViewSet renderer so both API paths return the same bytes"""
+    return HttpResponse(ORJSONRenderer().render(data), status=status, content_type='application/json')
+
+
+async def get_token_user(request):
+    """Return (user, error detail) for the request's auth token"""
+    auth = request.headers.get('Authorization', '').split()
+    if len(auth) != 2 or auth[0].lower() != 'token':
+        return None, "Authentication credentials were not provided."
+    try:
+        token = await Token.objects.select_related('user').aget(key=auth[1])
+    except Token.DoesNotExist:
+        return None, "Invalid token."
+    if not token.user.is_active:
+        return None, "User inactive or deleted."
+    return token.user, None
+
+
+def token_required(view):
+    """Reject requests without a valid token, otherwise pass the user to the view"""
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user, error = await get_token_user(request)
+        if user is None:
+            response = render({"detail": error}, status=401)
+            response['WWW-Authenticate'] = 'Token'
+            return response
+        return await view(request, user, *args, **kwargs)
+    return wrapper
+
+
+def idempotent(view):
+    """Async version of idempotency.idempotent for the views below"""
+    @functools.wraps(view)
+    async def wrapper(request, user, *args, **kwargs):
+        header = request.headers.get(idempotency.HEADER)
+        if not header:
+            return await view(request, user, *args, **kwargs)
+        if len(header) > idempotency.MAX_KEY_LENGTH:
+            return render({"detail": idempotency.KEY_TOO_LONG}, status=400)
+
+        key = idempotency.cache_key(user.pk, view.__name__, kwargs.get('pk'), header)
+        try:
+            request_fingerprint = idempotency.fingerprint(get_request_data(request))
+        except ValueError:
+            # The view rejects the body; fall back to the raw bytes
+            request_fingerprint = idempotency.fingerprint(request.body.decode('utf8', 'replace'))
+
+        stored = await cache.aget(key)
+        if stored is None:
+            if await sync_to_async(idempotency.claim)(key):
+                # See idempotency.idempotent: the first request may have just finished
+                stored = await cache.aget(key)
+                if stored is not None:
+                    await sync_to_async(idempotency.release)(key)
+            else:
+                stored = await idempotency.await_result(key)
+                if stored is None:
+                    return render({"detail": idempotency.STILL_RUNNING}, status=409)
+        if stored is not None:
+            data, status = idempotency.check_stored(stored, request_fingerprint)
+            response = render(data, status=status)
+            response[idempotency.REPLAYED_HEADER] = 'true'
+            return response
+
+        try:
+            response = await view(request, user, *args, **kwargs)
+            await sync_to_async(idempotency.store)(
+                key, request_fingerprint, json.loads(response.content), response.status_code
+            )
+        finally:
+            await sync_to_async(idempotency.release)(key)
+        return response
+    return wrapper
+
+
+async def throttle(user, action, cost):
+    """A 429 response if the user's bucket for the action can't cover the cost, else None"""
+    if not throttling.is_enabled():
+        return None
+    wait = await throttling.atake(user.pk, action, cost)
+    if not wait:
+        return None
+    metrics.incr(f'throttle.{action}.rejected')
+    wait = math.ceil(wait)
+    unit = 'second' if wait == 1 else 'seconds'
+    response = render({"detail": f"Request was throttled. Expected available in {wait} {unit}."}, status=429)
+    response['Retry-After'] = str(wait)
+    return response
+
+
+def get_request_data(request):
+    if request.content_type == 'application/json':
+        return json.loads(request.body or b'{}')
+    return request.POST
+
+
+async def get_pet(user, pk):
+    try:
+        return await Pet.objects.select_related('owner').aget(pk=pk, owner=user)
+    except Pet.DoesNotExist:
+        return None
+
+
+@require_GET
+@token_required
+async def pet_list(request, user):
+    async def load():
+        rows = Pet.objects.filter(owner=user).values_list(*PET_ROW_FIELDS)
+        return [pet_row_to_dict(row) async for row in rows]
+
+    return render(await pet_cache.aget_list(user.pk, load))
+
+
+@require_GET
+@token_required
+async def pet_detail(request, user, pk):
+    async def load():
+        row = await Pet.objects.filter(owner=user, pk=pk).values_list(*PET_ROW_FIELDS).afirst()
+        return pet_row_to_dict(row) if row else None
+
+    pet = await pet_cache.aget_detail(user.pk, pk, load)
+    if pet is None:
+        return render({"detail": "No Pet matches the given query."}, status=404)
+    return render(pet)
+
+
+@csrf_exempt
+@require_POST
+@token_required
+@idempotent
+async def interact(request, user, pk):
+    throttled = await throttle(user, 'interact', 1)
+    if throttled:
+        return throttled
+
+    pet = await get_pet(user, pk)
+    if pet is None:
+        return render({"detail": "No Pet matches the given query."}, status=404)
+
+    try:
+        action = get_request_data(request).get('action')
+    except ValueError:
+        return render({"detail": "JSON parse error."}, status=400)
+
+    # Notifications are collected and awaited at the end instead of blocking
+    pet.collect_updates()
+
+    ticks = scheduler.is_enabled() and pet.catch_up()
+    if ticks:
+        await pet.asave(event='tick', event_data={'ticks': ticks})
+
+    try:
+        woke_up = pet.apply_action(action)
+    except InteractionRejected as e:
+        await pet.aflush_updates()
+        return render({"detail": e.detail}, status=e.status)
+
+    if not woke_up:
+        await Interaction.objects.acreate(pet=pet, action=action)
+        pet.last_interaction = timezone.now()
+        pet._check_critical_stats()
+        pet._check_evolution()
+
+    event_data = {'action': action, 'woke_up': True} if woke_up else {'action': action}
+    await pet.asave(event='interaction', event_data=event_data)
+    await pet.aflush_updates()
+    await sync_to_async(schedule_critical_alert)(pet)
+    return render(PetSerializer(pet).data)
+
+
+@csrf_exempt
+@require_POST
+@token_required
+async def check_stats(request, user):
+    if throttling.is_enabled():
+        living_pets = await Pet.objects.filter(owner=user).exclude(status='deceased').acount()
+        throttled = await throttle(user, 'check_stats', throttling.check_stats_cost(living_pets))
+        if throttled:
+            return throttled
+
+    pets, warnings_by_pet = await acheck_pets_stats(Pet.objects.filter(owner=user))
+    await anotify_critical_stats(user.id, warnings_by_pet)
+    return render({
+        'pets': pets,
+        'stats_checked': len(warnings_by_pet)
+    })
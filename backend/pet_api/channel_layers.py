@@ -0,0 +1,73 @@
+# pet_api/channel_layers.py
+"""
+Redis channel layer sharded with a consistent-hash ring.
+
+channels_redis already spreads groups and process channels over several
+``hosts``, but picks the host with CRC32 modulo the number of hosts: adding or
+removing one host moves almost every group, and groups that move lose their
+members until clients reconnect. ShardedRedisChannelLayer places each shard at
+``vnodes`` points on a hash ring instead, so adding or removing a shard only
+moves the groups on the arcs it gains or loses (about 1/N of them).
+
+Shards are identified on the ring by name (``shard_names``, defaulting to the
+host address). Giving shards explicit names lets a shard move to a new address
+without moving any group.
+"""
+import bisect
+import hashlib
+
+from channels_redis.core import RedisChannelLayer
+
+DEFAULT_VNODES = 160
+
+
+def ring_hash(value):
+    if isinstance(value, str):
+        value = value.encode('utf8')
+    return int.from_bytes(hashlib.blake2b(value, digest_size=8).digest(), 'big')
+
+
+def host_name(host):
+    """Default ring name for a decoded channels_redis host entry"""
+    if 'address' in host:
+        return str(host['address'])
+    return f"{host.get('host', 'localhost')}:{host.get('port', 6379)}/{host.get('db', 0)}"
+
+
+class HashRing:
+    """Maps keys to shard indexes; each shard owns ``vnodes`` points on the ring"""
+
+    def __init__(self, names, vnodes=DEFAULT_VNODES):
+        if len(set(names)) != len(names):
+            raise ValueError("Shard names must be unique")
+        points = sorted(
+            (ring_hash(f'{name}#{vnode}'), index)
+            for index, name in enumerate(names)
+            for vnode in range(vnodes)
+        )
+        self._points = [point for point, _ in points]
+        self._shards = [index for _, index in points]
+
+    def shard(self, key):
+        position = bisect.bisect(self._points, ring_hash(key))
+        return self._shards[position % len(self._points)]
+
+
+class ShardedRedisChannelLayer(RedisChannelLayer):
+    """RedisChannelLayer that places groups and process channels on a HashRing"""
+
+    def __init__(self, hosts=None, shard_names=None, vnodes=DEFAULT_VNODES, **kwargs):
+        super().__init__(hosts=hosts, **kwargs)
+        names = shard_names or [host_name(host) for host in self.hosts]
+        if len(names) != self.ring_size:
+            raise ValueError(f"Got {len(names)} shard names for {self.ring_size} hosts")
+        self.shard_names = list(names)
+        self.ring = HashRing(self.shard_names, vnodes)
+
+    def consistent_hash(self, value):
+        if self.ring_size == 1:
+            return 0
+        return self.ring.shard(value)
+
+    def __str__(self):
+        return f"{self.__class__.__name__}(shards={self.shard_names})"
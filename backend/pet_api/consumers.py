@@ -1,22 +1,33 @@
 # pet_api/consumers.py
+import asyncio
 import json
+from collections import OrderedDict
+from django.conf import settings
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth.models import AnonymousUser
 
+from . import metrics, presence, wire
+from .models import Pet
+from .notifications import owner_group, pet_group
+
 class PetConsumer(AsyncWebsocketConsumer):
 
     async def connect(self):
         self.user = self.scope["user"]
         print(f"WebSocket connection attempt by user: {self.user}, authenticated: {self.user.is_authenticated}, id: {getattr(self.user, 'id', 'None')}")
         
+        # Pets this connection subscribed to; while empty it gets every update
+        # for the owner through the user group
+        self.subscribed_pets = set()
+
         # Use user-specific group
         if self.user and self.user.is_authenticated:
-            self.user_group_name = f"pet_updates_{self.user.id}"
+            self.user_group_name = owner_group(self.user.id)
             print(f"Joining authenticated group: {self.user_group_name}")
         else:
             # Fallback for anonymous users during development
-            self.user_group_name = "pet_updates_anonymous"
+            self.user_group_name = owner_group(None)
             print(f"Joining anonymous group: {self.user_group_name}")
         
         # Join user group
@@ -29,19 +40,43 @@ class PetConsumer(AsyncWebsocketConsumer):
         print(f"Channel name: {self.channel_name}")
         # Remove this line: print(f"Available groups after joining: {self.channel_layer.groups}")
         
-        await self.accept()
+        # Wire format, negotiated through the WebSocket subprotocol (JSON by default)
+        self.encoding = wire.negotiate(self.scope.get('subprotocols'))
+        await self.accept(subprotocol=self.encoding)
         print("WebSocket connection accepted")
+
+        # Let publishers know someone is listening for this owner
+        self.presence_task = None
+        if presence.is_enabled() and self.user and self.user.is_authenticated:
+            await self._mark_online()
+            self.presence_task = asyncio.create_task(self._presence_heartbeat())
+
         # Send connection confirmation
-        await self.send(text_data=json.dumps({
+        await self.send_message({
             'type': 'connection_established',
             'message': 'Connected to pet updates channel'
-        }))
+        })
 
         # # Test direct update after a short delay
         # import asyncio
         # asyncio.create_task(self.test_after_delay())
 
     async def disconnect(self, close_code):
+        if hasattr(self, 'outbox_task'):
+            self.outbox_task.cancel()
+            metrics.incr('ws.outbox_depth', -len(self.outbox))
+
+        if getattr(self, 'presence_task', None):
+            self.presence_task.cancel()
+            try:
+                await presence.mark_offline(self.user.id, self.channel_name, self.subscribed_pets)
+            except Exception as e:
+                print(f"Presence error for user {self.user.id}: {str(e)}")
+
+        # Leave pet groups
+        for pet_id in getattr(self, 'subscribed_pets', ()):
+            await self.channel_layer.group_discard(pet_group(pet_id), self.channel_name)
+
         # Leave user group
         if hasattr(self, 'user_group_name'):
             await self.channel_layer.group_discard(
@@ -49,44 +84,162 @@ class PetConsumer(AsyncWebsocketConsumer):
                 self.channel_name
             )
 
+    async def _mark_online(self):
+        try:
+            await presence.mark_online(self.user.id, self.channel_name, self.subscribed_pets)
+        except Exception as e:
+            print(f"Presence error for user {self.user.id}: {str(e)}")
+
+    async def _presence_heartbeat(self):
+        """Keep this connection's presence entry alive until disconnect"""
+        while True:
+            await asyncio.sleep(settings.PET_PRESENCE_HEARTBEAT)
+            await self._mark_online()
+
+    @database_sync_to_async
+    def _owns_pet(self, pet_id):
+        return Pet.objects.filter(id=pet_id, owner=self.user).exists()
+
+    async def subscribe(self, pet_id):
+        """Narrow this connection to updates for the given pet (plus any others already subscribed)"""
+        if pet_id not in self.subscribed_pets:
+            # Owner check happens once, here, rather than for every update
+            if not self.user.is_authenticated or not await self._owns_pet(pet_id):
+                await self.send_message({
+                    'type': 'error',
+                    'message': f'Cannot subscribe to pet {pet_id}'
+                })
+                return
+
+            await self.channel_layer.group_add(pet_group(pet_id), self.channel_name)
+            if not self.subscribed_pets:
+                # First subscription: stop receiving updates for the owner's other pets
+                await self.channel_layer.group_discard(self.user_group_name, self.channel_name)
+            self.subscribed_pets.add(pet_id)
+            if self.presence_task:
+                await self._mark_online()
+
+        await self.send_message({
+            'type': 'subscribed',
+            'pet_id': pet_id
+        })
+
+    async def unsubscribe(self, pet_id):
+        if pet_id in self.subscribed_pets:
+            self.subscribed_pets.discard(pet_id)
+            await self.channel_layer.group_discard(pet_group(pet_id), self.channel_name)
+            if not self.subscribed_pets:
+                # Back to owner-wide updates
+                await self.channel_layer.group_add(self.user_group_name, self.channel_name)
+            if self.presence_task:
+                try:
+                    await presence.forget_pet(pet_id, self.channel_name)
+                except Exception as e:
+                    print(f"Presence error for user {self.user.id}: {str(e)}")
+                await self._mark_online()
+
+        await self.send_message({
+            'type': 'unsubscribed',
+            'pet_id': pet_id
+        })
+
     # Receive message from WebSocket
-    async def receive(self, text_data):
+    async def send_message(self, message):
+        """Send a message dict in this connection's wire format"""
+        await self.send(**wire.encode(message, self.encoding))
+
+    async def receive(self, text_data=None, bytes_data=None):
         try:
-            text_data_json = json.loads(text_data)
+            text_data_json = wire.decode(text_data, bytes_data)
+            action = text_data_json.get('action')
+            if action in ('subscribe', 'unsubscribe'):
+                pet_id = int(text_data_json.get('pet_id'))
+                if action == 'subscribe':
+                    await self.subscribe(pet_id)
+                else:
+                    await self.unsubscribe(pet_id)
+                return
+
             message = text_data_json.get('message', '')
             
             # Echo the message back (for testing)
-            await self.send(text_data=json.dumps({
+            await self.send_message({
                 'type': 'echo',
                 'message': f'Received: {message}'
-            }))
-        except json.JSONDecodeError:
-            await self.send(text_data=json.dumps({
+            })
+        except (json.JSONDecodeError, ValueError, TypeError):
+            await self.send_message({
                 'type': 'error',
-                'message': 'Invalid JSON format'
-            }))
+                'message': 'Invalid message format'
+            })
         except Exception as e:
-            await self.send(text_data=json.dumps({
+            await self.send_message({
                 'type': 'error',
                 'message': f'Error: {str(e)}'
-            }))
+            })
 
     # Receive message from user group
     async def pet_update(self, event):
         print(f"Consumer received pet_update event: {event}")
-        try:
-            # Send message to WebSocket
-            message = {
-                'type': 'pet_update',
-                'pet_id': event.get('pet_id'),
-                'update_type': event.get('update_type'),
-                'data': event.get('data', {})
-            }
-            print(f"Sending to client: {message}")
-            await self.send(text_data=json.dumps(message))
-            print(f"Successfully sent message to client")
-        except Exception as e:
-            print(f"Error sending pet update to client: {str(e)}")
+        message = {
+            'type': 'pet_update',
+            'pet_id': event.get('pet_id'),
+            'update_type': event.get('update_type'),
+            'data': event.get('data', {})
+        }
+        await self._queue_update(message)
+
+    async def _queue_update(self, message):
+        """
+        Put an update on this connection's outbound queue instead of awaiting the
+        socket, so a slow client never stalls the channel layer. A newer update
+        for the same pet and update_type replaces the pending one.
+        """
+        if not hasattr(self, 'outbox'):
+            self.outbox = OrderedDict()
+            self.outbox_ready = asyncio.Event()
+            self.outbox_task = asyncio.create_task(self._drain_outbox())
+
+        key = (message['pet_id'], message['update_type'])
+        if key in self.outbox:
+            self.outbox[key] = message
+            metrics.incr('ws.coalesced_frames')
+            return
+
+        if len(self.outbox) >= settings.PET_WS_OUTBOX_SIZE:
+            metrics.incr('ws.outbox_overflows')
+            policy = settings.PET_WS_OVERFLOW_POLICY
+            if policy == 'disconnect':
+                print(f"Client too slow, closing connection {self.channel_name}")
+                await self.close(code=4008)
+                return
+            if policy == 'drop_newest':
+                metrics.incr('ws.dropped_frames')
+                return
+            # drop_oldest
+            self.outbox.popitem(last=False)
+            metrics.incr('ws.dropped_frames')
+            metrics.incr('ws.outbox_depth', -1)
+
+        self.outbox[key] = message
+        metrics.incr('ws.outbox_depth')
+        metrics.observe_max('ws.outbox_depth_max', len(self.outbox))
+        self.outbox_ready.set()
+
+    async def _drain_outbox(self):
+        """Send queued updates to the client one at a time"""
+        while True:
+            await self.outbox_ready.wait()
+            while self.outbox:
+                _, message = self.outbox.popitem(last=False)
+                metrics.incr('ws.outbox_depth', -1)
+                try:
+                    print(f"Sending to client: {message}")
+                    await self.send_message(message)
+                    metrics.incr('ws.sent_frames')
+                except Exception as e:
+                    print(f"Error sending pet update to client: {str(e)}")
+            self.outbox_ready.clear()
 
     # # Testing
     # async def test_direct_update(self):
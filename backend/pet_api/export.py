@@ -0,0 +1,238 @@
+# pet_api/export.py
+"""
+Streaming export and bulk import of pets and interactions, as NDJSON or CSV.
+
+Exports read rows with ``values_list().iterator(chunk_size=...)`` (a
+server-side cursor on PostgreSQL) and encode them one at a time, so memory use
+doesn't depend on the number of rows. They are served by ``api/export/`` and
+the ``export_data`` command; under ASGI through aiter_export(), since Django
+would otherwise read a sync iterator to the end before sending anything.
+
+Imports keep the exported ids and timestamps and write PET_IMPORT_BATCH_SIZE
+rows per transaction: with ``COPY`` on PostgreSQL, otherwise with a batched
+INSERT (bulk_create would overwrite the auto_now timestamps). Imported rows
+don't go through Pet.save(), so they get no PetEvents; cached pet lists and
+the adaptive schedule are updated for them.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+
+from . import pet_cache, scheduler
+from .models import Pet, Interaction
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+# Exported columns, in order. Bookkeeping fields (event log, tick generations)
+# are left out: they only mean something next to the rows they refer to.
+EXPORTS = {
+    'pets': (Pet, 'created_at', [
+        'id', 'owner_id', 'name', 'pet_type', 'created_at', 'last_interaction',
+        'last_stat_update', 'hunger', 'happiness', 'hygiene', 'sleep', 'health',
+        'stage', 'experience', 'status', 'sleep_start_time', 'deceased_at',
+    ]),
+    'interactions': (Interaction, 'timestamp', ['id', 'pet_id', 'action', 'timestamp']),
+}
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def parse_time_range(since=None, until=None):
+    """(since, until) datetimes from ISO 8601 strings; raises ValueError"""
+    bounds = []
+    for name, value in (('since', since), ('until', until)):
+        parsed = None
+        if value:
+            parsed = parse_datetime(value)
+            if parsed is None:
+                raise ValueError(f"{name} must be an ISO 8601 datetime")
+        bounds.append(parsed)
+    return tuple(bounds)
+
+
+def export_rows(kind, since=None, until=None):
+    """Rows of EXPORTS[kind] columns created in [since, until), in id order"""
+    model, time_field, fields = EXPORTS[kind]
+    queryset = model.objects.order_by('id')
+    if since:
+        queryset = queryset.filter(**{f'{time_field}__gte': since})
+    if until:
+        queryset = queryset.filter(**{f'{time_field}__lt': until})
+    return queryset.values_list(*fields).iterator(chunk_size=settings.PET_EXPORT_CHUNK_SIZE)
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def iter_ndjson(rows, fields):
+    """One JSON object per row and line, as bytes"""
+    for row in rows:
+        record = dict(zip(fields, row))
+        if orjson is not None:
+            yield orjson.dumps(
+                record, default=_encode_value,
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_APPEND_NEWLINE,
+            )
+        else:
+            yield (json.dumps(record, default=_encode_value) + '\n').encode()
+
+
+class _Line:
+    """File-like target for csv.writer that hands back what was written"""
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows, fields):
+    """A header line, then one CSV line per row, as bytes"""
+    writer = csv.writer(_Line())
+    yield writer.writerow(fields).encode()
+    for row in rows:
+        yield writer.writerow(
+            '' if value is None else value.isoformat() if isinstance(value, datetime) else value
+            for value in row
+        ).encode()
+
+
+def iter_export(kind, file_format, since=None, until=None):
+    """The whole export as an iterator of byte chunks"""
+    rows = export_rows(kind, since, until)
+    fields = EXPORTS[kind][2]
+    if file_format == 'csv':
+        return iter_csv(rows, fields)
+    return iter_ndjson(rows, fields)
+
+
+async def aiter_export(kind, file_format, since=None, until=None):
+    """
+    iter_export() as an async iterator. Up to PET_EXPORT_CHUNK_SIZE lines are
+    encoded per trip to the sync thread, which keeps the cursor open between trips.
+    """
+    chunks = await sync_to_async(iter_export)(kind, file_format, since, until)
+    take = sync_to_async(lambda: b''.join(islice(chunks, settings.PET_EXPORT_CHUNK_SIZE)))
+    try:
+        while chunk := await take():
+            yield chunk
+    finally:
+        # Let go of the cursor in the sync thread, also when the client went away early
+        await sync_to_async(chunks.close)()
+
+
+def read_records(kind, stream, file_format):
+    """Parse an export back into dicts of model values"""
+    model, _, fields = EXPORTS[kind]
+    columns = {field.attname: field for field in model._meta.concrete_fields}
+
+    if file_format == 'csv':
+        records = csv.DictReader(stream)
+    else:
+        records = (json.loads(line) for line in stream if line.strip())
+
+    for record in records:
+        values = {}
+        for name in fields:
+            value = record.get(name)
+            if value == '' and file_format == 'csv' and columns[name].null:
+                value = None
+            values[name] = None if value is None else columns[name].to_python(value)
+        # Columns that aren't exported start from their defaults
+        for name, field in columns.items():
+            if name not in values:
+                values[name] = field.get_default()
+        yield values
+
+
+def _copy_batch(model, batch):
+    fields = [field.attname for field in model._meta.concrete_fields]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for values in batch:
+        writer.writerow(
+            r'\N' if values[name] is None else values[name] for name in fields
+        )
+    buffer.seek(0)
+    columns = ', '.join(connection.ops.quote_name(name) for name in fields)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f"COPY {connection.ops.quote_name(model._meta.db_table)} ({columns}) "
+            f"FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+            buffer,
+        )
+
+
+def _insert_batch(model, batch):
+    columns = model._meta.concrete_fields
+    fields = [field.attname for field in columns]
+    sql = "INSERT INTO {} ({}) VALUES ({})".format(
+        connection.ops.quote_name(model._meta.db_table),
+        ', '.join(connection.ops.quote_name(name) for name in fields),
+        ', '.join(['%s'] * len(fields)),
+    )
+    params = [
+        [field.get_db_prep_save(values[field.attname], connection) for field in columns]
+        for values in batch
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+def _after_pet_batch(batch):
+    for owner_id in {values['owner_id'] for values in batch}:
+        pet_cache.invalidate(owner_id)
+    if scheduler.is_enabled():
+        pets = [Pet(**values) for values in batch]
+        transaction.on_commit(lambda: [scheduler.schedule_pet(pet) for pet in pets])
+
+
+def import_records(kind, records, batch_size=None, use_copy=None):
+    """
+    Write records from read_records(), one transaction per batch. ``use_copy``
+    defaults to COPY on PostgreSQL. Returns the number of rows imported.
+    """
+    model = EXPORTS[kind][0]
+    batch_size = batch_size or settings.PET_IMPORT_BATCH_SIZE
+    if use_copy is None:
+        use_copy = connection.vendor == 'postgresql'
+    write_batch = _copy_batch if use_copy else _insert_batch
+
+    imported = 0
+    batch = []
+
+    def flush():
+        with transaction.atomic():
+            write_batch(model, batch)
+            if model is Pet:
+                _after_pet_batch(batch)
+
+    for values in records:
+        batch.append(values)
+        if len(batch) >= batch_size:
+            flush()
+            imported += len(batch)
+            batch = []
+            print(f"Imported {imported} {kind} so far")
+    if batch:
+        flush()
+        imported += len(batch)
+
+    # Rows were written with their own ids, so move the id sequence past them
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), [model]):
+            cursor.execute(sql)
+    return imported
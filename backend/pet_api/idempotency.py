@@ -0,0 +1,130 @@
+# pet_api/idempotency.py
+"""
+``Idempotency-Key`` support for actions that must not run twice.
+
+The first request with a given key runs normally and its response is stored
+in the cache for PET_IDEMPOTENCY_TTL. Retries with the same key get the stored
+response back (marked with an ``Idempotent-Replayed`` header) without running
+the action again. A duplicate arriving while the first request is still
+running waits for its result instead of running in parallel. Keys are scoped
+to the user, the action and the pet, and may not be reused with a different
+request body.
+"""
+import asyncio
+import functools
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+POLL_INTERVAL = 0.05  # seconds between checks while waiting on a duplicate
+
+KEY_TOO_LONG = f"{HEADER} must be at most {MAX_KEY_LENGTH} characters."
+KEY_REUSED = f"This {HEADER} was already used for a different request."
+STILL_RUNNING = f"A request with this {HEADER} is still being processed."
+
+
+def cache_key(user_id, action_name, pk, key):
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return f'pet_api:idempotency:{user_id}:{action_name}:{pk}:{digest}'
+
+
+def fingerprint(data):
+    """Hash of the parsed request data (the body may already have been read by a throttle)"""
+    if hasattr(data, 'lists'):
+        data = dict(data.lists())
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def check_stored(stored, request_fingerprint):
+    """(data, status) to answer a retry with, from a stored result"""
+    if stored['fingerprint'] != request_fingerprint:
+        return {"detail": KEY_REUSED}, 422
+    return stored['data'], stored['status']
+
+
+def claim(key):
+    """True if this request is the first with the key and should run the action"""
+    return cache.add(f'{key}:lock', 1, timeout=settings.PET_IDEMPOTENCY_LOCK_TIMEOUT)
+
+
+def release(key):
+    cache.delete(f'{key}:lock')
+
+
+def store(key, request_fingerprint, data, status):
+    # Server errors aren't stored, so the client can retry them
+    if status < 500:
+        cache.set(key, {'fingerprint': request_fingerprint, 'data': data, 'status': status},
+                  timeout=settings.PET_IDEMPOTENCY_TTL)
+
+
+def wait_for_result(key):
+    """Wait for the request holding the key to finish; None if it takes too long"""
+    deadline = time.monotonic() + settings.PET_IDEMPOTENCY_WAIT
+    while time.monotonic() < deadline:
+        stored = cache.get(key)
+        if stored is not None:
+            return stored
+        if cache.get(f'{key}:lock') is None:
+            # The first request failed without storing a result
+            return None
+        time.sleep(POLL_INTERVAL)
+    return None
+
+
+async def await_result(key):
+    """Async version of wait_for_result()"""
+    deadline = time.monotonic() + settings.PET_IDEMPOTENCY_WAIT
+    while time.monotonic() < deadline:
+        stored = await cache.aget(key)
+        if stored is not None:
+            return stored
+        if await cache.aget(f'{key}:lock') is None:
+            return None
+        await asyncio.sleep(POLL_INTERVAL)
+    return None
+
+
+def idempotent(action):
+    """Decorator for PetViewSet actions that honours the Idempotency-Key header"""
+    @functools.wraps(action)
+    def wrapper(self, request, *args, **kwargs):
+        header = request.headers.get(HEADER)
+        if not header:
+            return action(self, request, *args, **kwargs)
+        if len(header) > MAX_KEY_LENGTH:
+            return Response({"detail": KEY_TOO_LONG}, status=400)
+
+        key = cache_key(request.user.pk, action.__name__, kwargs.get('pk'), header)
+        request_fingerprint = fingerprint(request.data)
+
+        stored = cache.get(key)
+        if stored is None:
+            if claim(key):
+                # The first request may have stored its result and released the
+                # lock between the cache miss above and the claim
+                stored = cache.get(key)
+                if stored is not None:
+                    release(key)
+            else:
+                stored = wait_for_result(key)
+                if stored is None:
+                    return Response({"detail": STILL_RUNNING}, status=409)
+        if stored is not None:
+            data, status = check_stored(stored, request_fingerprint)
+            return Response(data, status=status, headers={REPLAYED_HEADER: 'true'})
+
+        try:
+            response = action(self, request, *args, **kwargs)
+            store(key, request_fingerprint, response.data, response.status_code)
+        finally:
+            release(key)
+        return response
+    return wrapper
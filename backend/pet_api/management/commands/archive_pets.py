@@ -0,0 +1,26 @@
+# pet_api/management/commands/archive_pets.py
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from pet_api.archive import archivable_pets, archive_deceased_pets
+
+
+class Command(BaseCommand):
+    help = "Move long-deceased pets and their interactions to the archive tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help="Archive pets deceased this many days ago (default PET_ARCHIVE_AFTER)")
+        parser.add_argument('--batch-size', type=int, help="Pets per transaction (default PET_ARCHIVE_BATCH_SIZE)")
+        parser.add_argument('--dry-run', action='store_true', help="Only count the pets that would be archived")
+
+    def handle(self, *args, **options):
+        older_than = timedelta(days=options['days']) if options['days'] is not None else None
+
+        if options['dry_run']:
+            count = archivable_pets(older_than=older_than).count()
+            self.stdout.write(f"{count} pets would be archived")
+            return
+
+        archived = archive_deceased_pets(older_than=older_than, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} pets"))
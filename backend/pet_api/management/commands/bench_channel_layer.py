@@ -0,0 +1,118 @@
+# pet_api/management/commands/bench_channel_layer.py
+import asyncio
+import time
+from collections import Counter
+
+from channels_redis.utils import _consistent_hash
+from django.core.management.base import BaseCommand, CommandError
+
+from pet_api.channel_layers import HashRing, ShardedRedisChannelLayer, DEFAULT_VNODES
+from pet_api.notifications import owner_group
+
+DEFAULT_HOSTS = [f'redis://127.0.0.1:6379/{db}' for db in range(10, 14)]
+
+
+def moved_fraction(groups, before, after):
+    return sum(before(group) != after(group) for group in groups) / len(groups)
+
+
+class Command(BaseCommand):
+    help = (
+        "Check ShardedRedisChannelLayer against several local Redis shards: group balance, "
+        "groups moved when a shard is added or removed, delivery correctness and fan-out throughput"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hosts', nargs='+', default=DEFAULT_HOSTS,
+                            help="Redis URLs, one per shard (default: databases 10-13 of the local Redis)")
+        parser.add_argument('--groups', type=int, default=1000, help="Owner groups to create")
+        parser.add_argument('--members', type=int, default=2, help="Channels (sockets) per group")
+        parser.add_argument('--messages', type=int, default=5, help="group_send calls per group")
+        parser.add_argument('--vnodes', type=int, default=DEFAULT_VNODES)
+        parser.add_argument('--timeout', type=float, default=30, help="Seconds to wait for every delivery")
+        parser.add_argument('--ring-only', action='store_true', help="Only report placement, don't connect to Redis")
+
+    def handle(self, *args, **options):
+        hosts = options['hosts']
+        if len(hosts) < 2:
+            raise CommandError("Give at least two shards")
+        self.report_ring(hosts, options['groups'], options['vnodes'])
+        if not options['ring_only']:
+            asyncio.run(self.run_fan_out(hosts, options))
+
+    def report_ring(self, hosts, group_count, vnodes):
+        groups = [owner_group(owner_id) for owner_id in range(1, group_count + 1)]
+        ring = HashRing(hosts, vnodes)
+        per_shard = Counter(ring.shard(group) for group in groups)
+        self.stdout.write("Groups per shard: " + ", ".join(
+            f"{host}={per_shard[index]}" for index, host in enumerate(hosts)
+        ))
+
+        extra = hosts + ['redis://new-shard:6379/0']
+        changes = [
+            ('added a shard', HashRing(extra, vnodes).shard, lambda g: _consistent_hash(g, len(extra))),
+            ('removed a shard', HashRing(hosts[:-1], vnodes).shard, lambda g: _consistent_hash(g, len(hosts) - 1)),
+        ]
+        self.stdout.write(f"{'groups moved':<18}{'hash ring':>12}{'crc32 modulo':>14}")
+        for label, ring_after, modulo_after in changes:
+            ring_moved = moved_fraction(groups, ring.shard, ring_after)
+            modulo_moved = moved_fraction(groups, lambda g: _consistent_hash(g, len(hosts)), modulo_after)
+            self.stdout.write(f"{label:<18}{ring_moved:>11.1%}{modulo_moved:>14.1%}")
+
+    async def run_fan_out(self, hosts, options):
+        # Every channel of this process shares one Redis queue, which has to hold all deliveries
+        capacity = options['groups'] * options['members'] * options['messages']
+        layer = ShardedRedisChannelLayer(hosts=hosts, vnodes=options['vnodes'], capacity=capacity)
+        await layer.flush()
+        try:
+            members = {}
+            for owner_id in range(1, options['groups'] + 1):
+                group = owner_group(owner_id)
+                members[group] = [await layer.new_channel() for _ in range(options['members'])]
+                for channel in members[group]:
+                    await layer.group_add(group, channel)
+
+            # One receiver per channel, like one consumer per socket
+            received = Counter()
+            wrong = Counter()
+
+            async def consume(group, channel):
+                seen = []
+                for _ in range(options['messages']):
+                    message = await layer.receive(channel)
+                    received[channel] += 1
+                    if message['group'] != group:
+                        wrong[channel] += 1
+                    seen.append(message['n'])
+                return sorted(seen) == list(range(options['messages']))
+
+            consumers = [
+                asyncio.ensure_future(consume(group, channel))
+                for group, channels in members.items() for channel in channels
+            ]
+
+            start = time.perf_counter()
+            for n in range(options['messages']):
+                for group in members:
+                    await layer.group_send(group, {'type': 'pet_update', 'group': group, 'n': n})
+            send_seconds = time.perf_counter() - start
+
+            done, pending = await asyncio.wait(consumers, timeout=options['timeout'])
+            total_seconds = time.perf_counter() - start
+            for consumer in pending:
+                consumer.cancel()
+            missing = len(pending) + sum(not consumer.result() for consumer in done)
+        finally:
+            await layer.flush()
+
+        sends = options['messages'] * len(members)
+        deliveries = sum(received.values())
+        self.stdout.write(f"group_send: {sends} calls in {send_seconds:.2f}s ({sends / send_seconds:.0f}/s)")
+        self.stdout.write(
+            f"delivered: {deliveries} messages in {total_seconds:.2f}s ({deliveries / total_seconds:.0f}/s)"
+        )
+        if sum(wrong.values()) or missing:
+            raise CommandError(
+                f"{sum(wrong.values())} messages reached the wrong channel, {missing} channels missed messages"
+            )
+        self.stdout.write(self.style.SUCCESS("Every channel got exactly its group's messages"))
@@ -0,0 +1,72 @@
+# pet_api/management/commands/bench_pet_serialization.py
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from pet_api.models import Pet
+from pet_api.renderers import ORJSONRenderer
+from pet_api.serializers import PetSerializer, serialize_pets
+
+# Names that exercise escaping: quotes, non-ASCII, emoji and JS line terminators
+SAMPLE_NAMES = ['Mochi', 'Señor "Fluff"', 'Pochi\u2028Tama', '🐶 Rex', 'Back\\slash\u2029']
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Check that the fast pet serialization path renders the same bytes as "
+        "PetSerializer, and time both on a list of pets (created in a rolled back transaction)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pets', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options['pets'], options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, count, repeat):
+        owner = User.objects.create_user(username='bench_pet_serialization', email='bench@example.com')
+        now = timezone.now()
+        Pet.objects.bulk_create([
+            Pet(
+                owner=owner,
+                name=SAMPLE_NAMES[i % len(SAMPLE_NAMES)],
+                pet_type='dog' if i % 2 else 'cat',
+                hunger=i % 101,
+                status='sleeping' if i % 7 == 0 else 'alive',
+                sleep_start_time=now if i % 7 == 0 else None,
+            )
+            for i in range(count)
+        ])
+        queryset = Pet.objects.filter(owner=owner)
+
+        def slow():
+            return JSONRenderer().render(PetSerializer(queryset.all(), many=True).data)
+
+        def fast():
+            return ORJSONRenderer().render(serialize_pets(queryset.select_related('owner')))
+
+        expected = slow()
+        if fast() != expected:
+            raise CommandError("Fast serialization path output differs from PetSerializer")
+        self.stdout.write(f"Output identical for {count} pets ({len(expected)} bytes)")
+
+        for label, render in (('PetSerializer + JSONRenderer', slow), ('serialize_pets + ORJSONRenderer', fast)):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                render()
+            elapsed = (time.perf_counter() - start) / repeat * 1000
+            self.stdout.write(f"{label:<34}{elapsed:>10.2f} ms")
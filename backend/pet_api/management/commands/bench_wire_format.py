@@ -0,0 +1,54 @@
+# pet_api/management/commands/bench_wire_format.py
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from pet_api import wire
+
+
+def sample_messages():
+    """A representative mix of pet_update frames, as produced by send_update_to_owner"""
+    now = timezone.now().timestamp()
+    return [
+        {'type': 'pet_update', 'pet_id': 1234, 'update_type': 'critical_stats',
+         'data': {'warnings': [], 'timestamp': now}},
+        {'type': 'pet_update', 'pet_id': 1234, 'update_type': 'critical_stats',
+         'data': {'warnings': ['Mochi is very hungry!', 'Mochi needs cleaning!'], 'timestamp': now}},
+        {'type': 'pet_update', 'pet_id': 1234, 'update_type': 'status_change',
+         'data': {'old_status': 'alive', 'new_status': 'sick',
+                  'message': 'Mochi is not feeling well.', 'timestamp': now}},
+        {'type': 'pet_update', 'pet_id': 1234, 'update_type': 'evolution',
+         'data': {'old_stage': 'baby', 'new_stage': 'teen',
+                  'message': 'Mochi evolved from baby to teen!', 'timestamp': now}},
+    ]
+
+
+class Command(BaseCommand):
+    help = "Compare bytes per frame and CPU per message for the WebSocket wire formats"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20000)
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        messages = sample_messages()
+
+        self.stdout.write(f"{'encoding':<14}{'avg bytes':>12}{'encode us':>12}{'decode us':>12}")
+        for encoding in wire.SUPPORTED:
+            frames = [wire.encode(message, encoding) for message in messages]
+            sizes = [len(next(iter(frame.values()))) for frame in frames]
+
+            start = time.perf_counter()
+            for i in range(iterations):
+                wire.encode(messages[i % len(messages)], encoding)
+            encode_us = (time.perf_counter() - start) / iterations * 1e6
+
+            start = time.perf_counter()
+            for i in range(iterations):
+                wire.decode(**frames[i % len(frames)])
+            decode_us = (time.perf_counter() - start) / iterations * 1e6
+
+            self.stdout.write(
+                f"{encoding:<14}{sum(sizes) / len(sizes):>12.1f}{encode_us:>12.2f}{decode_us:>12.2f}"
+            )
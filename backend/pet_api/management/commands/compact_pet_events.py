@@ -0,0 +1,26 @@
+# pet_api/management/commands/compact_pet_events.py
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from pet_api.replay import compactable_pets, compact_events
+
+
+class Command(BaseCommand):
+    help = "Drop pet events and snapshots older than each pet's newest snapshot past the retention window"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help="Keep this many days of history (default PET_EVENT_RETENTION)")
+        parser.add_argument('--batch-size', type=int, help="Pets per transaction (default PET_EVENT_COMPACT_BATCH_SIZE)")
+        parser.add_argument('--dry-run', action='store_true', help="Only count the pets that would be compacted")
+
+    def handle(self, *args, **options):
+        older_than = timedelta(days=options['days']) if options['days'] is not None else None
+
+        if options['dry_run']:
+            count = compactable_pets(older_than=older_than).count()
+            self.stdout.write(f"{count} pets would be compacted")
+            return
+
+        deleted = compact_events(older_than=older_than, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} pet events"))
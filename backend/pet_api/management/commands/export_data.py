@@ -0,0 +1,32 @@
+# pet_api/management/commands/export_data.py
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from pet_api import export
+
+
+class Command(BaseCommand):
+    help = "Stream all pets or interactions to NDJSON or CSV, in constant memory"
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(export.EXPORTS))
+        parser.add_argument('--format', dest='file_format', choices=sorted(export.FORMATS), default='ndjson')
+        parser.add_argument('--since', help="Only rows created at or after this ISO 8601 time")
+        parser.add_argument('--until', help="Only rows created before this ISO 8601 time")
+        parser.add_argument('--output', '-o', help="File to write (default stdout)")
+
+    def handle(self, *args, **options):
+        try:
+            since, until = export.parse_time_range(options['since'], options['until'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        chunks = export.iter_export(options['kind'], options['file_format'], since, until)
+        if options['output']:
+            with open(options['output'], 'wb') as out:
+                out.writelines(chunks)
+            self.stderr.write(self.style.SUCCESS(f"Wrote {options['kind']} to {options['output']}"))
+        else:
+            sys.stdout.buffer.writelines(chunks)
+            sys.stdout.flush()
@@ -0,0 +1,42 @@
+# pet_api/management/commands/import_data.py
+import os
+import sys
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from pet_api import export
+
+
+class Command(BaseCommand):
+    help = "Bulk import pets or interactions from an export_data NDJSON or CSV file, keeping their ids"
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(export.EXPORTS))
+        parser.add_argument('file', help="File to read, or - for stdin")
+        parser.add_argument('--format', dest='file_format', choices=sorted(export.FORMATS),
+                            help="Default from the file extension, else ndjson")
+        parser.add_argument('--batch-size', type=int, help="Rows per transaction (default PET_IMPORT_BATCH_SIZE)")
+        parser.add_argument('--no-copy', action='store_true', help="Use batched INSERTs even on PostgreSQL")
+
+    def handle(self, *args, **options):
+        file_format = options['file_format']
+        if file_format is None:
+            extension = os.path.splitext(options['file'])[1].lstrip('.')
+            file_format = extension if extension in export.FORMATS else 'ndjson'
+
+        stream = sys.stdin if options['file'] == '-' else open(options['file'], newline='', encoding='utf-8')
+        try:
+            records = export.read_records(options['kind'], stream, file_format)
+            imported = export.import_records(
+                options['kind'], records, batch_size=options['batch_size'],
+                use_copy=False if options['no_copy'] else None,
+            )
+        except (DatabaseError, ValidationError, ValueError) as e:
+            raise CommandError(f"Import failed: {e}")
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        self.stdout.write(self.style.SUCCESS(f"Imported {imported} {options['kind']}"))
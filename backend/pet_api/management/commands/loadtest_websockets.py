@@ -0,0 +1,207 @@
+# pet_api/management/commands/loadtest_websockets.py
+import asyncio
+import contextlib
+import os
+import resource
+import statistics
+import time
+
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from rest_framework.authtoken.models import Token
+
+from pet_api import metrics, wire
+from pet_api.notifications import asend, owner_group
+
+USERNAME_PREFIX = 'loadtest_ws_'
+
+
+def rss_bytes():
+    """Resident memory of this process (peak RSS where /proc isn't available)"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+class Client:
+    """One simulated browser tab: a WebSocket through TokenAuthMiddleware"""
+
+    def __init__(self, application, owner_id, token):
+        self.owner_id = owner_id
+        self.communicator = WebsocketCommunicator(application, f'/ws/pets/?token={token}')
+        self.latencies = []
+        self.received = 0
+
+    async def connect(self, timeout):
+        connected, _ = await self.communicator.connect(timeout=timeout)
+        if connected:
+            await self.communicator.receive_output(timeout)  # connection_established
+        return connected
+
+    async def read(self, expected, timeout):
+        """Read pet_update frames until ``expected`` arrived or the socket goes quiet"""
+        for _ in range(expected):
+            try:
+                output = await self.communicator.receive_output(timeout)
+            except asyncio.TimeoutError:
+                return
+            if output.get('type') != 'websocket.send':
+                return
+            message = wire.decode(output.get('text'), output.get('bytes'))
+            if message.get('type') == 'pet_update':
+                self.received += 1
+                self.latencies.append(time.perf_counter() - message['data']['sent_at'])
+
+
+class Command(BaseCommand):
+    help = (
+        "Open thousands of authenticated PetConsumer connections in this process, publish "
+        "synthetic ticks of pet_update events to their owners and report connection rate, "
+        "delivery latency, memory per connection and dropped messages"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=1000)
+        parser.add_argument('--sockets-per-owner', type=int, default=2, help="Open tabs per owner")
+        parser.add_argument('--pets-per-owner', type=int, default=3, help="Updates per owner in each tick")
+        parser.add_argument('--ticks', type=int, default=3)
+        parser.add_argument('--interval', type=float, default=1.0, help="Seconds between ticks")
+        parser.add_argument('--concurrency', type=int, default=200, help="Connections opened at a time")
+        parser.add_argument('--timeout', type=float, default=10.0)
+        parser.add_argument('--layer', choices=['memory', 'configured'], default='memory', help=(
+            "Use an in-memory channel layer (this process only) or the configured CHANNEL_LAYERS"
+        ))
+        parser.add_argument('--presence', action='store_true', help="Keep presence tracking on")
+        parser.add_argument('--consumer-output', action='store_true', help="Don't silence the consumers' prints")
+
+    def handle(self, *args, **options):
+        if options['connections'] < 1 or options['sockets_per_owner'] < 1:
+            raise CommandError("Need at least one connection and one socket per owner")
+
+        overrides = {'PET_PRESENCE_TRACKING': options['presence']}
+        if options['layer'] == 'memory':
+            overrides['CHANNEL_LAYERS'] = {'default': {
+                'BACKEND': 'channels.layers.InMemoryChannelLayer',
+                'CONFIG': {'capacity': options['pets_per_owner'] * options['ticks'] * 2 + 10},
+            }}
+
+        owners = -(-options['connections'] // options['sockets_per_owner'])
+        tokens = self.create_owners(owners)
+        try:
+            quiet = contextlib.nullcontext() if options['consumer_output'] else \
+                contextlib.redirect_stdout(open(os.devnull, 'w'))
+            with override_settings(**overrides), quiet:
+                report = asyncio.run(self.run(tokens, options))
+        finally:
+            User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+        self.print_report(report, options)
+
+    def create_owners(self, count):
+        User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+        users = User.objects.bulk_create([User(username=f'{USERNAME_PREFIX}{i}') for i in range(count)])
+        tokens = Token.objects.bulk_create([Token(user=user, key=Token.generate_key()) for user in users])
+        return [(token.user.pk, token.key) for token in tokens]
+
+    async def run(self, tokens, options):
+        from virtual_pet_project.asgi import application
+
+        clients = [
+            Client(application, *tokens[i // options['sockets_per_owner']])
+            for i in range(options['connections'])
+        ]
+        baseline_rss = rss_bytes()
+        frames_before = metrics.snapshot()['counters']
+
+        # Connect in waves of --concurrency
+        start = time.perf_counter()
+        connected = []
+        for offset in range(0, len(clients), options['concurrency']):
+            wave = clients[offset:offset + options['concurrency']]
+            results = await asyncio.gather(
+                *(client.connect(options['timeout']) for client in wave), return_exceptions=True
+            )
+            connected += [client for client, ok in zip(wave, results) if ok is True]
+        connect_seconds = time.perf_counter() - start
+        connected_rss = rss_bytes()
+
+        owner_ids = sorted({client.owner_id for client in connected})
+        expected_per_client = options['pets_per_owner'] * options['ticks']
+        readers = [
+            asyncio.ensure_future(client.read(expected_per_client, options['timeout']))
+            for client in connected
+        ]
+
+        publish_seconds = []
+        for tick in range(options['ticks']):
+            if tick:
+                await asyncio.sleep(options['interval'])
+            tick_start = time.perf_counter()
+            for owner_id in owner_ids:
+                for pet in range(options['pets_per_owner']):
+                    await asend(owner_group(owner_id), {
+                        'type': 'pet_update',
+                        'pet_id': owner_id * 1000 + pet,
+                        'update_type': 'critical_stats',
+                        'data': {'warnings': [], 'tick': tick, 'sent_at': time.perf_counter()},
+                    })
+            publish_seconds.append(time.perf_counter() - tick_start)
+
+        await asyncio.gather(*readers)
+        await asyncio.gather(
+            *(client.communicator.disconnect() for client in connected), return_exceptions=True
+        )
+
+        frames_after = metrics.snapshot()['counters']
+        return {
+            'clients': len(clients),
+            'connected': len(connected),
+            'connect_seconds': connect_seconds,
+            'rss_per_connection': (connected_rss - baseline_rss) / max(len(connected), 1),
+            'publish_seconds': publish_seconds,
+            'expected': expected_per_client * len(connected),
+            'received': sum(client.received for client in connected),
+            'latencies': [latency for client in connected for latency in client.latencies],
+            'coalesced': frames_after.get('ws.coalesced_frames', 0) - frames_before.get('ws.coalesced_frames', 0),
+            'outbox_dropped': frames_after.get('ws.dropped_frames', 0) - frames_before.get('ws.dropped_frames', 0),
+        }
+
+    def print_report(self, report, options):
+        connected = report['connected']
+        self.stdout.write(
+            f"Connections: {connected}/{report['clients']} in {report['connect_seconds']:.2f}s "
+            f"({connected / report['connect_seconds']:.0f}/s)"
+        )
+        self.stdout.write(f"Memory per connection: {report['rss_per_connection'] / 1024:.1f} KiB (RSS)")
+        self.stdout.write("Tick publish time: " + ", ".join(f"{s * 1000:.0f}ms" for s in report['publish_seconds']))
+
+        latencies_ms = [latency * 1000 for latency in report['latencies']]
+        if latencies_ms:
+            self.stdout.write(
+                "Delivery latency: " + ", ".join(
+                    f"p{int(fraction * 100)}={percentile(latencies_ms, fraction):.1f}ms"
+                    for fraction in (0.5, 0.9, 0.99)
+                ) + f", max={max(latencies_ms):.1f}ms, mean={statistics.mean(latencies_ms):.1f}ms"
+            )
+
+        # Outbox drops are part of the missing messages, the rest never reached a consumer
+        missing = max(report['expected'] - report['received'] - report['coalesced'], 0)
+        self.stdout.write(
+            f"Messages: {report['expected']} expected, {report['received']} delivered, "
+            f"{report['coalesced']} coalesced, {missing} missing "
+            f"({report['outbox_dropped']} dropped by full outboxes)"
+        )
+        if connected < report['clients'] or missing:
+            self.stdout.write(self.style.WARNING("Some connections or messages didn't make it"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Every message was delivered or coalesced"))
@@ -0,0 +1,79 @@
+# pet_api/management/commands/profile_summary.py
+import json
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+def read_folded(path):
+    """Yield (frames, count) for each stack line of a .folded capture"""
+    with open(path) as folded:
+        for line in folded:
+            stack, _, count = line.rstrip('\n').rpartition(' ')
+            if stack and count.isdigit():
+                yield stack.split(';'), int(count)
+
+
+class Command(BaseCommand):
+    help = (
+        "Summarise the profiles in PET_PROFILE_DIR: the frames with the most samples (self and "
+        "inclusive) and the queries with the most time across all captures"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', help="Profile directory (default: PET_PROFILE_DIR)")
+        parser.add_argument('--name', help="Only captures whose name starts with this, e.g. update_all_pets")
+        parser.add_argument('--limit', type=int, default=20, help="Rows per table")
+
+    def handle(self, *args, **options):
+        directory = Path(options['dir'] or settings.PET_PROFILE_DIR)
+        if not directory.is_dir():
+            raise CommandError(f"No profiles in {directory}")
+
+        captures = sorted(directory.glob('*.folded'))
+        if options['name']:
+            captures = [path for path in captures if path.name.startswith(options['name'])]
+        if not captures:
+            raise CommandError(f"No matching captures in {directory}")
+
+        self_samples, inclusive_samples, names = Counter(), Counter(), Counter()
+        sql = {}
+        total_samples = duration_ms = sql_ms = 0
+        for path in captures:
+            for frames, count in read_folded(path):
+                total_samples += count
+                self_samples[frames[-1]] += count
+                # Recursive frames count once per stack
+                for frame in set(frames):
+                    inclusive_samples[frame] += count
+
+            meta_path = path.with_suffix('.json')
+            if not meta_path.exists():
+                continue
+            with open(meta_path) as meta_file:
+                meta = json.load(meta_file)
+            names[meta['name']] += 1
+            duration_ms += meta['duration_ms']
+            sql_ms += meta['sql_ms']
+            for query in meta['sql']:
+                entry = sql.setdefault(query['sql'], [0, 0.0])
+                entry[0] += query['count']
+                entry[1] += query['total_ms']
+
+        self.stdout.write(
+            f"{len(captures)} captures, {total_samples} samples, {duration_ms:.0f}ms profiled, "
+            f"{sql_ms:.0f}ms in SQL"
+        )
+        self.stdout.write("Captures: " + ", ".join(f"{name}={count}" for name, count in names.most_common()))
+
+        limit = options['limit']
+        for title, counter in (("self", self_samples), ("inclusive", inclusive_samples)):
+            self.stdout.write(f"\nHottest frames ({title}):")
+            for frame, count in counter.most_common(limit):
+                self.stdout.write(f"{count:>8} {count / max(total_samples, 1):>7.1%}  {frame}")
+
+        self.stdout.write("\nSlowest queries (total):")
+        for query, (count, total) in sorted(sql.items(), key=lambda item: item[1][1], reverse=True)[:limit]:
+            self.stdout.write(f"{total:>10.1f}ms {count:>7}x  {' '.join(query.split())[:160]}")
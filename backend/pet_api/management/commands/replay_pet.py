@@ -0,0 +1,50 @@
+# pet_api/management/commands/replay_pet.py
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from pet_api.models import EVENT_STATE_FIELDS, Pet
+from pet_api.replay import events_since_snapshot, state_at
+
+
+class Command(BaseCommand):
+    help = "Rebuild a pet's state at a moment in time from its event log"
+
+    def add_arguments(self, parser):
+        parser.add_argument('pet_id', type=int)
+        parser.add_argument('--at', help="ISO 8601 timestamp (default: now)")
+        parser.add_argument('--events', action='store_true', help="List the events replayed on top of the snapshot")
+        parser.add_argument('--verify', action='store_true', help="Compare the replayed state to the stored pet")
+
+    def handle(self, *args, **options):
+        at = timezone.now()
+        if options['at']:
+            at = parse_datetime(options['at'])
+            if at is None:
+                raise CommandError(f"Invalid timestamp: {options['at']}")
+            if timezone.is_naive(at):
+                at = timezone.make_aware(at)
+
+        state, replayed = state_at(options['pet_id'], at)
+        if not state:
+            raise CommandError(f"No history for pet {options['pet_id']} at {at.isoformat()}")
+
+        snapshot, events = events_since_snapshot(options['pet_id'], at)
+        start = f"snapshot from {snapshot.taken_at.isoformat()}" if snapshot else "the first event"
+        self.stdout.write(f"Pet {options['pet_id']} at {at.isoformat()} ({start} + {replayed} events)")
+        for field in EVENT_STATE_FIELDS:
+            self.stdout.write(f"  {field:<18}{state.get(field)}")
+
+        if options['events']:
+            for event in events:
+                self.stdout.write(f"  {event.created_at.isoformat()}  {event.kind:<14}{event.data}  {event.changes}")
+
+        if options['verify']:
+            pet = Pet.objects.filter(id=options['pet_id']).first()
+            if pet is None:
+                raise CommandError(f"Pet {options['pet_id']} no longer exists")
+            current = pet.event_state()
+            mismatched = [field for field in EVENT_STATE_FIELDS if current[field] != state.get(field)]
+            if mismatched:
+                raise CommandError(f"Replayed state differs from the stored pet in: {', '.join(mismatched)}")
+            self.stdout.write(self.style.SUCCESS("Replayed state matches the stored pet"))
@@ -0,0 +1,23 @@
+# pet_api/management/commands/rollup_interactions.py
+from django.core.management.base import BaseCommand
+
+from pet_api.rollups import reset_rollups, rollup_interactions
+
+
+class Command(BaseCommand):
+    help = "Count interactions added since the last run into the daily analytics rollups"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help="Interactions per transaction (default PET_ROLLUP_BATCH_SIZE)")
+        parser.add_argument('--rebuild', action='store_true', help=(
+            "Drop the rollups and recount every interaction still in the table "
+            "(needed after importing interactions with old ids; archived ones are lost)"
+        ))
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            reset_rollups()
+            self.stdout.write("Dropped the existing rollups")
+
+        counted = rollup_interactions(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rolled up {counted} interactions"))
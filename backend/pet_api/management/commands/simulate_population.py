@@ -0,0 +1,162 @@
+# pet_api/management/commands/simulate_population.py
+import csv
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from pet_api import simulation
+from pet_api.models import Pet
+
+
+def parse_assignments(values, convert):
+    """Parse repeated NAME=VALUE options into a dict"""
+    parsed = {}
+    for value in values or ():
+        name, sep, raw = value.partition('=')
+        if not sep:
+            raise CommandError(f"Expected NAME=VALUE, got {value!r}")
+        try:
+            parsed[name.strip()] = convert(raw)
+        except ValueError:
+            raise CommandError(f"Invalid value in {value!r}")
+    return parsed
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the game rules forward for a population of pets with synthetic players, "
+        "on every core, and write daily death, evolution and warning figures to CSV or "
+        "Parquet. Never writes to the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--spec', help=(
+            'JSON population spec: {"groups": [{"count": 100, "behaviour": "casual", '
+            '"pet_type": "cat", "stats": {"hunger": 500}}]}'
+        ))
+        parser.add_argument('--from-db', action='store_true',
+                            help="Start from a copy of the living pets in the database (read only)")
+        parser.add_argument('--pets', type=int, default=1000, help="Population size without --spec/--from-db")
+        parser.add_argument('--behaviour-mix', default='attentive=0.25,casual=0.5,neglectful=0.25',
+                            help=f"Share of each player behaviour ({', '.join(simulation.BEHAVIOURS)})")
+        parser.add_argument('--days', type=int, default=30, help="Game days to simulate")
+        parser.add_argument('--set', action='append', metavar='CONSTANT=VALUE',
+                            help=f"Override a constant ({', '.join(simulation.TUNABLE_CONSTANTS)})")
+        parser.add_argument('--decay', action='append', metavar='STATUS.STAT=DELTA',
+                            help="Override a stat change per tick, e.g. alive.hunger=-4")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--chunk-size', type=int, default=200, help="Pets per pool task")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', default='-', help="CSV path, .parquet path, or - for stdout")
+
+    def handle(self, *args, **options):
+        constants = parse_assignments(options['set'], int)
+        decay = {
+            tuple(name.split('.', 1)): delta
+            for name, delta in parse_assignments(options['decay'], int).items()
+        }
+        try:
+            simulation.apply_overrides(constants, decay)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        rng = random.Random(options['seed'])
+        population = self.load_population(options, rng)
+        if not population:
+            raise CommandError("The population is empty")
+
+        size = options['chunk_size']
+        chunks = [
+            (population[i:i + size], options['days'], options['seed'] + i)
+            for i in range(0, len(population), size)
+        ]
+        self.stderr.write(
+            f"Simulating {len(population)} pets for {options['days']} days "
+            f"in {len(chunks)} chunks on {options['workers']} workers"
+        )
+
+        start = time.perf_counter()
+        total = {}
+        if options['workers'] > 1 and 'fork' in multiprocessing.get_all_start_methods():
+            # Forked workers must not share the parent's database connections
+            connections.close_all()
+            with multiprocessing.get_context('fork').Pool(options['workers']) as pool:
+                for results in pool.imap_unordered(simulation.simulate_chunk, chunks):
+                    simulation.merge_results(total, results)
+        else:
+            for chunk in chunks:
+                simulation.merge_results(total, simulation.simulate_chunk(chunk))
+        self.stderr.write(f"Simulated in {time.perf_counter() - start:.1f}s")
+
+        self.write_output(simulation.output_rows(total), options['output'])
+
+    def load_population(self, options, rng):
+        """A list of (pet fields, behaviour) pairs"""
+        if options['spec']:
+            return self.population_from_spec(options['spec'])
+
+        mix = parse_assignments(options['behaviour_mix'].split(','), float)
+        unknown = set(mix) - set(simulation.BEHAVIOURS)
+        if unknown:
+            raise CommandError(f"Unknown behaviours: {', '.join(sorted(unknown))}")
+        names, weights = list(mix), list(mix.values())
+
+        if options['from_db']:
+            rows = Pet.objects.exclude(status='deceased').values(*simulation.PET_FIELDS)
+            return [(row, rng.choices(names, weights)[0]) for row in rows.iterator()]
+
+        return [
+            ({'name': f"Pet {i}", 'pet_type': 'cat'}, rng.choices(names, weights)[0])
+            for i in range(options['pets'])
+        ]
+
+    def population_from_spec(self, path):
+        try:
+            with open(path) as f:
+                spec = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Can't read population spec: {e}")
+
+        population = []
+        for group in spec.get('groups', []):
+            behaviour = group.get('behaviour', 'casual')
+            if behaviour not in simulation.BEHAVIOURS:
+                raise CommandError(f"Unknown behaviour: {behaviour}")
+            fields = {
+                'pet_type': group.get('pet_type', 'cat'),
+                'stage': group.get('stage', 'baby'),
+                **group.get('stats', {}),
+            }
+            unknown = set(fields) - set(simulation.PET_FIELDS)
+            if unknown:
+                raise CommandError(f"Unknown pet fields in spec: {', '.join(sorted(unknown))}")
+            for i in range(group.get('count', 1)):
+                population.append(({**fields, 'name': f"{behaviour} {i}"}, behaviour))
+        return population
+
+    def write_output(self, rows, path):
+        if path.endswith('.parquet'):
+            try:
+                import pyarrow
+                import pyarrow.parquet
+            except ImportError:
+                raise CommandError("Parquet output needs pyarrow; write a .csv instead")
+            pyarrow.parquet.write_table(pyarrow.Table.from_pylist(list(rows)), path)
+        else:
+            f = sys.stdout if path == '-' else open(path, 'w', newline='')
+            try:
+                writer = csv.DictWriter(f, fieldnames=simulation.OUTPUT_COLUMNS)
+                writer.writeheader()
+                for row in rows:
+                    writer.writerow(row)
+            finally:
+                if f is not sys.stdout:
+                    f.close()
+        if path != '-':
+            self.stderr.write(f"Wrote {path}")
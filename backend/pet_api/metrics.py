@@ -0,0 +1,33 @@
+# pet_api/metrics.py
+"""
+Minimal in-process metrics: counters and gauges kept in memory per process and
+exposed through the admin-only ``api/metrics/`` endpoint.
+"""
+import threading
+from collections import defaultdict
+
+_lock = threading.Lock()
+_counters = defaultdict(int)
+_gauges = {}
+
+
+def incr(name, amount=1):
+    with _lock:
+        _counters[name] += amount
+
+
+def set_gauge(name, value):
+    with _lock:
+        _gauges[name] = value
+
+
+def observe_max(name, value):
+    """Keep the largest value seen for ``name``"""
+    with _lock:
+        if name not in _gauges or value > _gauges[name]:
+            _gauges[name] = value
+
+
+def snapshot():
+    with _lock:
+        return {'counters': dict(_counters), 'gauges': dict(_gauges)}
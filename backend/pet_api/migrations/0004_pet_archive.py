@@ -0,0 +1,59 @@
+# Generated by Django 5.2 on 2026-10-19 05:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_deceased_at(apps, schema_editor):
+    # The last tick is the closest we have to the time of death
+    Pet = apps.get_model('pet_api', 'Pet')
+    Pet.objects.filter(status='deceased', deceased_at__isnull=True).update(
+        deceased_at=models.F('last_stat_update')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pet_api', '0003_alter_pet_happiness_alter_pet_health_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedPet',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=100)),
+                ('pet_type', models.CharField(max_length=50)),
+                ('stage', models.CharField(choices=[('baby', 'Baby'), ('teen', 'Teen'), ('adult', 'Adult')], max_length=20)),
+                ('experience', models.IntegerField()),
+                ('created_at', models.DateTimeField()),
+                ('deceased_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('final_stats', models.JSONField()),
+                ('interactions', models.JSONField(default=list)),
+                ('interaction_count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='pet',
+            name='deceased_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_deceased_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='pet',
+            index=models.Index(condition=models.Q(('status', 'deceased'), _negated=True), fields=['owner'], name='pet_living_owner_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pet',
+            index=models.Index(condition=models.Q(('status', 'deceased'), _negated=True), fields=['last_stat_update'], name='pet_living_update_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedpet',
+            name='owner',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_pets', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
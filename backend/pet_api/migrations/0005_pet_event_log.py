@@ -0,0 +1,69 @@
+# Generated by Django 5.2 on 2026-10-19 05:42
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.utils import timezone
+
+STATE_FIELDS = [
+    'name', 'hunger', 'happiness', 'hygiene', 'sleep', 'health', 'stage', 'experience',
+    'status', 'sleep_start_time', 'last_stat_update', 'deceased_at'
+]
+
+
+def snapshot_existing_pets(apps, schema_editor):
+    # Replay needs a starting point for pets that predate the event log
+    Pet = apps.get_model('pet_api', 'Pet')
+    PetSnapshot = apps.get_model('pet_api', 'PetSnapshot')
+    now = timezone.now()
+    snapshots = []
+    for pet in Pet.objects.iterator():
+        state = {}
+        for field in STATE_FIELDS:
+            value = getattr(pet, field)
+            state[field] = value.isoformat() if hasattr(value, 'isoformat') else value
+        snapshots.append(PetSnapshot(pet_id=pet.id, taken_at=now, last_event_id=0, state=state))
+    PetSnapshot.objects.bulk_create(snapshots, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pet_api', '0004_pet_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pet',
+            name='events_since_snapshot',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='PetEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('created', 'Created'), ('tick', 'Tick'), ('interaction', 'Interaction'), ('simulation', 'Simulated time'), ('status_change', 'Status change'), ('evolution', 'Evolution'), ('update', 'Update')], max_length=20)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('changes', models.JSONField(default=dict)),
+                ('data', models.JSONField(default=dict)),
+                ('pet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='pet_api.pet')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['pet', 'created_at'], name='pet_event_pet_time_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PetSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('taken_at', models.DateTimeField()),
+                ('last_event_id', models.BigIntegerField()),
+                ('state', models.JSONField()),
+                ('pet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='pet_api.pet')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['pet', 'taken_at'], name='pet_snapshot_pet_time_idx')],
+            },
+        ),
+        migrations.RunPython(snapshot_existing_pets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-19 05:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pet_api', '0005_pet_event_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TickRun',
+            fields=[
+                ('generation', models.BigAutoField(primary_key=True, serialize=False)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('last_pet_id', models.BigIntegerField(default=0)),
+                ('ticked', models.IntegerField(default=0)),
+                ('failed', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='pet',
+            name='last_tick_generation',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
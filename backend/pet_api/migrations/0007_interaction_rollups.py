@@ -0,0 +1,66 @@
+# Generated by Django 5.2 on 2026-10-19 05:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pet_api', '0006_tick_generations'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InteractionRollupWatermark',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('last_interaction_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyActionCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('pet_type', models.CharField(max_length=50)),
+                ('action', models.CharField(max_length=50)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'pet_type', 'action'), name='daily_action_count_key')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyOwnerActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('action', models.CharField(max_length=50)),
+                ('count', models.IntegerField(default=0)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_activity', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['owner', 'day'], name='daily_owner_activity_idx')],
+                'constraints': [models.UniqueConstraint(fields=('day', 'owner', 'action'), name='daily_owner_activity_key')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyPetActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('pet_id', models.BigIntegerField()),
+                ('action', models.CharField(max_length=50)),
+                ('count', models.IntegerField(default=0)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_pet_activity', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['owner', 'day'], name='daily_pet_activity_owner_idx')],
+                'constraints': [models.UniqueConstraint(fields=('pet_id', 'day', 'action'), name='daily_pet_activity_key')],
+            },
+        ),
+    ]
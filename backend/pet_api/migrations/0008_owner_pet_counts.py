@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-19 06:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_living_pets(apps, schema_editor):
+    # Until the next rollup run refreshes them
+    Pet = apps.get_model('pet_api', 'Pet')
+    OwnerPetCount = apps.get_model('pet_api', 'OwnerPetCount')
+    rows = Pet.objects.exclude(status='deceased').order_by().values('owner_id').annotate(n=Count('id'))
+    OwnerPetCount.objects.bulk_create(
+        [OwnerPetCount(owner_id=row['owner_id'], living_pets=row['n']) for row in rows], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('pet_api', '0007_interaction_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OwnerPetCount',
+            fields=[
+                ('owner', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='pet_count', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('living_pets', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(count_living_pets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 06:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pet_api', '0008_owner_pet_counts'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='archivedpet',
+            name='id',
+            field=models.BigIntegerField(primary_key=True, serialize=False),
+        ),
+    ]
@@ -1,11 +1,18 @@
-from django.db import models
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import BooleanField, Case, Q, Value, When
 from django.contrib.auth.models import User
 from django.utils import timezone
+import copy
 import math
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+from datetime import datetime, timedelta
 import json
 
+from . import notifications, pet_cache, presence
+from .profiling import profiled
+from .notifications import owner_group, pet_group
+
 # Define constants to replace magic numbers
 MAX_STAT = 1000
 CRITICAL_STAT_THRESHOLD = 200
@@ -15,6 +22,166 @@ FULL_SLEEP_THRESHOLD = 1000
 DEFAULT_STAT = 700  # 70% of max
 EVOLUTION_EXP_TEEN = 100
 EVOLUTION_EXP_ADULT = 200
+STAT_UPDATE_INTERVAL = timedelta(minutes=5)  # One game tick
+
+# Stat change per tick for each status (deceased pets don't change)
+STAT_CHANGES_PER_INTERVAL = {
+    'alive': {'hunger': -3, 'happiness': -2, 'hygiene': -2, 'sleep': -3},
+    'sleeping': {'hunger': -2, 'happiness': -1, 'hygiene': -1, 'sleep': 30},
+    'sick': {'hunger': -4, 'happiness': -3, 'hygiene': -3, 'sleep': -4},
+}
+
+# Warning sent for each stat below CRITICAL_STAT_THRESHOLD
+CRITICAL_STAT_WARNINGS = [
+    ('hunger', "{name} is very hungry!"),
+    ('happiness', "{name} is very unhappy!"),
+    ('hygiene', "{name} needs cleaning!"),
+    ('sleep', "{name} is very tired!"),
+]
+
+
+def critical_stat_flags():
+    """
+    Annotations computing critical_warnings() in SQL: one ``critical_<stat>``
+    boolean per CRITICAL_STAT_WARNINGS entry, in the same order
+    """
+    flags = {}
+    for stat, _ in CRITICAL_STAT_WARNINGS:
+        condition = Q(**{f'{stat}__lt': CRITICAL_STAT_THRESHOLD})
+        if stat == 'sleep':
+            # A sleeping pet is already taking care of it
+            condition &= ~Q(status='sleeping')
+        flags[f'critical_{stat}'] = Case(
+            When(condition, then=Value(True)), default=Value(False), output_field=BooleanField()
+        )
+    return flags
+
+
+def _critical_stats_messages(owner_id, warnings_by_pet, owner_listening, pet_ids):
+    """(group, message) pairs for notify_critical_stats()"""
+    timestamp = timezone.now().timestamp()
+    messages = []
+    if owner_listening:
+        messages.append((owner_group(owner_id), {
+            'type': 'pet_update',
+            'pet_id': None,
+            'update_type': 'critical_stats_batch',
+            'data': {
+                'pets': [
+                    {'pet_id': pet_id, 'warnings': warnings}
+                    for pet_id, warnings in warnings_by_pet.items()
+                ],
+                'timestamp': timestamp
+            }
+        }))
+    for pet_id in pet_ids:
+        messages.append((pet_group(pet_id), {
+            'type': 'pet_update',
+            'pet_id': pet_id,
+            'update_type': 'critical_stats',
+            'data': {'warnings': warnings_by_pet[pet_id], 'timestamp': timestamp}
+        }))
+    return messages
+
+
+def notify_critical_stats(owner_id, warnings_by_pet):
+    """
+    Send the critical_stats warnings of many of an owner's pets at once: a single
+    critical_stats_batch message to the owner group, and the usual per-pet
+    message only to pets that have their own subscribers
+    """
+    if not warnings_by_pet:
+        return
+    if presence.is_enabled():
+        owner_listening, pet_ids = presence.batch_listeners(owner_id, warnings_by_pet)
+    else:
+        owner_listening, pet_ids = True, list(warnings_by_pet)
+
+    try:
+        for group_name, message in _critical_stats_messages(
+                owner_id, warnings_by_pet, owner_listening, pet_ids):
+            notifications.send(group_name, message)
+    except Exception as e:
+        print(f"WebSocket error for owner {owner_id}: {str(e)}")
+
+
+async def anotify_critical_stats(owner_id, warnings_by_pet):
+    """Async version of notify_critical_stats()"""
+    if not warnings_by_pet:
+        return
+    if presence.is_enabled():
+        owner_listening, pet_ids = await presence.abatch_listeners(owner_id, warnings_by_pet)
+    else:
+        owner_listening, pet_ids = True, list(warnings_by_pet)
+
+    results = await notifications.send_all(
+        list(_critical_stats_messages(owner_id, warnings_by_pet, owner_listening, pet_ids))
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            print(f"WebSocket error for owner {owner_id}: {str(result)}")
+
+
+# Pet fields recorded by the event log and in snapshots
+EVENT_STATE_FIELDS = [
+    'name', 'hunger', 'happiness', 'hygiene', 'sleep', 'health', 'stage', 'experience',
+    'status', 'sleep_start_time', 'last_stat_update', 'deceased_at'
+]
+DATETIME_STATE_FIELDS = {'sleep_start_time', 'last_stat_update', 'deceased_at'}
+
+
+def encode_state_value(field, value):
+    if field in DATETIME_STATE_FIELDS and value is not None:
+        return value.isoformat()
+    return value
+
+
+def decode_state_value(field, value):
+    if field in DATETIME_STATE_FIELDS and value is not None:
+        return datetime.fromisoformat(value)
+    return value
+
+
+class InteractionRejected(Exception):
+    """An interaction the pet can't take right now; ``status`` is the HTTP status to answer with"""
+    def __init__(self, detail, status=400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status = status
+
+
+class PetQuerySet(models.QuerySet):
+    """
+    update() and bulk_update() don't send post_save, so they drop the affected
+    owners' cached pets (see pet_cache) themselves.
+    """
+    def update(self, **kwargs):
+        owner_ids = set()
+        if pet_cache.is_enabled():
+            owner_ids.update(self.order_by().values_list('owner_id', flat=True).distinct())
+            if 'owner' in kwargs or 'owner_id' in kwargs:
+                owner = kwargs.get('owner', kwargs.get('owner_id'))
+                owner_ids.add(getattr(owner, 'pk', owner))
+        rows = super().update(**kwargs)
+        for owner_id in owner_ids:
+            pet_cache.invalidate(owner_id)
+        return rows
+
+    update.alters_data = True
+
+    def bulk_update(self, objs, fields, batch_size=None):
+        objs = list(objs)
+        rows = super().bulk_update(objs, fields, batch_size=batch_size)
+        if pet_cache.is_enabled():
+            owner_ids = {pet.owner_id for pet in objs}
+            # A moved pet was cached under its previous owner as well
+            owner_ids.update(getattr(pet, '_loaded_owner_id', pet.owner_id) for pet in objs)
+            for owner_id in owner_ids:
+                pet_cache.invalidate(owner_id)
+        return rows
+
+    bulk_update.alters_data = True
+
 
 class Pet(models.Model):
     name = models.CharField(max_length=100)
@@ -49,52 +216,161 @@ class Pet(models.Model):
     )
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='alive')
     sleep_start_time = models.DateTimeField(null=True, blank=True)  # Track when sleep started
+    deceased_at = models.DateTimeField(null=True, blank=True)  # Pets are archived some time after
+    events_since_snapshot = models.IntegerField(default=0)  # PetEvents written since the last PetSnapshot
+    last_tick_generation = models.BigIntegerField(default=0)  # Last TickRun that ticked this pet
+
+    objects = PetQuerySet.as_manager()
+    
+    class Meta:
+        # Deceased pets only wait for archival, so the hot indexes skip them
+        indexes = [
+            models.Index(fields=['owner'], name='pet_living_owner_idx', condition=~Q(status='deceased')),
+            models.Index(fields=['last_stat_update'], name='pet_living_update_idx', condition=~Q(status='deceased')),
+        ]
     
     def __str__(self):
         return f"{self.name} ({self.pet_type})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        pet = super().from_db(db, field_names, values)
+        # An owner change has to invalidate the previous owner's cached pets too
+        pet._loaded_owner_id = pet.owner_id
+        # Remember the stored state so save() can log what changed
+        if getattr(settings, 'PET_EVENT_LOG', False) and not pet.get_deferred_fields() & set(EVENT_STATE_FIELDS):
+            pet._logged_state = pet.event_state()
+        return pet
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        if kwargs.get('fields') is None:
+            self._logged_state = self.event_state()
+
+    def event_state(self):
+        """The EVENT_STATE_FIELDS as JSON-friendly values"""
+        return {field: encode_state_value(field, getattr(self, field)) for field in EVENT_STATE_FIELDS}
+
+    def log_event(self, kind, **data):
+        """Record an event (status change, evolution, ...) with the next save()"""
+        self.__dict__.setdefault('_pending_events', []).append(PetEvent(kind=kind, changes={}, data=data))
+
+    def save(self, *args, event=None, event_data=None, **kwargs):
+        """
+        Save, and append what changed since the last save to the event log.
+        ``event`` names the cause ('tick', 'interaction', ...), default 'update'.
+        Every PET_SNAPSHOT_EVERY events a snapshot of the full state is written.
+        """
+        if not getattr(settings, 'PET_EVENT_LOG', False):
+            self.__dict__.pop('_pending_events', None)
+            return super().save(*args, **kwargs)
+
+        state = self.event_state()
+        before = getattr(self, '_logged_state', None) or {}
+        changes = {
+            field: [before.get(field), value]
+            for field, value in state.items()
+            if field not in before or before[field] != value
+        }
+        events = self.__dict__.pop('_pending_events', [])
+        if changes or event:
+            kind = event or ('created' if self._state.adding else 'update')
+            events.append(PetEvent(kind=kind, changes=changes, data=event_data or {}))
+
+        self.events_since_snapshot += len(events)
+        # A snapshot marks the event it follows, so it waits for a save that logs one
+        snapshot_due = bool(events) and self.events_since_snapshot >= settings.PET_SNAPSHOT_EVERY
+        if snapshot_due:
+            self.events_since_snapshot = 0
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'events_since_snapshot'}
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            now = timezone.now()
+            for pet_event in events:
+                pet_event.pet_id = self.id
+                pet_event.created_at = now
+            PetEvent.objects.bulk_create(events)
+            if snapshot_due:
+                PetSnapshot.objects.create(pet_id=self.id, taken_at=now, last_event_id=events[-1].id, state=state)
+        self._logged_state = state
+
+    async def asave(self, *args, event=None, event_data=None, **kwargs):
+        # Model.asave() doesn't pass extra keyword arguments on to save()
+        return await sync_to_async(self.save)(*args, event=event, event_data=event_data, **kwargs)
+
+    def _build_update(self, update_type, data=None):
+        return {
+            'type': 'pet_update',
+            'pet_id': self.id,
+            'update_type': update_type,
+            'data': {
+                **(data or {}),
+                'timestamp': timezone.now().timestamp()  # Add timestamp
+            }
+        }
+
     def send_update_to_owner(self, update_type, data=None):
         """Send a WebSocket update to the pet owner"""
-        print(f"Attempting to send update: {update_type} for pet {self.id}, data: {data}")
+        # Async callers collect updates and await them with aflush_updates()
+        if getattr(self, '_outbox', None) is not None:
+            self._outbox.append(self._build_update(update_type, data))
+            return
 
-        channel_layer = get_channel_layer()
-        
-        if not channel_layer:
-            print("No channel layer available!")
+        # Only groups with someone listening; offline owners get nothing and
+        # will fetch current state when they reconnect
+        if presence.is_enabled():
+            group_names = presence.listening_groups(self.owner_id, self.id)
+        else:
+            group_names = [pet_group(self.id), owner_group(self.owner_id)]
+        if not group_names:
             return
-            
+
+        print(f"Attempting to send update: {update_type} for pet {self.id}, data: {data}")
+
         try:
-            # For authenticated users
-            if self.owner and hasattr(self.owner, 'id'):
-                group_name = f"pet_updates_{self.owner.id}"
-                print(f"Sending to group: {group_name}")
-            else:
-                # For anonymous users during development
-                group_name = "pet_updates_anonymous"
-                print(f"Sending to anonymous group")
-            
             # if update_type == 'critical_stats':
             #     print(f"CRITICAL STATS SENDING: petID={self.id}, data={data}")
 
-            async_to_sync(channel_layer.group_send)(
-                group_name,
-                {
-                    'type': 'pet_update',
-                    'pet_id': self.id,
-                    'update_type': update_type,
-                    'data': {
-                        **(data or {}),
-                        'timestamp': timezone.now().timestamp()  # Add timestamp
-                    }
-                }
-            )
-            print(f"Successfully sent {update_type} update")
+            message = self._build_update(update_type, data)
+            for group_name in group_names:
+                print(f"Sending to group: {group_name}")
+                notifications.send(group_name, message)
+            print(f"Successfully queued {update_type} update")
         except Exception as e:
             # Log the error but don't interrupt pet updates
             print(f"WebSocket error for pet {self.id}: {str(e)}")
+
+    def collect_updates(self):
+        """Hold back WebSocket updates from now on until aflush_updates() is awaited"""
+        self._outbox = []
+
+    async def aflush_updates(self):
+        """Send the updates collected since collect_updates(), awaiting the channel layer directly"""
+        outbox, self._outbox = getattr(self, '_outbox', None) or [], None
+        if not outbox:
+            return
+
+        if presence.is_enabled():
+            group_names = await presence.alistening_groups(self.owner_id, self.id)
+        else:
+            group_names = [pet_group(self.id), owner_group(self.owner_id)]
+
+        # Updates to the same group go out in the order they were made
+        results = await notifications.send_all(
+            [(group_name, message) for message in outbox for group_name in group_names]
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                print(f"WebSocket error for pet {self.id}: {str(result)}")
         
-    def update_stats(self):
-        """Update pet stats based on time passed since last update"""
+    @profiled('Pet.update_stats')
+    def update_stats(self, generation=None):
+        """
+        Update pet stats based on time passed since last update. ``generation``
+        is the TickRun doing the update, if any.
+        """
         now = timezone.now()
         
         # Store initial values to detect changes
@@ -120,9 +396,165 @@ class Pet(models.Model):
         
         # Update timestamp and save
         self.last_stat_update = now
-        self.save()
+        if generation is not None:
+            # A retried tick from an older run mustn't move the marker back
+            self.last_tick_generation = max(self.last_tick_generation, generation)
+        self.save(event='tick')
+
+        # A new status means new decay rates, so the next critical alert moves
+        if self.status != old_status:
+            from .alerts import schedule_critical_alert
+            schedule_critical_alert(self)
         
         return self
+
+    def apply_action(self, action):
+        """
+        Apply an owner interaction (FEED, PLAY, ...) to the pet's stats without saving.
+        Raises InteractionRejected if the action isn't possible. Returns True when
+        the action only woke the pet up, which isn't recorded as an interaction.
+        """
+        # If pet is deceased, no interactions are possible
+        if self.status == 'deceased':
+            raise InteractionRejected("This pet has passed away and cannot be interacted with.")
+        
+        if not action:
+            raise InteractionRejected("Action parameter is required.")
+        
+        # Handle different interaction types
+        if action == 'FEED':
+            if self.status == 'sleeping':
+                raise InteractionRejected("You can't feed your pet while it's sleeping.")
+            self.hunger = MAX_STAT  # Fill hunger to max
+            self.health = min(MAX_STAT, self.health + 50) if self.health < MAX_STAT else self.health
+            
+        elif action == 'PLAY':
+            if self.status == 'sleeping':
+                raise InteractionRejected("You can't play with your pet while it's sleeping.")
+            if self.sleep < CRITICAL_STAT_THRESHOLD / 2:  # 10% of max
+                raise InteractionRejected("Your pet is too tired to play.")
+            self.happiness = MAX_STAT  # Fill happiness to max
+            self.hygiene = max(0, self.hygiene - 50)  # Reduce hygiene
+            self.sleep = max(0, self.sleep - 100)  # Playing makes pet more tired
+            self.experience += 5
+            
+        elif action == 'CLEAN':
+            if self.status == 'sleeping':
+                raise InteractionRejected("You can't clean your pet while it's sleeping.")
+            self.hygiene = MAX_STAT  # Fill hygiene to max
+            
+        elif action == 'SLEEP':
+            if self.status == 'sleeping':
+                # Wake up the pet
+                self.status = 'alive'
+                self.sleep_start_time = None
+                return True
+            
+            # Put pet to sleep
+            self.status = 'sleeping'
+            self.sleep_start_time = timezone.now()
+            
+        elif action == 'MEDICINE':
+            if self.status != 'sick':
+                raise InteractionRejected("Your pet is not sick.")
+            self.health = min(MAX_STAT, self.health + 300)
+            if self.health >= SICK_HEALTH_THRESHOLD:
+                self.status = 'alive'
+            
+        elif action == 'HEAL':
+            if self.status == 'sleeping':
+                raise InteractionRejected("You can't heal your pet while it's sleeping.")
+            # Increase health
+            health_before = self.health
+            self.health = min(MAX_STAT, self.health + 200)
+            
+            # If pet was sick and health is now above threshold, recover
+            if self.status == 'sick' and self.health >= SICK_HEALTH_THRESHOLD:
+                self.status = 'alive'
+                
+            # If health didn't change, pet is already at max health
+            if health_before == self.health:
+                raise InteractionRejected("Your pet is already at perfect health.", status=200)
+                
+        elif action == 'TREAT':
+            if self.status == 'sleeping':
+                raise InteractionRejected("You can't give treats to your pet while it's sleeping.")
+            # Give a treat - improves health and happiness
+            self.health = min(MAX_STAT, self.health + 100)
+            self.happiness = min(MAX_STAT, self.happiness + 150)
+            self.hunger = max(0, self.hunger + 20)  # Small decrease in hunger
+            
+            # If pet was sick and health is now above threshold, recover
+            if self.status == 'sick' and self.health >= SICK_HEALTH_THRESHOLD:
+                self.status = 'alive'
+        
+        else:
+            raise InteractionRejected(f"Unknown action: {action}")
+        
+        return False
+
+    def catch_up(self, now=None):
+        """
+        Apply every full tick owed since last_stat_update (adaptive scheduler).
+        Returns the number of ticks applied; the caller is responsible for saving.
+        """
+        now = now or timezone.now()
+        if self.status == 'deceased':
+            return 0
+
+        owed = int((now - self.last_stat_update) / STAT_UPDATE_INTERVAL)
+        if owed <= 0:
+            return 0
+
+        old_stage = self.stage
+        for _ in range(owed):
+            old_status = self.status
+            self._check_auto_wakeup()
+            self._apply_interval_changes()
+            self._check_health_status(old_status)
+            if self.status == 'deceased':
+                break
+
+        if self.status != 'deceased':
+            self._check_evolution(old_stage)
+            self._check_critical_stats()
+
+        # Keep the unfinished part of the current tick for next time
+        self.last_stat_update += owed * STAT_UPDATE_INTERVAL
+        return owed
+
+    def intervals_until_next_event(self, limit):
+        """
+        Count the ticks until this pet next changes state: waking up, getting sick,
+        recovering, dying, or a change in which stats are critical. Decay rates are
+        fixed per status, so we step a throwaway copy forward. Returns ``limit`` if
+        nothing happens sooner.
+        """
+        probe = copy.copy(self)
+        probe._pending_events = []
+        start = probe._event_signature()
+        for n in range(1, limit + 1):
+            probe._check_auto_wakeup()
+            probe._apply_interval_changes()
+            if probe.health <= 0:
+                return n
+            if probe.health < SICK_HEALTH_THRESHOLD and probe.status == 'alive':
+                probe.status = 'sick'
+            elif probe.health >= SICK_HEALTH_THRESHOLD and probe.status == 'sick':
+                probe.status = 'alive'
+            if probe._event_signature() != start:
+                return n
+        return limit
+
+    def _event_signature(self):
+        """Everything that, when it changes, the owner should hear about on time"""
+        return (
+            self.status,
+            self.hunger < CRITICAL_STAT_THRESHOLD,
+            self.happiness < CRITICAL_STAT_THRESHOLD,
+            self.hygiene < CRITICAL_STAT_THRESHOLD,
+            self.sleep < CRITICAL_STAT_THRESHOLD,
+        )
     
     def _check_evolution(self, old_stage=None):
         """Check if the pet should evolve based on experience"""
@@ -132,6 +564,7 @@ class Pet(models.Model):
         if self.experience >= EVOLUTION_EXP_TEEN and self.stage == 'baby':
             self.stage = 'teen'
             self.experience = 0
+            self.log_event('evolution', old_stage='baby', new_stage='teen')
             # Notify owner that pet evolved
             self.send_update_to_owner('evolution', {
                 'old_stage': 'baby',
@@ -141,6 +574,7 @@ class Pet(models.Model):
         elif self.experience >= EVOLUTION_EXP_ADULT and self.stage == 'teen':
             self.stage = 'adult'
             self.experience = 0
+            self.log_event('evolution', old_stage='teen', new_stage='adult')
             # Notify owner that pet evolved
             self.send_update_to_owner('evolution', {
                 'old_stage': 'teen',
@@ -152,6 +586,8 @@ class Pet(models.Model):
         """Check and update health status"""
         if self.health <= 0 and old_status != 'deceased':
             self.status = 'deceased'
+            self.deceased_at = timezone.now()
+            self.log_event('status_change', old_status=old_status, new_status='deceased')
             self.send_update_to_owner('status_change', {
                 'old_status': old_status,
                 'new_status': 'deceased',
@@ -160,6 +596,7 @@ class Pet(models.Model):
         elif self.health < SICK_HEALTH_THRESHOLD and self.status == 'alive':
             if old_status != 'sick':
                 self.status = 'sick'
+                self.log_event('status_change', old_status=old_status, new_status='sick')
                 self.send_update_to_owner('status_change', {
                     'old_status': old_status,
                     'new_status': 'sick',
@@ -167,30 +604,30 @@ class Pet(models.Model):
                 })
         elif self.health >= SICK_HEALTH_THRESHOLD and self.status == 'sick':
             self.status = 'alive'
+            self.log_event('status_change', old_status='sick', new_status='alive')
             self.send_update_to_owner('status_change', {
                 'old_status': 'sick',
                 'new_status': 'alive',
                 'message': f"{self.name} has recovered and is feeling better!"
             })
 
-    def _check_critical_stats(self):
-        """Check for critically low stats and notify owner"""
+    def critical_warnings(self):
+        """Warnings for every stat currently below CRITICAL_STAT_THRESHOLD"""
         warnings = []
+        for stat, message in CRITICAL_STAT_WARNINGS:
+            if getattr(self, stat) >= CRITICAL_STAT_THRESHOLD:
+                continue
+            if stat == 'sleep' and self.status == "sleeping":
+                continue
+            warnings.append(message.format(name=self.name))
+        return warnings
 
+    def _check_critical_stats(self):
+        """Check for critically low stats and notify owner"""
         print(f"Checking critical stats for pet {self.id}: hunger={self.hunger}, happiness={self.happiness}, hygiene={self.hygiene}, sleep={self.sleep}")
         print(f"Critical threshold is {CRITICAL_STAT_THRESHOLD}")
         
-        if self.hunger < CRITICAL_STAT_THRESHOLD:
-            warnings.append(f"{self.name} is very hungry!")
-        
-        if self.happiness < CRITICAL_STAT_THRESHOLD:
-            warnings.append(f"{self.name} is very unhappy!")
-        
-        if self.hygiene < CRITICAL_STAT_THRESHOLD:
-            warnings.append(f"{self.name} needs cleaning!")
-        
-        if self.sleep < CRITICAL_STAT_THRESHOLD and self.status != "sleeping":
-            warnings.append(f"{self.name} is very tired!")
+        warnings = self.critical_warnings()
         
         # Always send an update with the current warnings
         # If warnings list is empty, it will clear the previous warnings
@@ -200,27 +637,39 @@ class Pet(models.Model):
         
         if not warnings:
             print("No critical stats detected")
+
+    def critical_stat_etas(self):
+        """
+        The moment each stat will drop below CRITICAL_STAT_THRESHOLD at the decay
+        rate of the current status. Stats already critical, or rising, are left out.
+        """
+        etas = {}
+        for stat, delta in STAT_CHANGES_PER_INTERVAL.get(self.status, {}).items():
+            value = getattr(self, stat)
+            if delta >= 0 or value < CRITICAL_STAT_THRESHOLD:
+                continue
+            intervals = (value - CRITICAL_STAT_THRESHOLD + 1) / -delta
+            etas[stat] = self.last_stat_update + intervals * STAT_UPDATE_INTERVAL
+        return etas
+
+    def projected(self, at):
+        """A copy of the pet with stats decayed up to ``at``; nothing is saved"""
+        probe = copy.copy(self)
+        probe._pending_events = []
+        factor = (at - self.last_stat_update) / STAT_UPDATE_INTERVAL
+        if factor > 0 and probe.status != 'deceased':
+            probe._apply_partial_interval_changes(factor)
+        return probe
     
     def _apply_interval_changes(self):
         """Apply stat changes for a single 5-minute interval"""
         # Apply status-specific stat changes
-        if self.status == 'alive':
-            self.hunger = max(0, self.hunger - 3)
-            self.happiness = max(0, self.happiness - 2)
-            self.hygiene = max(0, self.hygiene - 2)
-            self.sleep = max(0, self.sleep - 3)
-        elif self.status == 'sleeping':
-            self.hunger = max(0, self.hunger - 2)
-            self.happiness = max(0, self.happiness - 1)
-            self.hygiene = max(0, self.hygiene - 1)
-            self.sleep = min(MAX_STAT, self.sleep + 30)
-        elif self.status == 'sick':
-            self.hunger = max(0, self.hunger - 4)
-            self.happiness = max(0, self.happiness - 3)
-            self.hygiene = max(0, self.hygiene - 3)
-            self.sleep = max(0, self.sleep - 4)
-        else:  # deceased
+        changes = STAT_CHANGES_PER_INTERVAL.get(self.status)
+        if changes is None:  # deceased
             return  # No stat changes if deceased
+        for stat, delta in changes.items():
+            value = getattr(self, stat) + delta
+            setattr(self, stat, max(0, value) if delta < 0 else min(MAX_STAT, value))
         
         # Apply health effects
         # Health decreases if stats are critically low
@@ -236,21 +685,9 @@ class Pet(models.Model):
 
     def _apply_partial_interval_changes(self, factor):
         """Apply stat changes for a partial 5-minute interval"""
-        if self.status == 'alive':
-            self.hunger = max(0, self.hunger - int(3 * factor))
-            self.happiness = max(0, self.happiness - int(2 * factor))
-            self.hygiene = max(0, self.hygiene - int(2 * factor))
-            self.sleep = max(0, self.sleep - int(3 * factor))
-        elif self.status == 'sleeping':
-            self.hunger = max(0, self.hunger - int(2 * factor))
-            self.happiness = max(0, self.happiness - int(1 * factor))
-            self.hygiene = max(0, self.hygiene - int(1 * factor))
-            self.sleep = min(MAX_STAT, self.sleep + int(30 * factor))
-        elif self.status == 'sick':
-            self.hunger = max(0, self.hunger - int(4 * factor))
-            self.happiness = max(0, self.happiness - int(3 * factor))
-            self.hygiene = max(0, self.hygiene - int(3 * factor))
-            self.sleep = max(0, self.sleep - int(4 * factor))
+        for stat, delta in STAT_CHANGES_PER_INTERVAL.get(self.status, {}).items():
+            value = getattr(self, stat) + int(delta * factor)
+            setattr(self, stat, max(0, value) if delta < 0 else min(MAX_STAT, value))
         
         # Apply health effects (proportional to time factor)
         if self.hunger < CRITICAL_STAT_THRESHOLD or self.happiness < CRITICAL_STAT_THRESHOLD or self.hygiene < CRITICAL_STAT_THRESHOLD or self.sleep < CRITICAL_STAT_THRESHOLD:
@@ -282,4 +719,163 @@ class Interaction(models.Model):
     timestamp = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
-        return f"{self.action} with {self.pet.name} at {self.timestamp}"
\ No newline at end of file
+        return f"{self.action} with {self.pet.name} at {self.timestamp}"
+
+
+class PetEvent(models.Model):
+    """
+    Append-only log of everything that changed a pet. ``changes`` maps each
+    EVENT_STATE_FIELDS field that changed to [old, new]; status_change and
+    evolution events only describe what happened in ``data``.
+    """
+    KINDS = (
+        ('created', 'Created'),
+        ('tick', 'Tick'),
+        ('interaction', 'Interaction'),
+        ('simulation', 'Simulated time'),
+        ('status_change', 'Status change'),
+        ('evolution', 'Evolution'),
+        ('update', 'Update'),
+    )
+    pet = models.ForeignKey(Pet, on_delete=models.CASCADE, related_name='events')
+    kind = models.CharField(max_length=20, choices=KINDS)
+    created_at = models.DateTimeField(default=timezone.now)
+    changes = models.JSONField(default=dict)
+    data = models.JSONField(default=dict)
+
+    class Meta:
+        indexes = [models.Index(fields=['pet', 'created_at'], name='pet_event_pet_time_idx')]
+
+    def __str__(self):
+        return f"{self.kind} for pet {self.pet_id} at {self.created_at}"
+
+
+class PetSnapshot(models.Model):
+    """Full EVENT_STATE_FIELDS state of a pet after event ``last_event_id``"""
+    pet = models.ForeignKey(Pet, on_delete=models.CASCADE, related_name='snapshots')
+    taken_at = models.DateTimeField()
+    last_event_id = models.BigIntegerField()
+    state = models.JSONField()
+
+    class Meta:
+        indexes = [models.Index(fields=['pet', 'taken_at'], name='pet_snapshot_pet_time_idx')]
+
+    def __str__(self):
+        return f"Snapshot of pet {self.pet_id} at {self.taken_at}"
+
+
+class ArchivedPet(models.Model):
+    """
+    A deceased pet moved out of the Pet table by the archiver, with its whole
+    interaction history packed into one row. Keeps the original pet id.
+    """
+    id = models.BigIntegerField(primary_key=True)  # Same range as Pet's BigAutoField
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_pets')
+    name = models.CharField(max_length=100)
+    pet_type = models.CharField(max_length=50)
+    stage = models.CharField(max_length=20, choices=Pet.STAGES)
+    experience = models.IntegerField()
+    created_at = models.DateTimeField()
+    deceased_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    # Final hunger/happiness/hygiene/sleep/health
+    final_stats = models.JSONField()
+    # [[action, unix timestamp], ...] oldest first
+    interactions = models.JSONField(default=list)
+    interaction_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} ({self.pet_type}, archived)"
+
+
+class TickRun(models.Model):
+    """
+    One generation of update_all_pets. Every living pet is ticked at most once
+    per generation; ``last_pet_id`` checkpoints how far the run got, so a
+    crashed run resumes there instead of starting over.
+    """
+    generation = models.BigAutoField(primary_key=True)
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    last_pet_id = models.BigIntegerField(default=0)
+    ticked = models.IntegerField(default=0)
+    failed = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"Tick generation {self.generation}"
+
+
+class InteractionRollupWatermark(models.Model):
+    """Highest Interaction id already counted in the daily rollups below"""
+    name = models.CharField(max_length=50, primary_key=True)
+    last_interaction_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} rolled up to interaction {self.last_interaction_id}"
+
+
+class DailyActionCount(models.Model):
+    """Interactions per day (UTC), pet type and action, kept by rollups.py"""
+    day = models.DateField()
+    pet_type = models.CharField(max_length=50)
+    action = models.CharField(max_length=50)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'pet_type', 'action'], name='daily_action_count_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.count} {self.action} for {self.pet_type}s on {self.day}"
+
+
+class DailyOwnerActivity(models.Model):
+    """Interactions per day (UTC), owner and action, kept by rollups.py"""
+    day = models.DateField()
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_activity')
+    action = models.CharField(max_length=50)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'owner', 'action'], name='daily_owner_activity_key'),
+        ]
+        indexes = [models.Index(fields=['owner', 'day'], name='daily_owner_activity_idx')]
+
+    def __str__(self):
+        return f"{self.count} {self.action} by owner {self.owner_id} on {self.day}"
+
+
+class DailyPetActivity(models.Model):
+    """
+    Interactions per day (UTC), pet and action, kept by rollups.py. ``pet_id``
+    isn't a foreign key so the history outlives archived pets.
+    """
+    day = models.DateField()
+    pet_id = models.BigIntegerField()
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_pet_activity')
+    action = models.CharField(max_length=50)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['pet_id', 'day', 'action'], name='daily_pet_activity_key'),
+        ]
+        indexes = [models.Index(fields=['owner', 'day'], name='daily_pet_activity_owner_idx')]
+
+    def __str__(self):
+        return f"{self.count} {self.action} for pet {self.pet_id} on {self.day}"
+
+
+class OwnerPetCount(models.Model):
+    """
+    Living pets per owner, refreshed by each rollups.py run so the owner
+    analytics don't have to count the hot Pet table on every request.
+    """
+    owner = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='pet_count')
+    living_pets = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"Owner {self.owner_id} has {self.living_pets} living pets"
@@ -0,0 +1,199 @@
+# pet_api/notifications.py
+"""
+Delivery of WebSocket notifications to the channel layer.
+
+Synchronous callers (Celery tasks, DRF views) used to wrap every group_send in
+async_to_sync, paying for an event loop hop per message. With
+PET_ASYNC_NOTIFICATIONS on, messages are instead handed to a per-process
+NotificationSender: a background thread running one long-lived event loop that
+drains a bounded queue and sends each batch concurrently. Messages for the same
+group are always sent one after another, so clients see them in order.
+"""
+import asyncio
+import atexit
+import os
+import queue
+import threading
+import time
+
+from asgiref.sync import async_to_sync
+from celery.signals import worker_process_shutdown
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+_STOP = object()
+
+
+def owner_group(owner_id):
+    """Group every owner-wide connection of the owner joins"""
+    return f"pet_updates_{owner_id}" if owner_id else "pet_updates_anonymous"
+
+
+def pet_group(pet_id):
+    """Group for connections subscribed to a single pet"""
+    return f"pet_{pet_id}"
+
+
+class NotificationSender:
+    """Background thread that publishes queued (group, message) pairs"""
+
+    def __init__(self, maxsize=10000, batch_size=100):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.batch_size = batch_size
+        self.sent = 0
+        self.dropped = 0
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        # Celery's prefork pool forks after import, so start lazily in each process
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                # A forked child inherits the parent's queue but not its thread
+                self.queue = queue.Queue(maxsize=self.queue.maxsize)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='pet-notifications', daemon=True)
+            self._thread.start()
+
+    def enqueue(self, group_name, message):
+        """Queue a message without blocking. Returns False if it had to be dropped."""
+        self._ensure_started()
+        try:
+            self.queue.put_nowait((group_name, message))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            print(f"Notification queue full, dropped update for {group_name}")
+            return False
+
+    def flush(self, timeout=None):
+        """Wait until everything queued so far has been sent. Returns False on timeout."""
+        if self._thread is None or not self._thread.is_alive():
+            return self.queue.unfinished_tasks == 0
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.queue.all_tasks_done:
+            while self.queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.queue.all_tasks_done.wait(remaining)
+        return True
+
+    def stop(self, timeout=None):
+        """Flush and stop the background thread"""
+        if self._thread is None or not self._thread.is_alive() or self._pid != os.getpid():
+            return
+        self.flush(timeout)
+        self.queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _run(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        channel_layer = get_channel_layer()
+        try:
+            while True:
+                batch = [self.queue.get()]
+                while len(batch) < self.batch_size and batch[-1] is not _STOP:
+                    try:
+                        batch.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                stop = batch[-1] is _STOP
+                messages = batch[:-1] if stop else batch
+                if messages:
+                    loop.run_until_complete(self._send_batch(channel_layer, messages))
+                for _ in batch:
+                    self.queue.task_done()
+                if stop:
+                    break
+        finally:
+            loop.close()
+
+    async def _send_batch(self, channel_layer, messages):
+        if not channel_layer:
+            print("No channel layer available!")
+            return
+        results = await send_all(messages, channel_layer.group_send)
+        for (group_name, _), result in zip(messages, results):
+            if isinstance(result, Exception):
+                print(f"WebSocket error sending to {group_name}: {str(result)}")
+            else:
+                self.sent += 1
+
+
+_sender = None
+
+
+def get_sender():
+    global _sender
+    if _sender is None:
+        _sender = NotificationSender(
+            maxsize=settings.PET_NOTIFICATION_QUEUE_SIZE,
+            batch_size=settings.PET_NOTIFICATION_BATCH_SIZE,
+        )
+    return _sender
+
+
+def send(group_name, message):
+    """Publish a message to a group from synchronous code"""
+    if getattr(settings, 'PET_ASYNC_NOTIFICATIONS', False):
+        return get_sender().enqueue(group_name, message)
+
+    channel_layer = get_channel_layer()
+    if not channel_layer:
+        print("No channel layer available!")
+        return False
+    async_to_sync(channel_layer.group_send)(group_name, message)
+    return True
+
+
+async def asend(group_name, message):
+    """Publish a message to a group from async code"""
+    channel_layer = get_channel_layer()
+    if not channel_layer:
+        print("No channel layer available!")
+        return False
+    await channel_layer.group_send(group_name, message)
+    return True
+
+
+async def send_all(messages, send=asend):
+    """
+    Send (group, message) pairs with ``send``, concurrently across groups but in
+    order within each one. Returns each send's result or exception, in order.
+    """
+    by_group = {}
+    for index, (group_name, message) in enumerate(messages):
+        by_group.setdefault(group_name, []).append((index, message))
+    results = [None] * len(messages)
+
+    async def send_group(group_name, indexed_messages):
+        for index, message in indexed_messages:
+            try:
+                results[index] = await send(group_name, message)
+            except Exception as e:
+                results[index] = e
+
+    await asyncio.gather(*(send_group(group_name, indexed) for group_name, indexed in by_group.items()))
+    return results
+
+
+def shutdown(timeout=5):
+    """Flush pending notifications before the process exits"""
+    if _sender is not None:
+        _sender.stop(timeout)
+
+
+atexit.register(shutdown)
+
+
+@worker_process_shutdown.connect
+def _flush_on_worker_shutdown(**kwargs):
+    shutdown()
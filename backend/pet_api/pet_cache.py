@@ -0,0 +1,113 @@
+# pet_api/pet_cache.py
+"""
+Cache of each owner's serialized pet list and single pets.
+
+Keys include a per-owner version number. Any write to one of the owner's pets
+(or to the owner) bumps the version once its transaction commits (see
+signals.py), so entries cached before the write are never read again and
+simply expire. Pet.objects' update() and bulk_update() bump it as well, since
+they skip the signals; any other write that bypasses save() (raw SQL, imports)
+has to call invalidate() for each owner it touched. Hits and misses are counted as ``pet_cache.<kind>.hit/miss``
+in metrics.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from . import metrics
+
+VERSION_KEY = 'pet_api:pets:version:{owner_id}'
+LIST_KEY = 'pet_api:pets:{owner_id}:{version}:list'
+DETAIL_KEY = 'pet_api:pets:{owner_id}:{version}:pet:{pet_id}'
+
+
+def is_enabled():
+    return getattr(settings, 'PET_LIST_CACHE', False)
+
+
+def _new_version():
+    # Start from the clock, so a version key lost to eviction never comes back
+    # with a number that old entries were stored under
+    return time.time_ns()
+
+
+def _bump(owner_id):
+    key = VERSION_KEY.format(owner_id=owner_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_version(), timeout=None)
+
+
+def invalidate(owner_id):
+    """Drop the owner's cached pets once the current transaction commits"""
+    def bump():
+        try:
+            _bump(owner_id)
+        except Exception as e:
+            print(f"Pet cache invalidation failed for owner {owner_id}: {str(e)}")
+    transaction.on_commit(bump)
+
+
+def _cached(kind, key_template, owner_id, load, **key_args):
+    if not is_enabled():
+        return load()
+    try:
+        version = cache.get_or_set(VERSION_KEY.format(owner_id=owner_id), _new_version, timeout=None)
+        key = key_template.format(owner_id=owner_id, version=version, **key_args)
+        value = cache.get(key)
+    except Exception as e:
+        print(f"Pet cache read failed for owner {owner_id}: {str(e)}")
+        return load()
+
+    if value is not None:
+        metrics.incr(f'pet_cache.{kind}.hit')
+        return value
+    metrics.incr(f'pet_cache.{kind}.miss')
+    value = load()
+    if value is not None:
+        cache.set(key, value, timeout=settings.PET_LIST_CACHE_TTL)
+    return value
+
+
+async def _acached(kind, key_template, owner_id, load, **key_args):
+    if not is_enabled():
+        return await load()
+    try:
+        version = await cache.aget_or_set(VERSION_KEY.format(owner_id=owner_id), _new_version, timeout=None)
+        key = key_template.format(owner_id=owner_id, version=version, **key_args)
+        value = await cache.aget(key)
+    except Exception as e:
+        print(f"Pet cache read failed for owner {owner_id}: {str(e)}")
+        return await load()
+
+    if value is not None:
+        metrics.incr(f'pet_cache.{kind}.hit')
+        return value
+    metrics.incr(f'pet_cache.{kind}.miss')
+    value = await load()
+    if value is not None:
+        await cache.aset(key, value, timeout=settings.PET_LIST_CACHE_TTL)
+    return value
+
+
+def get_list(owner_id, load):
+    """The owner's serialized pets, from the cache or ``load()``"""
+    return _cached('list', LIST_KEY, owner_id, load)
+
+
+def get_detail(owner_id, pet_id, load):
+    """One serialized pet, from the cache or ``load()``; None results aren't cached"""
+    return _cached('detail', DETAIL_KEY, owner_id, load, pet_id=pet_id)
+
+
+async def aget_list(owner_id, load):
+    """Async version of get_list(); ``load`` is a coroutine function"""
+    return await _acached('list', LIST_KEY, owner_id, load)
+
+
+async def aget_detail(owner_id, pet_id, load):
+    """Async version of get_detail(); ``load`` is a coroutine function"""
+    return await _acached('detail', DETAIL_KEY, owner_id, load, pet_id=pet_id)
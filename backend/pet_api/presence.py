@@ -0,0 +1,198 @@
+# pet_api/presence.py
+"""
+Tracks which owners currently have a WebSocket open, and what they listen to.
+
+Each open connection is a member of per-owner sorted sets, scored by when it
+expires. Connections refresh their score with a heartbeat, so the sets behave
+as refcounts that also clean up after workers that died without running
+``disconnect``. A connection is either owner-wide (joined the owner's group) or
+subscribed to specific pets (joined ``pet_{id}`` groups), and is recorded in
+the matching set so publishers can target only the groups that have listeners.
+Owners nobody is listening for are skipped entirely; those clients load fresh
+state over REST when they reconnect.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .notifications import owner_group, pet_group
+from .redis_client import get_redis, get_async_redis
+
+PRESENCE_KEY = 'pet_api:presence:{owner_id}'  # every connection of the owner
+OWNER_WIDE_KEY = 'pet_api:presence:{owner_id}:all'  # connections in the owner group
+PET_KEY = 'pet_api:presence:pet:{pet_id}'  # connections subscribed to one pet
+
+# key -> (checked_at, listeners), oldest check first; saves Redis round trips
+# for every message in a tick. Bounded so long-running workers don't keep an
+# entry for every owner and pet they ever looked up.
+_listener_cache = OrderedDict()
+_listener_cache_lock = threading.Lock()
+MAX_CACHED_KEYS = 10000
+
+
+def is_enabled():
+    return getattr(settings, 'PET_PRESENCE_TRACKING', False)
+
+
+async def mark_online(owner_id, channel_name, pet_ids=()):
+    """Add (or refresh) one connection, either owner-wide or for the given pets"""
+    ttl = settings.PET_PRESENCE_TTL
+    expires = time.time() + ttl
+    keys = [PRESENCE_KEY.format(owner_id=owner_id)]
+    if pet_ids:
+        keys += [PET_KEY.format(pet_id=pet_id) for pet_id in pet_ids]
+    else:
+        keys.append(OWNER_WIDE_KEY.format(owner_id=owner_id))
+
+    pipe = get_async_redis().pipeline()
+    if pet_ids:
+        pipe.zrem(OWNER_WIDE_KEY.format(owner_id=owner_id), channel_name)
+    for key in keys:
+        pipe.zadd(key, {channel_name: expires})
+        pipe.expire(key, ttl)
+    await pipe.execute()
+
+
+async def forget_pet(pet_id, channel_name):
+    """Drop one pet subscription of a connection"""
+    await get_async_redis().zrem(PET_KEY.format(pet_id=pet_id), channel_name)
+
+
+async def mark_offline(owner_id, channel_name, pet_ids=()):
+    keys = [PRESENCE_KEY.format(owner_id=owner_id), OWNER_WIDE_KEY.format(owner_id=owner_id)]
+    keys += [PET_KEY.format(pet_id=pet_id) for pet_id in pet_ids]
+    pipe = get_async_redis().pipeline()
+    for key in keys:
+        pipe.zrem(key, channel_name)
+        pipe.zremrangebyscore(key, '-inf', time.time())
+    await pipe.execute()
+
+
+def _cached_counts(keys, now):
+    """Split keys into cached counts and keys that need a Redis lookup"""
+    counts = {}
+    missing = []
+    with _listener_cache_lock:
+        for key in keys:
+            cached = _listener_cache.get(key)
+            if cached and now - cached[0] < settings.PET_PRESENCE_CACHE_SECONDS:
+                counts[key] = cached[1]
+            else:
+                missing.append(key)
+    return counts, missing
+
+
+def _remember_counts(counts, now):
+    """Cache fresh counts, dropping expired entries and the oldest beyond MAX_CACHED_KEYS"""
+    with _listener_cache_lock:
+        for key, count in counts.items():
+            _listener_cache[key] = (now, count)
+            _listener_cache.move_to_end(key)
+        while _listener_cache:
+            key, (checked_at, _) = next(iter(_listener_cache.items()))
+            if len(_listener_cache) <= MAX_CACHED_KEYS and now - checked_at < settings.PET_PRESENCE_CACHE_SECONDS:
+                break
+            del _listener_cache[key]
+
+
+def _count_listeners(keys):
+    """Live connection count for each key, using the short-lived local cache"""
+    now = time.time()
+    counts, missing = _cached_counts(keys, now)
+    if missing:
+        pipe = get_redis().pipeline()
+        for key in missing:
+            pipe.zcount(key, now, '+inf')
+        fresh = dict(zip(missing, pipe.execute()))
+        _remember_counts(fresh, now)
+        counts.update(fresh)
+    return counts
+
+
+async def _acount_listeners(keys):
+    now = time.time()
+    counts, missing = _cached_counts(keys, now)
+    if missing:
+        pipe = get_async_redis().pipeline()
+        for key in missing:
+            pipe.zcount(key, now, '+inf')
+        fresh = dict(zip(missing, await pipe.execute()))
+        _remember_counts(fresh, now)
+        counts.update(fresh)
+    return counts
+
+
+def is_owner_online(owner_id):
+    """True if the owner has at least one live connection"""
+    key = PRESENCE_KEY.format(owner_id=owner_id)
+    try:
+        return _count_listeners([key])[key] > 0
+    except Exception as e:
+        # If we can't tell, send anyway rather than lose updates
+        print(f"Presence check failed for owner {owner_id}: {str(e)}")
+        return True
+
+
+def listening_groups(owner_id, pet_id):
+    """The groups with someone listening for updates about this pet"""
+    keys = [PET_KEY.format(pet_id=pet_id), OWNER_WIDE_KEY.format(owner_id=owner_id)]
+    try:
+        counts = _count_listeners(keys)
+    except Exception as e:
+        print(f"Presence check failed for owner {owner_id}: {str(e)}")
+        return [pet_group(pet_id), owner_group(owner_id)]
+    return _groups_with_listeners(owner_id, pet_id, counts)
+
+
+async def alistening_groups(owner_id, pet_id):
+    """Async version of listening_groups()"""
+    keys = [PET_KEY.format(pet_id=pet_id), OWNER_WIDE_KEY.format(owner_id=owner_id)]
+    try:
+        counts = await _acount_listeners(keys)
+    except Exception as e:
+        print(f"Presence check failed for owner {owner_id}: {str(e)}")
+        return [pet_group(pet_id), owner_group(owner_id)]
+    return _groups_with_listeners(owner_id, pet_id, counts)
+
+
+def _groups_with_listeners(owner_id, pet_id, counts):
+    wide_key = OWNER_WIDE_KEY.format(owner_id=owner_id)
+    pet_key = PET_KEY.format(pet_id=pet_id)
+    groups = []
+    if counts[pet_key]:
+        groups.append(pet_group(pet_id))
+    if counts[wide_key]:
+        groups.append(owner_group(owner_id))
+    return groups
+
+
+def batch_listeners(owner_id, pet_ids):
+    """
+    For an update covering several of the owner's pets: whether the owner group
+    has listeners, and which of the pets have subscribers of their own
+    """
+    keys = [OWNER_WIDE_KEY.format(owner_id=owner_id)] + [PET_KEY.format(pet_id=pet_id) for pet_id in pet_ids]
+    try:
+        counts = _count_listeners(keys)
+    except Exception as e:
+        print(f"Presence check failed for owner {owner_id}: {str(e)}")
+        return True, list(pet_ids)
+    return _batch_listeners(owner_id, pet_ids, counts)
+
+
+async def abatch_listeners(owner_id, pet_ids):
+    """Async version of batch_listeners()"""
+    keys = [OWNER_WIDE_KEY.format(owner_id=owner_id)] + [PET_KEY.format(pet_id=pet_id) for pet_id in pet_ids]
+    try:
+        counts = await _acount_listeners(keys)
+    except Exception as e:
+        print(f"Presence check failed for owner {owner_id}: {str(e)}")
+        return True, list(pet_ids)
+    return _batch_listeners(owner_id, pet_ids, counts)
+
+
+def _batch_listeners(owner_id, pet_ids, counts):
+    owner_listening = counts[OWNER_WIDE_KEY.format(owner_id=owner_id)] > 0
+    return owner_listening, [pet_id for pet_id in pet_ids if counts[PET_KEY.format(pet_id=pet_id)]]
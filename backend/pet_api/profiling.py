@@ -0,0 +1,166 @@
+# pet_api/profiling.py
+"""
+Opt-in sampling profiler for the tick and request hot paths.
+
+With PET_PROFILING on, a PET_PROFILE_SAMPLE_RATE fraction of the code wrapped in
+``profile(name)`` (or decorated with ``@profiled(name)``) is captured: a
+background thread samples the running thread's stack every
+PET_PROFILE_INTERVAL seconds, and every SQL query the thread runs is timed
+through ``connection.execute_wrapper``. Nested hooks inside a captured block
+don't start a capture of their own.
+
+Each capture is written to PET_PROFILE_DIR as ``<name>-<time>.folded`` (one
+``frame;frame;frame count`` line per stack, the input format of flamegraph.pl,
+speedscope and inferno) with a ``.json`` next to it holding the duration and
+SQL timings. Only the newest PET_PROFILE_MAX_FILES captures are kept. The
+``profile_summary`` command summarises the hottest frames and queries.
+"""
+import contextlib
+import functools
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+_local = threading.local()
+
+MAX_SQL_LENGTH = 300  # characters of each query kept in the summary
+
+
+def is_enabled():
+    return getattr(settings, 'PET_PROFILING', False)
+
+
+def frame_label(code):
+    # Semicolons separate frames in the folded format
+    filename = os.path.basename(code.co_filename)
+    name = getattr(code, 'co_qualname', code.co_name)
+    return f"{name} ({filename}:{code.co_firstlineno})".replace(';', ':')
+
+
+class Sampler(threading.Thread):
+    """Counts the stacks of one thread until stopped"""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name='pet-profiler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(frame_label(frame.f_code))
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class SQLTimer:
+    """execute_wrapper that adds up the time spent in each query"""
+
+    def __init__(self):
+        self.queries = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            entry = self.queries.setdefault(sql[:MAX_SQL_LENGTH], [0, 0.0])
+            entry[0] += 1
+            entry[1] += elapsed
+
+
+def _rotate(directory, keep):
+    captures = sorted(directory.glob('*.folded'), key=lambda path: path.stat().st_mtime)
+    for path in captures[:max(len(captures) - keep, 0)]:
+        path.unlink(missing_ok=True)
+        path.with_suffix('.json').unlink(missing_ok=True)
+
+
+def write_capture(name, started_at, duration, sampler, sql_timer):
+    directory = Path(settings.PET_PROFILE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    stem = f"{name}-{started_at.strftime('%Y%m%dT%H%M%S%f')}-{os.getpid()}"
+
+    with open(directory / f'{stem}.folded', 'w') as folded:
+        for stack, count in sampler.stacks.most_common():
+            folded.write(f"{stack} {count}\n")
+
+    queries = sorted(sql_timer.queries.items(), key=lambda item: item[1][1], reverse=True)
+    with open(directory / f'{stem}.json', 'w') as meta:
+        json.dump({
+            'name': name,
+            'started_at': started_at.isoformat(),
+            'duration_ms': round(duration * 1000, 3),
+            'interval_ms': sampler.interval * 1000,
+            'samples': sampler.samples,
+            'sql_ms': round(sum(total for _, total in sql_timer.queries.values()) * 1000, 3),
+            'sql': [
+                {'sql': sql, 'count': count, 'total_ms': round(total * 1000, 3)}
+                for sql, (count, total) in queries
+            ],
+        }, meta, indent=1)
+
+    _rotate(directory, settings.PET_PROFILE_MAX_FILES)
+
+
+@contextlib.contextmanager
+def profile(name):
+    """Capture this block for a PET_PROFILE_SAMPLE_RATE fraction of runs"""
+    if (
+        not is_enabled()
+        or getattr(_local, 'active', False)
+        or random.random() >= settings.PET_PROFILE_SAMPLE_RATE
+    ):
+        yield
+        return
+
+    _local.active = True
+    sampler = Sampler(threading.get_ident(), settings.PET_PROFILE_INTERVAL)
+    sql_timer = SQLTimer()
+    started_at = timezone.now()
+    start = time.perf_counter()
+    sampler.start()
+    try:
+        with connection.execute_wrapper(sql_timer):
+            yield
+    finally:
+        duration = time.perf_counter() - start
+        sampler.stop()
+        _local.active = False
+        try:
+            write_capture(name, started_at, duration, sampler, sql_timer)
+        except OSError as e:
+            print(f"Could not write profile for {name}: {str(e)}")
+
+
+def profiled(name):
+    """Decorator version of profile()"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with profile(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,36 @@
+# pet_api/redis_client.py
+import weakref
+
+import redis
+from django.conf import settings
+
+_client = None
+
+
+def get_redis():
+    """Return the shared Redis client used for pet_api bookkeeping (schedules, locks, etc.)"""
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.PET_REDIS_URL, decode_responses=True)
+    return _client
+
+
+# Event loop -> client. Weak keys let a loop that's gone take its client with
+# it; clients of loops that were closed (e.g. by async_to_sync) are dropped on
+# the next call.
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_redis():
+    """Async Redis client for the running event loop (connections can't be shared between loops)"""
+    import asyncio
+    import redis.asyncio
+
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        for closed in [other for other in list(_async_clients) if other.is_closed()]:
+            _async_clients.pop(closed, None)
+        client = redis.asyncio.Redis.from_url(settings.PET_REDIS_URL, decode_responses=True)
+        _async_clients[loop] = client
+    return client
@@ -0,0 +1,34 @@
+# pet_api/renderers.py
+"""
+orjson-backed JSON renderer.
+
+Produces the same bytes as DRF's JSONRenderer with the default (compact)
+settings, several times faster. Falls back to DRF's renderer when orjson isn't
+installed.
+"""
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+class ORJSONRenderer(BaseRenderer):
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is None:
+            return JSONRenderer().render(data, accepted_media_type, renderer_context)
+        # Dates go through DRF's encoder too, since orjson formats them differently
+        ret = orjson.dumps(
+            data,
+            default=JSONRenderer.encoder_class().default,
+            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+        )
+        # Escape the JavaScript line terminators like JSONRenderer does
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
@@ -0,0 +1,94 @@
+# pet_api/replay.py
+"""
+Rebuilds a pet's state at any moment from the event log.
+
+Replay starts from the newest PetSnapshot taken at or before the requested
+time and applies the PetEvent changes recorded after it. Snapshots are written
+every PET_SNAPSHOT_EVERY events, so the work per replay stays bounded however
+long the pet has been around.
+
+compact_events() keeps the log from growing forever: for each pet it drops the
+events and snapshots older than its newest snapshot from before
+PET_EVENT_RETENTION. Replays stay exact from that snapshot on.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from .models import EVENT_STATE_FIELDS, Pet, PetEvent, PetSnapshot, decode_state_value
+
+
+def events_since_snapshot(pet_id, at):
+    """(nearest snapshot or None, queryset of the events to apply on top of it)"""
+    snapshot = (
+        PetSnapshot.objects.filter(pet_id=pet_id, taken_at__lte=at)
+        .order_by('-taken_at', '-last_event_id')
+        .first()
+    )
+    events = PetEvent.objects.filter(pet_id=pet_id, created_at__lte=at)
+    if snapshot is not None:
+        events = events.filter(id__gt=snapshot.last_event_id)
+    return snapshot, events.order_by('id')
+
+
+def state_at(pet_id, at=None):
+    """
+    The pet's EVENT_STATE_FIELDS as of ``at`` (default now), as stored in the log.
+    Returns (state, number of events replayed).
+    """
+    at = at or timezone.now()
+    snapshot, events = events_since_snapshot(pet_id, at)
+    state = dict(snapshot.state) if snapshot is not None else {}
+
+    replayed = 0
+    for changes in events.values_list('changes', flat=True).iterator():
+        for field, (old, new) in changes.items():
+            state[field] = new
+        replayed += 1
+    return state, replayed
+
+
+def replay_pet(pet_id, at=None):
+    """An unsaved Pet with the state it had at ``at``, or None if nothing was logged yet"""
+    state, replayed = state_at(pet_id, at)
+    if not state:
+        return None
+    return Pet(id=pet_id, **{
+        field: decode_state_value(field, state[field])
+        for field in EVENT_STATE_FIELDS if field in state
+    })
+
+
+def compactable_pets(now=None, older_than=None):
+    """(pet id, last event id of its newest snapshot before the retention window) pairs"""
+    now = now or timezone.now()
+    if older_than is None:
+        older_than = settings.PET_EVENT_RETENTION
+    return (
+        PetSnapshot.objects.filter(taken_at__lte=now - older_than)
+        .order_by('pet_id').values('pet_id').annotate(last_event_id=Max('last_event_id'))
+        .values_list('pet_id', 'last_event_id')
+    )
+
+
+def _compact_batch(pets):
+    events, snapshots = Q(), Q()
+    for pet_id, last_event_id in pets:
+        events |= Q(pet_id=pet_id, id__lte=last_event_id)
+        snapshots |= Q(pet_id=pet_id, last_event_id__lt=last_event_id)
+    with transaction.atomic():
+        deleted, _ = PetEvent.objects.filter(events).delete()
+        PetSnapshot.objects.filter(snapshots).delete()
+    return deleted
+
+
+def compact_events(older_than=None, batch_size=None):
+    """Drop the events and snapshots older than each pet's newest snapshot past the retention window"""
+    batch_size = batch_size or settings.PET_EVENT_COMPACT_BATCH_SIZE
+    pets = list(compactable_pets(older_than=older_than))
+    deleted = 0
+    for offset in range(0, len(pets), batch_size):
+        deleted += _compact_batch(pets[offset:offset + batch_size])
+        print(f"Compacted the event log of {min(offset + batch_size, len(pets))} pets so far")
+    return deleted
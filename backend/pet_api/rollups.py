@@ -0,0 +1,136 @@
+# pet_api/rollups.py
+"""
+Incremental daily rollups of the Interaction log.
+
+Each run counts the Interaction rows added since the last one (by id, from the
+InteractionRollupWatermark) into DailyActionCount, DailyOwnerActivity and
+DailyPetActivity, PET_ROLLUP_BATCH_SIZE rows per transaction. The watermark row
+is locked for the batch and moves in the same transaction as the counts, so
+concurrent runs queue up and a crashed run never counts a row twice.
+
+Rows newer than PET_ROLLUP_LAG are left for the next run, giving requests that
+got an id earlier time to commit before the watermark passes it. Each run also
+refreshes OwnerPetCount. Analytics queries read only the rollup tables (see the
+``api/analytics/`` views), and the rollups keep their counts when interactions
+are archived.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import (
+    Pet, Interaction, InteractionRollupWatermark, DailyActionCount, DailyOwnerActivity, DailyPetActivity,
+    OwnerPetCount,
+)
+
+WATERMARK = 'daily_interactions'
+
+# Rollup model -> (field, Interaction lookup) pairs. The first pair is part of
+# the row's key with day and action; the rest are just copied, from the
+# latest interaction counted.
+ROLLUPS = {
+    DailyActionCount: [('pet_type', 'pet__pet_type')],
+    DailyOwnerActivity: [('owner_id', 'pet__owner_id')],
+    DailyPetActivity: [('pet_id', 'pet_id'), ('owner_id', 'pet__owner_id')],
+}
+
+
+def _add_counts(model, columns, interactions):
+    """Add the interactions' counts to ``model``'s rows, creating missing ones"""
+    key_field, key_lookup = columns[0]
+    counts, extras = {}, {}
+    grouped = interactions.values('day', 'action', *(lookup for _, lookup in columns)).annotate(
+        n=Count('id'), last_id=Max('id')
+    ).order_by('last_id')
+    for row in grouped:
+        key = (row['day'], row['action'], row[key_lookup])
+        counts[key] = counts.get(key, 0) + row['n']
+        extras[key] = {field: row[lookup] for field, lookup in columns[1:]}
+    if not counts:
+        return
+
+    existing = {}
+    days = {key[0] for key in counts}
+    for rollup in model.objects.filter(day__in=days, **{f'{key_field}__in': {key[2] for key in counts}}):
+        existing[(rollup.day, rollup.action, getattr(rollup, key_field))] = rollup
+
+    updated, created = [], []
+    for key, n in counts.items():
+        rollup = existing.get(key)
+        if rollup is None:
+            day, action, key_value = key
+            rollup = model(day=day, action=action, count=0, **{key_field: key_value})
+            created.append(rollup)
+        else:
+            updated.append(rollup)
+        rollup.count += n
+        for field, value in extras[key].items():
+            setattr(rollup, field, value)
+    model.objects.bulk_update(updated, ['count', *(field for field, _ in columns[1:])], batch_size=1000)
+    model.objects.bulk_create(created, batch_size=1000)
+
+
+def _rollup_batch(batch_size, cutoff):
+    """Count the next batch of interactions; returns how many there were"""
+    with transaction.atomic():
+        watermark, _ = InteractionRollupWatermark.objects.select_for_update().get_or_create(name=WATERMARK)
+        ids = list(
+            Interaction.objects.filter(id__gt=watermark.last_interaction_id, timestamp__lt=cutoff)
+            .order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return 0
+
+        interactions = Interaction.objects.filter(
+            id__gt=watermark.last_interaction_id, id__lte=ids[-1]
+        ).annotate(day=TruncDate('timestamp'))
+        for model, columns in ROLLUPS.items():
+            _add_counts(model, columns, interactions)
+
+        watermark.last_interaction_id = ids[-1]
+        watermark.save()
+    return len(ids)
+
+
+def rollup_interactions(batch_size=None):
+    """Roll up every interaction past the watermark; returns the number counted"""
+    batch_size = batch_size or settings.PET_ROLLUP_BATCH_SIZE
+    cutoff = timezone.now() - settings.PET_ROLLUP_LAG
+    total = 0
+    while True:
+        counted = _rollup_batch(batch_size, cutoff)
+        if not counted:
+            break
+        total += counted
+        print(f"Rolled up {total} interactions so far")
+    refresh_owner_pet_counts()
+    return total
+
+
+def refresh_owner_pet_counts():
+    """Bring OwnerPetCount in line with the living pets, writing only the owners that changed"""
+    counts = dict(
+        Pet.objects.exclude(status='deceased').order_by().values('owner_id')
+        .annotate(n=Count('id')).values_list('owner_id', 'n')
+    )
+    with transaction.atomic():
+        existing = dict(OwnerPetCount.objects.select_for_update().values_list('owner_id', 'living_pets'))
+        OwnerPetCount.objects.filter(owner_id__in=existing.keys() - counts.keys()).delete()
+        OwnerPetCount.objects.bulk_update([
+            OwnerPetCount(owner_id=owner_id, living_pets=n)
+            for owner_id, n in counts.items() if owner_id in existing and existing[owner_id] != n
+        ], ['living_pets'], batch_size=1000)
+        OwnerPetCount.objects.bulk_create([
+            OwnerPetCount(owner_id=owner_id, living_pets=n)
+            for owner_id, n in counts.items() if owner_id not in existing
+        ], batch_size=1000)
+
+
+def reset_rollups():
+    """Drop all rollups and the watermark, so the next run recounts everything still in Interaction"""
+    with transaction.atomic():
+        InteractionRollupWatermark.objects.filter(name=WATERMARK).delete()
+        for model in ROLLUPS:
+            model.objects.all().delete()
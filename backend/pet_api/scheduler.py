@@ -0,0 +1,72 @@
+# pet_api/scheduler.py
+"""
+Adaptive tick scheduler.
+
+Instead of ticking every living pet every 5 minutes, each pet sits in a Redis
+sorted set scored by the time of its next state change (see
+``Pet.intervals_until_next_event``). ``process_due_pets`` only wakes the pets
+whose score has passed and catches them up in one go, so tick cost follows the
+number of state changes rather than the size of the population.
+"""
+from django.conf import settings
+
+from .models import STAT_UPDATE_INTERVAL
+from .redis_client import get_redis
+
+SCHEDULE_KEY = 'pet_api:schedule'
+
+
+def is_enabled():
+    return getattr(settings, 'PET_ADAPTIVE_SCHEDULER', False)
+
+
+def next_event_time(pet):
+    """When the pet next needs a visit, capped by PET_SCHEDULER_MAX_DEFER"""
+    limit = max(1, int(settings.PET_SCHEDULER_MAX_DEFER / STAT_UPDATE_INTERVAL))
+    return pet.last_stat_update + pet.intervals_until_next_event(limit) * STAT_UPDATE_INTERVAL
+
+
+def schedule_pet(pet):
+    if pet.status == 'deceased':
+        unschedule_pet(pet.id)
+        return
+    get_redis().zadd(SCHEDULE_KEY, {pet.id: next_event_time(pet).timestamp()})
+
+
+def unschedule_pet(pet_id):
+    get_redis().zrem(SCHEDULE_KEY, pet_id)
+
+
+def claim_due_pet_ids(now, limit):
+    """
+    Take up to ``limit`` pets that are due. A pet is only handed to the worker
+    whose ZREM removed it, so concurrent runs never process the same pet twice.
+    """
+    redis = get_redis()
+    pet_ids = redis.zrangebyscore(SCHEDULE_KEY, '-inf', now.timestamp(), start=0, num=limit)
+    if not pet_ids:
+        return []
+
+    pipe = redis.pipeline()
+    for pet_id in pet_ids:
+        pipe.zrem(SCHEDULE_KEY, pet_id)
+    removed = pipe.execute()
+    return [int(pet_id) for pet_id, claimed in zip(pet_ids, removed) if claimed]
+
+
+def ensure_seeded():
+    """Schedule every living pet when the set is missing: on the first run, or after Redis lost it"""
+    from .models import Pet
+
+    redis = get_redis()
+    if redis.exists(SCHEDULE_KEY):
+        return 0
+
+    pipe = redis.pipeline()
+    seeded = 0
+    for pet in Pet.objects.exclude(status='deceased').iterator(chunk_size=1000):
+        # nx: a pet scheduled meanwhile (e.g. by a save) keeps its newer time
+        pipe.zadd(SCHEDULE_KEY, {pet.id: next_event_time(pet).timestamp()}, nx=True)
+        seeded += 1
+    pipe.execute()
+    return seeded
@@ -1,6 +1,8 @@
 from rest_framework import serializers
-from .models import Pet, Interaction
+from .models import Pet, Interaction, ArchivedPet, CRITICAL_STAT_WARNINGS, critical_stat_flags
 from django.contrib.auth.models import User
+from django.utils import timezone
+from datetime import datetime, timezone as dt_timezone
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -21,4 +23,109 @@ class PetSerializer(serializers.ModelSerializer):
 class InteractionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Interaction
-        fields = ['id', 'pet', 'action', 'timestamp']
\ No newline at end of file
+        fields = ['id', 'pet', 'action', 'timestamp']
+
+class ArchivedPetSerializer(serializers.ModelSerializer):
+    owner = UserSerializer(read_only=True)
+    
+    class Meta:
+        model = ArchivedPet
+        fields = [
+            'id', 'name', 'pet_type', 'owner', 'stage', 'experience', 'created_at',
+            'deceased_at', 'archived_at', 'final_stats', 'interaction_count'
+        ]
+
+class ArchivedPetDetailSerializer(ArchivedPetSerializer):
+    interactions = serializers.SerializerMethodField()
+    
+    class Meta(ArchivedPetSerializer.Meta):
+        fields = ArchivedPetSerializer.Meta.fields + ['interactions']
+    
+    def get_interactions(self, obj):
+        # Unpack the archived [action, unix timestamp] pairs
+        return [
+            {'action': action, 'timestamp': format_datetime(datetime.fromtimestamp(timestamp, tz=dt_timezone.utc))}
+            for action, timestamp in obj.interactions
+        ]
+
+
+# Fast read path: the same output as PetSerializer, built straight from
+# values_list() rows instead of running DRF field-by-field serialization.
+# Keep this in sync with PetSerializer.Meta.fields.
+PET_ROW_FIELDS = [
+    'id', 'name', 'pet_type', 'owner__id', 'owner__username', 'owner__email',
+    'created_at', 'last_interaction', 'hunger', 'happiness', 'hygiene', 'sleep',
+    'health', 'stage', 'experience', 'status', 'sleep_start_time'
+]
+
+
+def format_datetime(value):
+    """Format a datetime the way DRF's DateTimeField does (ISO 8601, UTC as Z)"""
+    if value is None:
+        return None
+    value = timezone.localtime(value).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def pet_row_to_dict(row):
+    """Map one PET_ROW_FIELDS row to the PetSerializer representation"""
+    (pet_id, name, pet_type, owner_id, username, email, created_at, last_interaction,
+     hunger, happiness, hygiene, sleep, health, stage, experience, status, sleep_start_time) = row
+    return {
+        'id': pet_id,
+        'name': name,
+        'pet_type': pet_type,
+        'owner': {'id': owner_id, 'username': username, 'email': email},
+        'created_at': format_datetime(created_at),
+        'last_interaction': format_datetime(last_interaction),
+        'hunger': hunger,
+        'happiness': happiness,
+        'hygiene': hygiene,
+        'sleep': sleep,
+        'health': health,
+        'stage': stage,
+        'experience': experience,
+        'status': status,
+        'sleep_start_time': format_datetime(sleep_start_time),
+    }
+
+
+def serialize_pets(queryset):
+    """Serialize a Pet queryset without model instances or DRF fields"""
+    return [pet_row_to_dict(row) for row in queryset.values_list(*PET_ROW_FIELDS)]
+
+
+def check_pets_stats(queryset):
+    """
+    Serialize the pets and work out each living pet's critical stat warnings,
+    in a single query. Returns (pets, {pet id: warnings}).
+    """
+    flags = critical_stat_flags()
+    rows = queryset.annotate(**flags).values_list(*PET_ROW_FIELDS, *flags)
+    return _split_flagged_rows(rows)
+
+
+def _split_flagged_rows(rows):
+    pets = []
+    warnings_by_pet = {}
+    width = len(PET_ROW_FIELDS)
+    for row in rows:
+        pet = pet_row_to_dict(row[:width])
+        pets.append(pet)
+        # Only check living pets
+        if pet['status'] != 'deceased':
+            warnings_by_pet[pet['id']] = [
+                message.format(name=pet['name'])
+                for (stat, message), critical in zip(CRITICAL_STAT_WARNINGS, row[width:])
+                if critical
+            ]
+    return pets, warnings_by_pet
+
+
+async def acheck_pets_stats(queryset):
+    """Async version of check_pets_stats()"""
+    flags = critical_stat_flags()
+    rows = queryset.annotate(**flags).values_list(*PET_ROW_FIELDS, *flags)
+    return _split_flagged_rows([row async for row in rows])
@@ -0,0 +1,47 @@
+# pet_api/signals.py
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from . import pet_cache, scheduler
+from .models import Pet
+
+
+@receiver(post_save, sender=Pet)
+def reschedule_pet(sender, instance, **kwargs):
+    """Any write can change a pet's trajectory, so recompute its next event"""
+    if not scheduler.is_enabled():
+        return
+    try:
+        scheduler.schedule_pet(instance)
+    except Exception as e:
+        # Scheduling problems shouldn't break saving the pet
+        print(f"Scheduler error for pet {instance.id}: {str(e)}")
+
+
+@receiver(post_delete, sender=Pet)
+def unschedule_pet(sender, instance, **kwargs):
+    if not scheduler.is_enabled():
+        return
+    try:
+        scheduler.unschedule_pet(instance.id)
+    except Exception as e:
+        print(f"Scheduler error for pet {instance.id}: {str(e)}")
+
+
+@receiver(post_save, sender=Pet)
+@receiver(post_delete, sender=Pet)
+def invalidate_pet_cache(sender, instance, **kwargs):
+    """Every write to a pet makes its owner's cached pets stale"""
+    if not pet_cache.is_enabled():
+        return
+    owner_ids = {instance.owner_id, getattr(instance, '_loaded_owner_id', instance.owner_id)}
+    for owner_id in owner_ids:
+        pet_cache.invalidate(owner_id)
+
+
+@receiver(post_save, sender=User)
+def invalidate_owner_cache(sender, instance, created, **kwargs):
+    # The owner's username and email are part of every cached pet
+    if pet_cache.is_enabled() and not created:
+        pet_cache.invalidate(instance.pk)
@@ -0,0 +1,173 @@
+# pet_api/simulation.py
+"""
+Offline population simulator behind ``manage.py simulate_population``.
+
+Runs the real game rules from pet_api.models on unsaved Pet instances, tick by
+tick, with synthetic players who check in at random and take care of whatever
+their pet needs. Nothing is ever saved: pets are built from plain dicts, their
+WebSocket updates are collected on the instance (see Pet.collect_updates) and
+thrown away, and no database connection is used by the workers.
+
+Pets are simulated in chunks, one chunk per task in a forked process pool, so
+workers inherit the configured Django setup and any apply_overrides(). Each
+chunk returns counters keyed by (day, behaviour) which are summed by the caller.
+"""
+import random
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from . import models
+from .models import Pet, InteractionRejected
+
+TICKS_PER_DAY = int(timedelta(days=1) / models.STAT_UPDATE_INTERVAL)
+
+# How often synthetic players check in, and how likely they are to act on
+# each need they notice
+BEHAVIOURS = {
+    'attentive': {'sessions_per_day': 12, 'care': 0.95},
+    'casual': {'sessions_per_day': 4, 'care': 0.8},
+    'neglectful': {'sessions_per_day': 1, 'care': 0.5},
+    'absent': {'sessions_per_day': 0, 'care': 0},
+}
+
+# What a player does when they check in, in order
+NEEDS = [
+    ('MEDICINE', lambda pet: pet.status == 'sick'),
+    ('FEED', lambda pet: pet.hunger < 600),
+    ('CLEAN', lambda pet: pet.hygiene < 600),
+    ('PLAY', lambda pet: pet.happiness < 600),
+    ('SLEEP', lambda pet: pet.sleep < 300 and pet.status != 'sleeping'),
+]
+
+# Constants designers can override for a run
+TUNABLE_CONSTANTS = [
+    'CRITICAL_STAT_THRESHOLD', 'GOOD_STAT_THRESHOLD', 'SICK_HEALTH_THRESHOLD',
+    'FULL_SLEEP_THRESHOLD', 'EVOLUTION_EXP_TEEN', 'EVOLUTION_EXP_ADULT',
+]
+
+PET_FIELDS = [
+    'name', 'pet_type', 'hunger', 'happiness', 'hygiene', 'sleep', 'health',
+    'stage', 'experience', 'status'
+]
+
+OUTPUT_COLUMNS = [
+    'day', 'behaviour', 'pets', 'deaths', 'death_rate', 'warnings', 'warning_ticks',
+    'warnings_per_pet', 'interactions', 'evolved_teen', 'evolved_adult',
+    'mean_hours_to_teen', 'mean_hours_to_adult',
+]
+
+
+def apply_overrides(constants=None, decay=None):
+    """
+    Patch the game constants in pet_api.models for this process only.
+    ``decay`` maps (status, stat) to the change per tick.
+    """
+    for name, value in (constants or {}).items():
+        if name not in TUNABLE_CONSTANTS:
+            raise ValueError(f"Unknown constant: {name}")
+        setattr(models, name, value)
+    for (status, stat), delta in (decay or {}).items():
+        if stat not in models.STAT_CHANGES_PER_INTERVAL.get(status, {}):
+            raise ValueError(f"Unknown decay rate: {status}.{stat}")
+        models.STAT_CHANGES_PER_INTERVAL[status][stat] = delta
+
+
+def play_session(pet, behaviour, rng):
+    """One check-in by the player; returns the number of interactions made"""
+    interactions = 0
+    for action, needed in NEEDS:
+        if not needed(pet) or rng.random() >= behaviour['care']:
+            continue
+        try:
+            woke_up = pet.apply_action(action)
+        except InteractionRejected:
+            continue
+        if not woke_up:
+            pet._check_evolution()
+            interactions += 1
+    return interactions
+
+
+def simulate_pet(fields, behaviour_name, days, rng, results):
+    """Run one pet forward, adding its outcomes to ``results[(day, behaviour)]``"""
+    behaviour = BEHAVIOURS[behaviour_name]
+    session_chance = behaviour['sessions_per_day'] / TICKS_PER_DAY
+    pet = Pet(**fields)
+    pet.collect_updates()
+
+    for tick in range(days * TICKS_PER_DAY):
+        day, offset = divmod(tick, TICKS_PER_DAY)
+        stats = results[(day, behaviour_name)]
+        if offset == 0:
+            stats['pets'] += 1
+
+        old_stage = pet.stage
+        if session_chance and rng.random() < session_chance:
+            stats['interactions'] += play_session(pet, behaviour, rng)
+
+        # Same steps as Pet.update_stats(), without saving
+        old_status = pet.status
+        pet._check_auto_wakeup()
+        pet._apply_interval_changes()
+        pet._check_health_status(old_status)
+        if pet.status == 'deceased':
+            stats['deaths'] += 1
+            break
+        pet._check_evolution(old_stage)
+
+        warnings = pet.critical_warnings()
+        if warnings:
+            stats['warning_ticks'] += 1
+            stats['warnings'] += len(warnings)
+        if pet.stage != old_stage:
+            stats[f'evolved_{pet.stage}'] += 1
+            stats[f'ticks_to_{pet.stage}'] += tick + 1
+
+        # Drop the collected updates and log events, nobody will read them
+        pet._outbox.clear()
+        pet.__dict__.pop('_pending_events', None)
+
+
+def simulate_chunk(chunk):
+    """Pool task: simulate a list of (fields, behaviour) pets; returns the counters"""
+    pets, days, seed = chunk
+    rng = random.Random(seed)
+    results = defaultdict(Counter)
+    for fields, behaviour_name in pets:
+        simulate_pet(fields, behaviour_name, days, rng, results)
+    return dict(results)
+
+
+def merge_results(total, results):
+    for key, counter in results.items():
+        total.setdefault(key, Counter()).update(counter)
+
+
+def output_rows(total):
+    """One row of OUTPUT_COLUMNS per (day, behaviour), in order"""
+    hours_per_tick = models.STAT_UPDATE_INTERVAL / timedelta(hours=1)
+    for (day, behaviour), stats in sorted(total.items()):
+        pets = stats['pets']
+        yield {
+            'day': day + 1,
+            'behaviour': behaviour,
+            'pets': pets,
+            'deaths': stats['deaths'],
+            'death_rate': round(stats['deaths'] / pets, 6) if pets else 0.0,
+            'warnings': stats['warnings'],
+            'warning_ticks': stats['warning_ticks'],
+            'warnings_per_pet': round(stats['warnings'] / pets, 3) if pets else 0.0,
+            'interactions': stats['interactions'],
+            'evolved_teen': stats['evolved_teen'],
+            'evolved_adult': stats['evolved_adult'],
+            'mean_hours_to_teen': _mean_hours(stats, 'teen', hours_per_tick),
+            'mean_hours_to_adult': _mean_hours(stats, 'adult', hours_per_tick),
+        }
+
+
+def _mean_hours(stats, stage, hours_per_tick):
+    # Hours since the start of the run, for the pets that evolved that day
+    count = stats[f'evolved_{stage}']
+    if not count:
+        return None
+    return round(stats[f'ticks_to_{stage}'] / count * hours_per_tick, 2)
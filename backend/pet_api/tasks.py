@@ -1,25 +1,121 @@
 # pet_api/tasks.py
 from celery import shared_task
 from datetime import timedelta
+from django.conf import settings
 from django.utils import timezone
 
 @shared_task
 def update_all_pets():
     """
     Update stats for all active pets.
-    Only updates pets that haven't been updated in the last 5 minutes and aren't deceased.
+    Ticks every living pet once per generation, resuming an interrupted run
+    and skipping if another run is still going (see ticks.py).
+    """
+    from .profiling import profile
+    from .ticks import run_tick_generation
+
+    with profile('update_all_pets'):
+        return run_tick_generation()
+
+
+@shared_task
+def retry_failed_ticks():
+    """Retry pets whose update_all_pets tick failed"""
+    from . import ticks
+
+    return f"Retried {ticks.retry_failed_ticks()} failed ticks"
+
+
+@shared_task
+def process_due_pets():
+    """
+    Adaptive alternative to update_all_pets (PET_ADAPTIVE_SCHEDULER).
+    Only pets whose next state change is due are loaded and caught up.
     """
-    # Import here to avoid circular imports
     from .models import Pet
-    
-    pets = Pet.objects.exclude(status='deceased')
-    
+    from . import alerts, scheduler
+
+    now = timezone.now()
+    scheduler.ensure_seeded()
+
     updated_count = 0
-    for pet in pets:
-        try:
-            pet.update_stats()
-            updated_count += 1
-        except Exception as e:
-            print(f"Error updating pet {pet.id}: {str(e)}")
-    
-    return f"Updated {updated_count} pets"
\ No newline at end of file
+    while True:
+        pet_ids = scheduler.claim_due_pet_ids(now, settings.PET_SCHEDULER_BATCH_SIZE)
+        if not pet_ids:
+            break
+
+        for pet in Pet.objects.filter(id__in=pet_ids).select_related('owner'):
+            try:
+                old_status = pet.status
+                ticks = pet.catch_up(now)
+                pet.save(event='tick', event_data={'ticks': ticks})  # post_save puts the pet back in the schedule
+                if pet.status != old_status:
+                    alerts.schedule_critical_alert(pet)
+                updated_count += 1
+            except Exception as e:
+                print(f"Error updating pet {pet.id}: {str(e)}")
+                # Put it back so it's retried on the next run instead of being lost
+                scheduler.get_redis().zadd(
+                    scheduler.SCHEDULE_KEY, {pet.id: (now + timedelta(minutes=1)).timestamp()}
+                )
+
+    return f"Updated {updated_count} due pets"
+
+
+@shared_task(bind=True)
+def send_critical_alert(self, pet_id):
+    """
+    Fire a critical stat alert at the exact moment a stat crosses the threshold.
+    Scheduled by alerts.schedule_critical_alert.
+    """
+    from .models import Pet
+    from . import alerts
+
+    task_id, eta = alerts.get_scheduled_alert(pet_id)
+    if task_id != self.request.id:
+        return f"Alert for pet {pet_id} was superseded"
+
+    try:
+        pet = Pet.objects.select_related('owner').get(id=pet_id)
+    except Pet.DoesNotExist:
+        alerts.clear_critical_alert(pet_id)
+        return f"Pet {pet_id} no longer exists"
+
+    now = timezone.now()
+    if now.timestamp() < eta:
+        # Woken early because of PET_CRITICAL_ALERT_MAX_DELAY; plan again
+        alerts.clear_critical_alert(pet_id)
+        alerts.schedule_critical_alert(pet)
+        return f"Alert for pet {pet_id} rescheduled"
+
+    # Send the warnings as they are right now, not as of the last tick
+    pet.projected(now)._check_critical_stats()
+
+    # Then line up the next stat to cross
+    alerts.clear_critical_alert(pet_id)
+    alerts.schedule_critical_alert(pet, after=now)
+    return f"Sent critical alert for pet {pet_id}"
+
+
+@shared_task
+def archive_deceased_pets():
+    """Move pets deceased for longer than PET_ARCHIVE_AFTER to the archive tables"""
+    from .archive import archive_deceased_pets as archive
+
+    return f"Archived {archive()} deceased pets"
+
+
+@shared_task
+def rollup_interactions():
+    """Count new interactions into the daily analytics rollups"""
+    from .rollups import rollup_interactions as rollup
+
+    return f"Rolled up {rollup()} interactions"
+
+
+@shared_task
+def compact_pet_events():
+    """Drop PetEvents and PetSnapshots older than PET_EVENT_RETENTION that a newer snapshot covers"""
+    from .replay import compact_events
+
+    return f"Deleted {compact_events()} pet events"
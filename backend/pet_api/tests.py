@@ -1,3 +1,633 @@
-from django.test import TestCase
+import asyncio
+import json
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from . import export, idempotency, notifications, pet_cache, presence, redis_client, scheduler, ticks, wire
+from .archive import archive_deceased_pets
+from .channel_layers import HashRing
+from .consumers import PetConsumer
+from .models import STAT_UPDATE_INTERVAL, Pet, Interaction, TickRun, OwnerPetCount, PetEvent, PetSnapshot, ArchivedPet
+from .replay import compact_events, state_at
+from .rollups import rollup_interactions
+from .renderers import ORJSONRenderer
+from .serializers import PetSerializer, serialize_pets, check_pets_stats
+
+# Keep the tests off Redis: local caches, layers and buckets, optional features off
+LOCAL_SERVICES = override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    PET_THROTTLING=True,
+    PET_THROTTLE_BACKEND='local',
+    PET_EXACT_CRITICAL_ALERTS=False,
+    PET_PRESENCE_TRACKING=False,
+    PET_ADAPTIVE_SCHEDULER=False,
+)
+
+
+@LOCAL_SERVICES
+class PetAPITestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('owner', password='secret')
+        self.pet = Pet.objects.create(owner=self.user, name='Rex', pet_type='dog')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+
+@override_settings(PET_REDIS_URL='redis://localhost:6379/15')
+class RedisTestCase(PetAPITestCase):
+    """For code that needs Redis: runs on a scratch database, skipped when Redis isn't there"""
+
+    def setUp(self):
+        super().setUp()
+        redis_client._client = None
+        self.redis = redis_client.get_redis()
+        try:
+            self.redis.flushdb()
+        except Exception as e:
+            self.skipTest(f"Redis isn't available: {e}")
+
+    def tearDown(self):
+        self.redis.flushdb()
+        redis_client._client = None
+        super().tearDown()
+
+
+class CatchUpTests(PetAPITestCase):
+    STATES = {
+        'wakes up': dict(status='sleeping', sleep=700),
+        'falls sick': dict(hunger=210, health=310),
+        'dies': dict(status='sick', hunger=100, health=20),
+    }
+    STAT_FIELDS = ['hunger', 'happiness', 'hygiene', 'sleep', 'health', 'status']
+
+    def make_pets(self, state):
+        return [
+            Pet.objects.create(owner=self.user, name=name, pet_type='cat', **state)
+            for name in ('Ticked', 'Caught up')
+        ]
+
+    def test_catch_up_matches_ticks(self):
+        for label, state in self.STATES.items():
+            with self.subTest(label):
+                ticked, caught_up = self.make_pets(state)
+                start = caught_up.last_stat_update
+                for _ in range(40):
+                    ticked.update_stats()
+                # The unfinished tick is kept for next time
+                now = start + 40 * STAT_UPDATE_INTERVAL + STAT_UPDATE_INTERVAL / 2
+                self.assertEqual(caught_up.catch_up(now), 40)
+                self.assertEqual(caught_up.last_stat_update, start + 40 * STAT_UPDATE_INTERVAL)
+                self.assertEqual(
+                    [getattr(caught_up, field) for field in self.STAT_FIELDS],
+                    [getattr(ticked, field) for field in self.STAT_FIELDS],
+                )
+                self.assertEqual(caught_up.catch_up(now), 0)
+
+    def test_intervals_until_next_event(self):
+        for label, state in self.STATES.items():
+            with self.subTest(label):
+                pet = self.make_pets(state)[0]
+                intervals = pet.intervals_until_next_event(limit=100)
+                self.assertLess(intervals, 100)
+                start = pet._event_signature()
+                for _ in range(intervals - 1):
+                    pet.update_stats()
+                self.assertEqual(pet._event_signature(), start)
+                pet.update_stats()
+                self.assertNotEqual(pet._event_signature(), start)
+
+        # Nothing happens to a healthy pet within a few ticks
+        self.assertEqual(self.pet.intervals_until_next_event(limit=5), 5)
+
+
+class IdempotencyTests(PetAPITestCase):
+    def post(self, action, data, key='retry-1'):
+        return self.client.post(
+            f'/api/pets/{self.pet.pk}/{action}/', data, format='json', HTTP_IDEMPOTENCY_KEY=key
+        )
+
+    def test_throttled_action_with_key(self):
+        # The throttle reads request.data before the idempotency wrapper runs
+        first = self.post('simulate_time', {'minutes': 30})
+        self.assertEqual(first.status_code, 200)
+        retry = self.post('simulate_time', {'minutes': 30})
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry[idempotency.REPLAYED_HEADER], 'true')
+        self.assertEqual(retry.data, first.data)
+
+    def test_key_reused_with_different_body(self):
+        self.assertEqual(self.post('simulate_time', {'minutes': 30}).status_code, 200)
+        self.assertEqual(self.post('simulate_time', {'minutes': 60}).status_code, 422)
+
+    def finish_first_before_claim(self, first_request):
+        """Patch claim() so ``first_request`` runs to completion between the
+        duplicate's cache miss and its claim"""
+        real_claim = idempotency.claim
+
+        def claim(key):
+            with mock.patch.object(idempotency, 'claim', real_claim):
+                self.first = first_request()
+            return real_claim(key)
+        return mock.patch.object(idempotency, 'claim', claim)
+
+    def test_duplicate_claiming_after_first_finished(self):
+        with self.finish_first_before_claim(lambda: self.post('interact', {'action': 'FEED'})):
+            duplicate = self.post('interact', {'action': 'FEED'})
+        self.assertEqual(self.first.status_code, 200)
+        self.assertEqual(duplicate[idempotency.REPLAYED_HEADER], 'true')
+        self.assertEqual(Interaction.objects.filter(pet=self.pet).count(), 1)
+
+    def test_async_duplicate_claiming_after_first_finished(self):
+        token = Token.objects.create(user=self.user)
+        client = APIClient(HTTP_AUTHORIZATION=f'Token {token.key}', HTTP_IDEMPOTENCY_KEY='retry-1')
+
+        def post():
+            return client.post(f'/api/async/pets/{self.pet.pk}/interact/', {'action': 'FEED'}, format='json')
+
+        with self.finish_first_before_claim(post):
+            duplicate = post()
+        self.assertEqual(self.first.status_code, 200)
+        self.assertEqual(duplicate[idempotency.REPLAYED_HEADER], 'true')
+        self.assertEqual(Interaction.objects.filter(pet=self.pet).count(), 1)
+
+
+class FastSerializationTests(PetAPITestCase):
+    """serialize_pets + ORJSONRenderer must render the same bytes as PetSerializer + JSONRenderer"""
+
+    # Names that exercise escaping: quotes, non-ASCII, emoji and JS line terminators
+    NAMES = ['Señor "Fluff"', 'Pochi\u2028Tama', '🐶 Rex', 'Back\\slash\u2029']
+
+    def setUp(self):
+        super().setUp()
+        self.user.email = 'owner@example.com'
+        self.user.save()
+        now = timezone.now()
+        pets = []
+        for stage, _ in Pet.STAGES:
+            for status, _ in Pet.STATUS_CHOICES:
+                pets.append(Pet(
+                    owner=self.user,
+                    name=self.NAMES[len(pets) % len(self.NAMES)],
+                    pet_type='cat',
+                    stage=stage,
+                    status=status,
+                    hunger=100 if status == 'sick' else 600,
+                    # With and without microseconds, which change the ISO format
+                    sleep_start_time=now.replace(microsecond=0) if status == 'sleeping' else None,
+                    deceased_at=now if status == 'deceased' else None,
+                ))
+        Pet.objects.bulk_create(pets)
+        self.queryset = Pet.objects.filter(owner=self.user).select_related('owner').order_by('id')
+
+    def assertSameBytes(self, fast_data, slow_data):
+        self.assertEqual(ORJSONRenderer().render(fast_data), JSONRenderer().render(slow_data))
+
+    def test_list(self):
+        self.assertSameBytes(serialize_pets(self.queryset), PetSerializer(self.queryset, many=True).data)
+
+    def test_detail(self):
+        for pet in self.queryset:
+            response = self.client.get(f'/api/pets/{pet.pk}/')
+            self.assertEqual(response.content, JSONRenderer().render(PetSerializer(pet).data))
+
+    def test_check_stats(self):
+        pets, warnings_by_pet = check_pets_stats(self.queryset)
+        self.assertSameBytes(pets, PetSerializer(self.queryset, many=True).data)
+        living = self.queryset.exclude(status='deceased')
+        self.assertEqual(set(warnings_by_pet), {pet.pk for pet in living})
+        self.assertTrue(all(warnings_by_pet[pet.pk] for pet in living if pet.status == 'sick'))
+
+    @override_settings(TIME_ZONE='America/New_York')
+    def test_local_time_zone(self):
+        self.queryset.update(last_interaction=timezone.now() - timedelta(days=200))
+        self.assertSameBytes(serialize_pets(self.queryset), PetSerializer(self.queryset, many=True).data)
+
+
+class AnalyticsTests(PetAPITestCase):
+    def test_bad_pet_filter(self):
+        response = self.client.get('/api/analytics/pets/', {'pet': 'abc'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get('/api/analytics/pets/', {'pet': self.pet.pk}).status_code, 200)
+
+    @override_settings(PET_ROLLUP_LAG=timedelta(0))
+    def test_owners_least_active_first(self):
+        staff = User.objects.create_user('staff', is_staff=True)
+        busy = User.objects.create_user('busy')
+        idle = User.objects.create_user('idle')
+        for owner, pets in ((busy, 1), (idle, 2)):
+            for _ in range(pets):
+                Pet.objects.create(owner=owner, name='Pet', pet_type='cat')
+        Pet.objects.create(owner=staff, name='Gone', pet_type='cat', status='deceased')
+        Interaction.objects.bulk_create([
+            Interaction(pet=pet, action='FEED')
+            for pet, count in ((self.pet, 4), (busy.pets.get(), 3), (idle.pets.first(), 1))
+            for _ in range(count)
+        ])
+        rollup_interactions()
+        self.assertEqual(OwnerPetCount.objects.get(owner=idle).living_pets, 2)
+        self.assertFalse(OwnerPetCount.objects.filter(owner=staff).exists())
+
+        self.client.force_authenticate(staff)
+        rows = self.client.get('/api/analytics/owners/', {'limit': 2}).data
+        self.assertEqual([row['username'] for row in rows], ['idle', 'busy'])
+        self.assertEqual((rows[0]['living_pets'], rows[0]['interactions'], rows[0]['active_days']), (2, 1, 1))
+
+        # A pet passing away is picked up by the next run
+        self.pet.status = 'deceased'
+        self.pet.save()
+        rollup_interactions()
+        self.assertFalse(OwnerPetCount.objects.filter(owner=self.user).exists())
+
+
+class EventLogTests(PetAPITestCase):
+    @override_settings(PET_EVENT_LOG=True, PET_SNAPSHOT_EVERY=10)
+    def test_snapshot_waits_for_an_event(self):
+        # Over the threshold, e.g. after PET_SNAPSHOT_EVERY was lowered
+        Pet.objects.filter(pk=self.pet.pk).update(events_since_snapshot=22)
+        pet = Pet.objects.get(pk=self.pet.pk)
+        pet.save()
+        self.assertFalse(PetSnapshot.objects.filter(pet=pet).exists())
+
+        pet.hunger -= 10
+        pet.save(event='tick')
+        snapshot = PetSnapshot.objects.get(pet=pet)
+        self.assertEqual(snapshot.last_event_id, pet.events.latest('id').id)
+        self.assertEqual(pet.events_since_snapshot, 0)
+
+    @override_settings(PET_EVENT_LOG=True, PET_SNAPSHOT_EVERY=3)
+    def test_compaction_keeps_replay_exact(self):
+        pet = Pet.objects.get(pk=self.pet.pk)
+        for _ in range(10):
+            pet.hunger -= 10
+            pet.save(event='tick')
+        # Age the first two snapshots past the retention window
+        snapshots = list(PetSnapshot.objects.filter(pet=pet).order_by('id'))
+        self.assertEqual(len(snapshots), 3)
+        old = timezone.now() - timedelta(days=30)
+        PetSnapshot.objects.filter(id__in=[snapshot.id for snapshot in snapshots[:2]]).update(taken_at=old)
+        before, _ = state_at(pet.pk)
+        covered = PetEvent.objects.filter(pet=pet, id__lte=snapshots[1].last_event_id)
+        self.assertTrue(covered.exists())
+        covered_count = covered.count()
+
+        self.assertEqual(compact_events(older_than=timedelta(days=7)), covered_count)
+        self.assertFalse(covered.exists())
+        self.assertEqual(list(PetSnapshot.objects.filter(pet=pet).order_by('id')), snapshots[1:])
+        self.assertEqual(state_at(pet.pk)[0], before)
+
+
+class ArchiveTests(PetAPITestCase):
+    def test_archive_keeps_big_ids(self):
+        pet = Pet.objects.create(
+            id=2 ** 31 + 5, owner=self.user, name='Old', pet_type='cat',
+            status='deceased', deceased_at=timezone.now() - timedelta(days=60),
+        )
+        Interaction.objects.create(pet=pet, action='FEED')
+        self.assertEqual(archive_deceased_pets(), 1)
+        archived = ArchivedPet.objects.get(id=pet.id)
+        self.assertEqual(archived.interaction_count, 1)
+        self.assertFalse(Pet.objects.filter(id=pet.id).exists())
+
+
+@override_settings(PET_LIST_CACHE=True)
+class PetCacheTests(PetAPITestCase):
+    def assertInvalidated(self, owner, write):
+        pet_cache.get_list(owner.pk, lambda: 'stale')
+        with self.captureOnCommitCallbacks(execute=True):
+            write()
+        self.assertEqual(pet_cache.get_list(owner.pk, lambda: 'fresh'), 'fresh')
+
+    def test_bulk_writes_invalidate(self):
+        pets = Pet.objects.filter(pk=self.pet.pk)
+        self.assertInvalidated(self.user, lambda: pets.update(name='Max'))
+        self.pet.hunger = 10
+        self.assertInvalidated(self.user, lambda: Pet.objects.bulk_update([self.pet], ['hunger']))
+
+        # Both owners of a moved pet
+        other = User.objects.create_user('other')
+        pet_cache.get_list(self.user.pk, lambda: 'stale')
+        self.assertInvalidated(other, lambda: pets.update(owner=other))
+        self.assertEqual(pet_cache.get_list(self.user.pk, lambda: 'fresh'), 'fresh')
+
+
+class ExportTests(PetAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user.is_staff = True
+        self.user.save()
+        self.token = Token.objects.create(user=self.user)
+        for number in range(4):
+            Pet.objects.create(owner=self.user, name=f'Pet {number}', pet_type='cat')
+
+    def test_streams_under_wsgi(self):
+        response = self.client.get('/api/export/pets.csv')
+        self.assertFalse(response.is_async)
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 6)
+
+    @override_settings(PET_EXPORT_CHUNK_SIZE=2)
+    async def test_streams_under_asgi(self):
+        produced = []
+        iter_export = export.iter_export
+
+        def counted(*args):
+            for line in iter_export(*args):
+                produced.append(line)
+                yield line
+
+        with mock.patch.object(export, 'iter_export', counted):
+            response = await self.async_client.get(
+                '/api/export/pets.ndjson', headers={'Authorization': f'Token {self.token.key}'}
+            )
+            self.assertTrue(response.is_async)
+            chunks = aiter(response.streaming_content)
+            first = await anext(chunks)
+            # Only the first chunk's lines were read
+            self.assertEqual(len(produced), 2)
+            body = first + b''.join([chunk async for chunk in chunks])
+        self.assertEqual(len(body.splitlines()), 5)
+
+
+class PresenceCacheTests(TestCase):
+    def setUp(self):
+        presence._listener_cache.clear()
+
+    @override_settings(PET_PRESENCE_CACHE_SECONDS=2)
+    def test_listener_cache_is_bounded(self):
+        with mock.patch.object(presence, 'MAX_CACHED_KEYS', 3):
+            for i in range(5):
+                presence._remember_counts({f'key{i}': i}, now=100)
+        self.assertEqual(list(presence._listener_cache), ['key2', 'key3', 'key4'])
+
+        # Expired entries go with the next write
+        presence._remember_counts({'key5': 5}, now=103)
+        self.assertEqual(list(presence._listener_cache), ['key5'])
+        self.assertEqual(presence._cached_counts(['key5', 'key6'], now=103), ({'key5': 5}, ['key6']))
+
+
+class RedisClientTests(TestCase):
+    def test_clients_of_finished_loops_are_dropped(self):
+        async def get_client():
+            return redis_client.get_async_redis()
+
+        # Clients connect lazily, so no Redis is needed
+        for _ in range(5):
+            asyncio.run(get_client())
+        self.assertLessEqual(len(redis_client._async_clients), 1)
+
+
+class ConsumerTests(PetAPITestCase):
+    def test_subscribe_without_pet_id(self):
+        from virtual_pet_project.asgi import application
+
+        token = Token.objects.create(user=self.user)
+
+        async def send_subscribe():
+            communicator = WebsocketCommunicator(application, f'/ws/pets/?token={token.key}')
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            await communicator.receive_json_from()  # connection_established
+            await communicator.send_json_to({'action': 'subscribe'})
+            reply = await communicator.receive_json_from()
+            await communicator.disconnect()
+            return reply
+
+        self.assertEqual(async_to_sync(send_subscribe)(), {'type': 'error', 'message': 'Invalid message format'})
+
+
+class WireTests(TestCase):
+    MESSAGES = [
+        {
+            'type': 'pet_update', 'pet_id': 7, 'update_type': 'status_change',
+            'data': {'old_status': 'alive', 'new_status': 'sick', 'message': 'Rex is not feeling well.', 'timestamp': 1700000000.25},
+        },
+        {'type': 'pet_update', 'pet_id': 7, 'update_type': 'critical_stats', 'data': {'warnings': ['Rex is very hungry!']}},
+        {'type': 'connection_established', 'message': 'Connected to pet updates channel'},
+        # Types and fields without a code travel as they are
+        {'type': 'pong', 'pet_id': 7, 'update_type': 'new_kind', 'data': {'extra': [1, 2]}, 'other': None},
+    ]
+
+    def test_round_trip(self):
+        for message in self.MESSAGES:
+            with self.subTest(message['type']):
+                self.assertEqual(wire.expand(wire.compact(message)), message)
+                self.assertEqual(wire.decode(**wire.encode(message, wire.MSGPACK)), message)
+                self.assertEqual(wire.decode(**wire.encode(message)), message)
+
+        compacted = wire.compact(self.MESSAGES[0])
+        self.assertEqual((compacted['t'], compacted['u'], compacted['d']['ts']), (1, 2, 1700000000250))
+
+    def test_negotiate(self):
+        self.assertIsNone(wire.negotiate(None))
+        self.assertIsNone(wire.negotiate(['graphql-ws']))
+        self.assertEqual(wire.negotiate(['graphql-ws', wire.MSGPACK, wire.JSON]), wire.MSGPACK)
+
+    @LOCAL_SERVICES
+    def test_connect_with_msgpack(self):
+        from virtual_pet_project.asgi import application
+
+        async def connect(subprotocols):
+            communicator = WebsocketCommunicator(application, '/ws/pets/', subprotocols=subprotocols)
+            connected, subprotocol = await communicator.connect()
+            self.assertTrue(connected)
+            frame = await communicator.receive_output()
+            await communicator.disconnect()
+            return subprotocol, frame
+
+        subprotocol, frame = async_to_sync(connect)(['graphql-ws', wire.MSGPACK])
+        self.assertEqual(subprotocol, wire.MSGPACK)
+        self.assertEqual(wire.decode(bytes_data=frame['bytes'])['type'], 'connection_established')
+
+        subprotocol, frame = async_to_sync(connect)([])
+        self.assertIsNone(subprotocol)
+        self.assertEqual(wire.decode(text_data=frame['text'])['type'], 'connection_established')
+
+
+@override_settings(PET_WS_OUTBOX_SIZE=2)
+class OutboxTests(TestCase):
+    def update(self, pet_id, version, update_type='stats_update'):
+        return {'type': 'pet_update', 'pet_id': pet_id, 'update_type': update_type, 'data': {'version': version}}
+
+    def queue(self, *updates):
+        """Queue the updates faster than they're sent; returns what was sent and the consumer"""
+        consumer = PetConsumer()
+        consumer.channel_name = 'test'
+        consumer.close = mock.AsyncMock()
+        sent = []
+        consumer.send_message = mock.AsyncMock(side_effect=sent.append)
+
+        async def run():
+            for update in updates:
+                await consumer._queue_update(update)
+            while consumer.outbox:
+                await asyncio.sleep(0)
+            consumer.outbox_task.cancel()
+
+        async_to_sync(run)()
+        return [(message['pet_id'], message['data']['version']) for message in sent], consumer
+
+    def test_coalescing_keeps_position(self):
+        sent, _ = self.queue(self.update(1, 1), self.update(2, 1), self.update(1, 2))
+        # The newer update for pet 1 took the pending one's place in the queue
+        self.assertEqual(sent, [(1, 2), (2, 1)])
+
+    def test_update_types_dont_coalesce(self):
+        sent, _ = self.queue(self.update(1, 1), self.update(1, 2, 'critical_stats'))
+        self.assertEqual(sent, [(1, 1), (1, 2)])
+
+    def test_overflow_policies(self):
+        updates = [self.update(1, 1), self.update(1, 2), self.update(2, 1), self.update(3, 1)]
+        for policy, expected in (
+            ('drop_oldest', [(2, 1), (3, 1)]),
+            ('drop_newest', [(1, 2), (2, 1)]),
+            ('disconnect', [(1, 2), (2, 1)]),
+        ):
+            with self.subTest(policy), override_settings(PET_WS_OVERFLOW_POLICY=policy):
+                sent, consumer = self.queue(*updates)
+                self.assertEqual(sent, expected)
+                if policy == 'disconnect':
+                    consumer.close.assert_awaited_once_with(code=4008)
+                else:
+                    consumer.close.assert_not_awaited()
+
+
+class NotificationOrderTests(TestCase):
+    def test_same_group_messages_keep_their_order(self):
+        delivered = []
+
+        async def slow_first(group_name, message):
+            # Without ordering the later, faster send would arrive first
+            await asyncio.sleep(0.02 if message['n'] == 0 else 0)
+            if message['n'] == 3:
+                raise ValueError("lost")
+            delivered.append((group_name, message['n']))
+            return True
+
+        messages = [('pet_1', {'n': 0}), ('pet_2', {'n': 1}), ('pet_1', {'n': 2}), ('pet_2', {'n': 3})]
+        results = async_to_sync(notifications.send_all)(messages, slow_first)
+        self.assertEqual([n for group_name, n in delivered if group_name == 'pet_1'], [0, 2])
+        self.assertEqual(results[:3], [True, True, True])
+        self.assertIsInstance(results[3], ValueError)
+
+
+@override_settings(PET_ADAPTIVE_SCHEDULER=True)
+class SchedulerSeedingTests(RedisTestCase):
+    def test_reseeds_after_the_set_is_lost(self):
+        self.assertEqual(scheduler.ensure_seeded(), 1)
+        self.assertEqual(scheduler.ensure_seeded(), 0)
+
+        # e.g. evicted or flushed
+        self.redis.delete(scheduler.SCHEDULE_KEY)
+        self.assertEqual(scheduler.ensure_seeded(), 1)
+        self.assertIsNotNone(self.redis.zscore(scheduler.SCHEDULE_KEY, self.pet.pk))
+
+
+class TickRunTests(RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        for number in range(4):
+            Pet.objects.create(owner=self.user, name=f'Pet {number}', pet_type='cat')
+        self.pet_ids = list(Pet.objects.order_by('id').values_list('id', flat=True))
+        self.ticked = []
+
+    def tick(self, failing=()):
+        """Patch update_stats to record each pet ticked and fail for ``failing``"""
+        update_stats = Pet.update_stats
+
+        def tick(pet, generation=None):
+            if pet.id in failing:
+                raise RuntimeError('boom')
+            self.ticked.append(pet.id)
+            return update_stats(pet, generation=generation)
+        return mock.patch.object(Pet, 'update_stats', autospec=True, side_effect=tick)
+
+    def dead_letters(self):
+        return [json.loads(raw) for raw in self.redis.lrange(ticks.DEAD_LETTER_KEY, 0, -1)]
+
+    def test_resume_from_checkpoint(self):
+        with self.tick():
+            run = ticks.current_run()
+            self.assertEqual(ticks._tick_batch(run, 2), 2)
+            # The run crashed here: the next one picks up after the checkpoint
+            self.assertEqual(TickRun.objects.get(pk=run.pk).last_pet_id, self.pet_ids[1])
+            ticks.run_tick_generation(batch_size=2)
+
+        self.assertEqual(self.ticked, self.pet_ids)
+        run.refresh_from_db()
+        self.assertIsNotNone(run.finished_at)
+        self.assertEqual((run.ticked, run.failed), (5, 0))
+        self.assertEqual(set(Pet.objects.values_list('last_tick_generation', flat=True)), {run.generation})
+        self.assertFalse(self.redis.exists(ticks.LOCK_KEY))
+
+        # The next run is a new generation
+        with self.tick():
+            ticks.run_tick_generation(batch_size=2)
+        self.assertEqual(self.ticked, self.pet_ids * 2)
+
+    def test_dead_letter_and_retry(self):
+        failing = self.pet_ids[2]
+        with self.tick(failing=[failing]):
+            ticks.run_tick_generation(batch_size=2)
+        run = TickRun.objects.get()
+        self.assertEqual((run.ticked, run.failed), (4, 1))
+        self.assertEqual(Pet.objects.get(pk=failing).last_tick_generation, 0)
+        [entry] = self.dead_letters()
+        self.assertEqual(
+            (entry['pet_id'], entry['generation'], entry['attempts']), (failing, run.generation, 1)
+        )
+
+        with self.tick():
+            self.assertEqual(ticks.retry_failed_ticks(), 1)
+        self.assertEqual(self.dead_letters(), [])
+        self.assertEqual(Pet.objects.get(pk=failing).last_tick_generation, run.generation)
+
+    @override_settings(PET_TICK_MAX_ATTEMPTS=2)
+    def test_retries_give_up(self):
+        ticks.dead_letter(self.pet.pk, 1, 'boom')
+        with self.tick(failing=[self.pet.pk]) as update_stats:
+            self.assertEqual(ticks.retry_failed_ticks(), 0)
+            self.assertEqual([entry['attempts'] for entry in self.dead_letters()], [2])
+            # Kept for inspection, but not retried again
+            self.assertEqual(ticks.retry_failed_ticks(), 0)
+        self.assertEqual(update_stats.call_count, 1)
+        self.assertEqual([entry['attempts'] for entry in self.dead_letters()], [2])
+
+
+class HashRingTests(TestCase):
+    KEYS = [f'pets.owner.{owner_id}' for owner_id in range(10000)]
+
+    def placement(self, names):
+        ring = HashRing(names)
+        return {key: names[ring.shard(key)] for key in self.KEYS}
+
+    def test_adding_a_shard_only_moves_keys_to_it(self):
+        before = self.placement(['redis-a', 'redis-b', 'redis-c'])
+        after = self.placement(['redis-a', 'redis-b', 'redis-c', 'redis-d'])
+        moved = [key for key in self.KEYS if before[key] != after[key]]
+        self.assertEqual({after[key] for key in moved}, {'redis-d'})
+        # About a quarter of the keys, taken evenly from the other shards
+        self.assertAlmostEqual(len(moved) / len(self.KEYS), 1 / 4, delta=0.05)
+        for name in ('redis-a', 'redis-b', 'redis-c'):
+            taken = sum(before[key] == name for key in moved)
+            self.assertAlmostEqual(taken / len(self.KEYS), 1 / 12, delta=0.03)
+
+    def test_removing_a_shard_only_moves_its_keys(self):
+        before = self.placement(['redis-a', 'redis-b', 'redis-c'])
+        after = self.placement(['redis-a', 'redis-c'])
+        moved = {key for key in self.KEYS if before[key] != after[key]}
+        self.assertEqual(moved, {key for key in self.KEYS if before[key] == 'redis-b'})
+
+    def test_names_must_be_unique(self):
+        with self.assertRaises(ValueError):
+            HashRing(['redis-a', 'redis-a'])
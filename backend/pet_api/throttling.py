@@ -0,0 +1,152 @@
+# pet_api/throttling.py
+"""
+Cost-based token bucket throttling for expensive pet actions.
+
+With PET_THROTTLING on, each user has one bucket per action in
+PET_THROTTLE_RATES, holding up to ``capacity`` tokens and refilling at
+``refill_per_second``. A request is charged what it is going to cost (see
+COSTS): simulated intervals, pets checked, and so on. When the bucket can't
+cover the cost the request is rejected with 429 and a ``Retry-After`` header
+saying when it could be.
+
+Buckets live in Redis (an atomic Lua script) so every worker shares them.
+With PET_THROTTLE_BACKEND = 'local', or while Redis can't be reached, an
+in-process bucket of the same shape stands in.
+"""
+import math
+import threading
+import time
+
+from django.conf import settings
+from rest_framework.throttling import BaseThrottle
+
+from . import metrics
+from .redis_client import get_redis, get_async_redis
+
+BUCKET_KEY = 'pet_api:throttle:{action}:{user_id}'
+
+# Refill the bucket for the time since the last request, then take ``cost`` if
+# there is enough. Returns the seconds to wait (as a string, Lua would truncate
+# a number), 0 when the request was allowed.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local now = tonumber(ARGV[4])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(wait)
+"""
+
+_local_buckets = {}  # key -> (tokens, ts)
+_local_lock = threading.Lock()
+
+
+def _take_local(key, cost, capacity, rate, now):
+    """Same as TOKEN_BUCKET_SCRIPT, for this process only"""
+    with _local_lock:
+        tokens, ts = _local_buckets.get(key, (capacity, now))
+        tokens = min(capacity, tokens + max(0, now - ts) * rate)
+        wait = 0
+        if tokens >= cost:
+            tokens -= cost
+        else:
+            wait = (cost - tokens) / rate
+        _local_buckets[key] = (tokens, now)
+        return wait
+
+
+def _bucket_args(user_id, action, cost):
+    limits = settings.PET_THROTTLE_RATES[action]
+    capacity, rate = limits['capacity'], limits['refill_per_second']
+    # A request bigger than the bucket empties it rather than never fitting
+    cost = min(cost, capacity)
+    return BUCKET_KEY.format(action=action, user_id=user_id), cost, capacity, rate, time.time()
+
+
+def is_enabled():
+    return getattr(settings, 'PET_THROTTLING', False)
+
+
+def _use_redis():
+    return settings.PET_THROTTLE_BACKEND == 'redis'
+
+
+def take(user_id, action, cost):
+    """Charge ``cost`` to the user's bucket; returns the seconds to wait, 0 if allowed"""
+    key, cost, capacity, rate, now = _bucket_args(user_id, action, cost)
+    if _use_redis():
+        try:
+            script = get_redis().register_script(TOKEN_BUCKET_SCRIPT)
+            return float(script(keys=[key], args=[capacity, rate, cost, now]))
+        except Exception as e:
+            print(f"Throttle check failed, using the local bucket: {str(e)}")
+    return _take_local(key, cost, capacity, rate, now)
+
+
+async def atake(user_id, action, cost):
+    """Async version of take()"""
+    key, cost, capacity, rate, now = _bucket_args(user_id, action, cost)
+    if _use_redis():
+        try:
+            script = get_async_redis().register_script(TOKEN_BUCKET_SCRIPT)
+            return float(await script(keys=[key], args=[capacity, rate, cost, now]))
+        except Exception as e:
+            print(f"Throttle check failed, using the local bucket: {str(e)}")
+    return _take_local(key, cost, capacity, rate, now)
+
+
+def simulate_time_cost(minutes):
+    """One token per simulated interval, plus one for the request"""
+    return 1 + math.ceil(max(minutes, 0) / 5)
+
+
+def check_stats_cost(living_pets):
+    """One token per pet checked, plus one for the batched notification"""
+    return 1 + living_pets
+
+
+def requested_minutes(data):
+    try:
+        return int(data.get('minutes', 5))
+    except (TypeError, ValueError):
+        return 0  # simulate_time rejects it, charge just the request
+
+
+# PetViewSet action -> cost of the request, known before it runs
+COSTS = {
+    'interact': lambda request, view: 1,
+    'simulate_time': lambda request, view: simulate_time_cost(requested_minutes(request.data)),
+    'check_stats': lambda request, view: check_stats_cost(
+        view.get_queryset().exclude(status='deceased').count()
+    ),
+}
+
+
+class ActionCostThrottle(BaseThrottle):
+    """DRF throttle charging PetViewSet actions by cost"""
+
+    def allow_request(self, request, view):
+        action = getattr(view, 'action', None)
+        if not is_enabled() or action not in settings.PET_THROTTLE_RATES or not request.user.is_authenticated:
+            return True
+
+        cost = COSTS[action](request, view) if action in COSTS else 1
+        self.wait_seconds = take(request.user.pk, action, cost)
+        if self.wait_seconds:
+            metrics.incr(f'throttle.{action}.rejected')
+            return False
+        return True
+
+    def wait(self):
+        return self.wait_seconds
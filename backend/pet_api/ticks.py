@@ -0,0 +1,167 @@
+# pet_api/ticks.py
+"""
+Overlap-safe, resumable runs of update_all_pets.
+
+Each run ticks one generation (a TickRun row). Only one run works at a time:
+it holds a Redis lock, renewed after every batch, and a run that finds the
+lock taken leaves straight away instead of ticking the same pets again. Pets
+are ticked in id order, one transaction per batch, and each batch moves the
+TickRun's ``last_pet_id`` checkpoint forward in the same transaction. A run
+that crashed is resumed from its checkpoint by the next one, which starts a
+new generation only once the old one is finished.
+
+Pets remember the last generation that ticked them (Pet.last_tick_generation)
+and are locked while ticked, so no pet is ticked twice in a generation even if
+the lock expires under a stalled run. A pet whose tick fails is rolled back on
+its own and pushed to a dead-letter list in Redis, which retry_failed_ticks()
+works through up to PET_TICK_MAX_ATTEMPTS times.
+"""
+import json
+import uuid
+
+from celery.utils.log import get_task_logger
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import metrics
+from .models import Pet, TickRun
+from .redis_client import get_redis
+
+logger = get_task_logger(__name__)
+
+LOCK_KEY = 'pet_api:ticks:lock'
+DEAD_LETTER_KEY = 'pet_api:ticks:dead_letter'
+
+# Only the run holding the lock may extend or release it
+RENEW_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def acquire_lock(token):
+    return bool(get_redis().set(LOCK_KEY, token, nx=True, ex=settings.PET_TICK_LOCK_TIMEOUT))
+
+
+def renew_lock(token):
+    script = get_redis().register_script(RENEW_LOCK_SCRIPT)
+    return bool(script(keys=[LOCK_KEY], args=[token, settings.PET_TICK_LOCK_TIMEOUT]))
+
+
+def release_lock(token):
+    get_redis().register_script(RELEASE_LOCK_SCRIPT)(keys=[LOCK_KEY], args=[token])
+
+
+def current_run():
+    """The unfinished TickRun to resume, or a new generation"""
+    run = TickRun.objects.filter(finished_at__isnull=True).order_by('generation').first()
+    return run or TickRun.objects.create()
+
+
+def dead_letter(pet_id, generation, error, attempts=1):
+    get_redis().rpush(DEAD_LETTER_KEY, json.dumps({
+        'pet_id': pet_id, 'generation': generation, 'error': error, 'attempts': attempts,
+    }))
+
+
+def _tick_batch(run, batch_size):
+    """Tick the next batch of the run; returns the number of pets looked at"""
+    failures = []
+    with transaction.atomic():
+        # No skip_locked: a pet busy in a request is waited for, not stepped over
+        pets = list(
+            Pet.objects.select_for_update()
+            .filter(id__gt=run.last_pet_id, last_tick_generation__lt=run.generation)
+            .exclude(status='deceased')
+            .order_by('id')[:batch_size]
+        )
+        if not pets:
+            return 0
+
+        for pet in pets:
+            try:
+                with transaction.atomic():
+                    pet.update_stats(generation=run.generation)
+            except Exception as e:
+                logger.exception("Error ticking pet %s in generation %s", pet.id, run.generation)
+                failures.append((pet.id, str(e)))
+
+        ticked = len(pets) - len(failures)
+        run.last_pet_id = pets[-1].id
+        TickRun.objects.filter(pk=run.pk).update(
+            last_pet_id=run.last_pet_id, ticked=F('ticked') + ticked, failed=F('failed') + len(failures)
+        )
+
+    # Only once the batch is committed, or a resumed run would tick them as well
+    for pet_id, error in failures:
+        dead_letter(pet_id, run.generation, error)
+    metrics.incr('ticks.ticked', ticked)
+    metrics.incr('ticks.failed', len(failures))
+    return len(pets)
+
+
+def run_tick_generation(batch_size=None):
+    """Tick every living pet once for the current generation; returns a summary"""
+    batch_size = batch_size or settings.PET_TICK_BATCH_SIZE
+    token = uuid.uuid4().hex
+    if not acquire_lock(token):
+        logger.info("A tick run is already in progress, skipping")
+        return "Tick run already in progress"
+
+    try:
+        run = current_run()
+        if run.last_pet_id:
+            logger.info("Resuming tick generation %s after pet %s", run.generation, run.last_pet_id)
+
+        while _tick_batch(run, batch_size):
+            if not renew_lock(token):
+                logger.warning("Lost the tick lock during generation %s, stopping", run.generation)
+                return f"Stopped tick generation {run.generation} at pet {run.last_pet_id}"
+
+        TickRun.objects.filter(pk=run.pk).update(finished_at=timezone.now())
+        run.refresh_from_db()
+        metrics.set_gauge('ticks.generation', run.generation)
+        return f"Tick generation {run.generation}: updated {run.ticked} pets, {run.failed} failed"
+    finally:
+        release_lock(token)
+
+
+def retry_failed_ticks():
+    """Retry the dead-lettered ticks once each; returns the number that succeeded"""
+    redis = get_redis()
+    retried = 0
+    # Entries that fail again go back to the end, so stop after one pass
+    for _ in range(redis.llen(DEAD_LETTER_KEY)):
+        raw = redis.lpop(DEAD_LETTER_KEY)
+        if raw is None:
+            break
+        entry = json.loads(raw)
+        if entry['attempts'] >= settings.PET_TICK_MAX_ATTEMPTS:
+            # Kept for inspection, not retried again
+            redis.rpush(DEAD_LETTER_KEY, raw)
+            continue
+
+        try:
+            with transaction.atomic():
+                pet = Pet.objects.select_for_update().filter(id=entry['pet_id']).exclude(status='deceased').first()
+                if pet is not None:
+                    pet.update_stats(generation=entry['generation'])
+                    retried += 1
+        except Exception as e:
+            attempts = entry['attempts'] + 1
+            logger.exception("Retry %s of the tick for pet %s failed", attempts, entry['pet_id'])
+            dead_letter(entry['pet_id'], entry['generation'], str(e), attempts)
+            if attempts >= settings.PET_TICK_MAX_ATTEMPTS:
+                logger.error("Giving up on the generation %s tick for pet %s", entry['generation'], entry['pet_id'])
+    metrics.incr('ticks.retried', retried)
+    return retried
@@ -1,11 +1,27 @@
-from django.urls import path, include
+from django.urls import path, re_path, include
 from rest_framework.routers import DefaultRouter
-from .views import PetViewSet, InteractionViewSet
+from .views import (
+    PetViewSet, InteractionViewSet, ArchivedPetViewSet, MetricsView, ExportView,
+    ActionAnalyticsView, OwnerAnalyticsView, PetAnalyticsView
+)
+from . import async_views
 
 router = DefaultRouter()
 router.register(r'pets', PetViewSet, basename='pet')
 router.register(r'interactions', InteractionViewSet, basename='interaction')
+router.register(r'archived-pets', ArchivedPetViewSet, basename='archived-pet')
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
+    re_path(r'^export/(?P<kind>pets|interactions)\.(?P<file_format>ndjson|csv)$', ExportView.as_view(), name='export'),
+    # Daily interaction rollups (see rollups.py)
+    path('analytics/actions/', ActionAnalyticsView.as_view(), name='analytics-actions'),
+    path('analytics/owners/', OwnerAnalyticsView.as_view(), name='analytics-owners'),
+    path('analytics/pets/', PetAnalyticsView.as_view(), name='analytics-pets'),
+    # Async-native versions of the hot endpoints for ASGI deployments
+    path('async/pets/', async_views.pet_list, name='async-pet-list'),
+    path('async/pets/check_stats/', async_views.check_stats, name='async-pet-check-stats'),
+    path('async/pets/<int:pk>/', async_views.pet_detail, name='async-pet-detail'),
+    path('async/pets/<int:pk>/interact/', async_views.interact, name='async-pet-interact'),
 ]
\ No newline at end of file
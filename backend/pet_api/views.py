@@ -1,11 +1,32 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.permissions import IsAdminUser
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, StreamingHttpResponse
+from django.db.models import Count, F, FilteredRelation, FloatField, Max, Q, Sum
+from django.db.models.functions import Cast, Coalesce
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from datetime import timedelta
 
-from .models import Pet, Interaction
-from .serializers import PetSerializer, InteractionSerializer
+from .models import (
+    Pet, Interaction, ArchivedPet, InteractionRejected, notify_critical_stats,
+    DailyActionCount, DailyOwnerActivity, DailyPetActivity, OwnerPetCount
+)
+from .serializers import (
+    PetSerializer, InteractionSerializer, ArchivedPetSerializer, ArchivedPetDetailSerializer,
+    check_pets_stats, serialize_pets
+)
+from .renderers import ORJSONRenderer
+from . import export, metrics, pet_cache, scheduler
+from .alerts import schedule_critical_alert
+from .idempotency import idempotent
+from .profiling import profile
+from .throttling import ActionCostThrottle, requested_minutes
 
 # Import constants from models to ensure consistency
 from .models import (
@@ -20,150 +41,85 @@ from .models import (
 
 class PetViewSet(viewsets.ModelViewSet):
     serializer_class = PetSerializer
+    renderer_classes = [ORJSONRenderer, BrowsableAPIRenderer]
+    throttle_classes = [ActionCostThrottle]
+    
+    def dispatch(self, request, *args, **kwargs):
+        action_name = self.action_map.get(request.method.lower(), request.method.lower())
+        with profile(f'PetViewSet.{action_name}'):
+            return super().dispatch(request, *args, **kwargs)
     
     def get_queryset(self):
-        return Pet.objects.filter(owner=self.request.user)
+        return Pet.objects.filter(owner=self.request.user).select_related('owner')
+    
+    def list(self, request, *args, **kwargs):
+        if self.paginator is not None:
+            return super().list(request, *args, **kwargs)
+        # Reads skip model instances and DRF fields, see serialize_pets()
+        return Response(pet_cache.get_list(
+            request.user.pk, lambda: serialize_pets(self.filter_queryset(self.get_queryset()))
+        ))
+    
+    def retrieve(self, request, *args, **kwargs):
+        def load():
+            try:
+                pets = serialize_pets(self.get_queryset().filter(pk=kwargs['pk']))
+            except (TypeError, ValueError):
+                return None
+            return pets[0] if pets else None
+
+        pet = pet_cache.get_detail(request.user.pk, kwargs['pk'], load)
+        if pet is None:
+            raise Http404('No Pet matches the given query.')
+        return Response(pet)
     
     def perform_create(self, serializer):
-        serializer.save(owner=self.request.user)
+        pet = serializer.save(owner=self.request.user)
+        schedule_critical_alert(pet)
     
     @action(detail=True, methods=['post'])
+    @idempotent
     def interact(self, request, pk=None):
         pet = self.get_object()
-        
-        # If pet is deceased, no interactions are possible
-        if pet.status == 'deceased':
-            return Response(
-                {"detail": "This pet has passed away and cannot be interacted with."},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+
+        # With the adaptive scheduler the stored stats may be a few ticks behind
+        ticks = scheduler.is_enabled() and pet.catch_up()
+        if ticks:
+            pet.save(event='tick', event_data={'ticks': ticks})
         
         action = request.data.get('action')
-        if not action:
-            return Response(
-                {"detail": "Action parameter is required."},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        # Handle different interaction types
-        if action == 'FEED':
-            if pet.status == 'sleeping':
-                return Response(
-                    {"detail": "You can't feed your pet while it's sleeping."},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            pet.hunger = MAX_STAT  # Fill hunger to max
-            pet.health = min(MAX_STAT, pet.health + 50) if pet.health < MAX_STAT else pet.health
-            
-        elif action == 'PLAY':
-            if pet.status == 'sleeping':
-                return Response(
-                    {"detail": "You can't play with your pet while it's sleeping."},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            if pet.sleep < CRITICAL_STAT_THRESHOLD / 2:  # 10% of max
-                return Response(
-                    {"detail": "Your pet is too tired to play."},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            pet.happiness = MAX_STAT  # Fill happiness to max
-            pet.hygiene = max(0, pet.hygiene - 50)  # Reduce hygiene
-            pet.sleep = max(0, pet.sleep - 100)  # Playing makes pet more tired
-            pet.experience += 5
-            
-        elif action == 'CLEAN':
-            if pet.status == 'sleeping':
-                return Response(
-                    {"detail": "You can't clean your pet while it's sleeping."},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            pet.hygiene = MAX_STAT  # Fill hygiene to max
-            
-        elif action == 'SLEEP':
-            if pet.status == 'sleeping':
-                # Wake up the pet
-                pet.status = 'alive'
-                pet.sleep_start_time = None
-                
-                # Make sure to save the changes
-                pet.save()
-                
-                # Get fresh data after save
-                pet = self.get_object()
-                serializer = PetSerializer(pet)
-                
-                # Return the updated pet data
-                return Response(serializer.data)
-            
-            # Put pet to sleep
-            pet.status = 'sleeping'
-            pet.sleep_start_time = timezone.now()
-            
-        elif action == 'MEDICINE':
-            if pet.status != 'sick':
-                return Response(
-                    {"detail": "Your pet is not sick."},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            pet.health = min(MAX_STAT, pet.health + 300)
-            if pet.health >= SICK_HEALTH_THRESHOLD:
-                pet.status = 'alive'
+        try:
+            woke_up = pet.apply_action(action)
+        except InteractionRejected as e:
+            return Response({"detail": e.detail}, status=e.status)
+
+        if woke_up:
+            # Waking up isn't recorded as an interaction
+            pet.save(event='interaction', event_data={'action': action, 'woke_up': True})
+            schedule_critical_alert(pet)
             
-        elif action == 'HEAL':
-            if pet.status == 'sleeping':
-                return Response(
-                    {"detail": "You can't heal your pet while it's sleeping."},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            # Increase health
-            health_before = pet.health
-            pet.health = min(MAX_STAT, pet.health + 200)
+            # Get fresh data after save
+            pet = self.get_object()
+            serializer = PetSerializer(pet)
             
-            # If pet was sick and health is now above threshold, recover
-            if pet.status == 'sick' and pet.health >= SICK_HEALTH_THRESHOLD:
-                pet.status = 'alive'
-                
-            # If health didn't change, pet is already at max health
-            if health_before == pet.health:
-                return Response(
-                    {"detail": "Your pet is already at perfect health."},
-                    status=status.HTTP_200_OK
-                )
-                
-        elif action == 'TREAT':
-            if pet.status == 'sleeping':
-                return Response(
-                    {"detail": "You can't give treats to your pet while it's sleeping."},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            # Give a treat - improves health and happiness
-            pet.health = min(MAX_STAT, pet.health + 100)
-            pet.happiness = min(MAX_STAT, pet.happiness + 150)
-            pet.hunger = max(0, pet.hunger + 20)  # Small decrease in hunger
-            
-            # If pet was sick and health is now above threshold, recover
-            if pet.status == 'sick' and pet.health >= SICK_HEALTH_THRESHOLD:
-                pet.status = 'alive'
-        
-        else:
-            return Response(
-                {"detail": f"Unknown action: {action}"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+            # Return the updated pet data
+            return Response(serializer.data)
         
         # Save the interaction
         Interaction.objects.create(pet=pet, action=action)
         
         # Update pet
         pet.last_interaction = timezone.now()
-        pet.save()
 
         # Check for critical stats
         pet._check_critical_stats()
         
         # Check if pet should evolve - using the model's evolution check
         pet._check_evolution()
-        pet.save()
+        pet.save(event='interaction', event_data={'action': action})
+
+        # The action changed the pet's trajectory, so move its next critical alert
+        schedule_critical_alert(pet)
         
         # Get fresh data after all updates
         pet = self.get_object()
@@ -171,11 +127,21 @@ class PetViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
     @action(detail=True, methods=['post'])
+    @idempotent
     def simulate_time(self, request, pk=None):
         pet = self.get_object()
         
         # Get minutes to simulate
-        minutes = int(request.data.get('minutes', 5))
+        minutes = requested_minutes(request.data)
+        if not 1 <= minutes <= settings.PET_SIMULATE_MAX_MINUTES:
+            return Response(
+                {"detail": f"minutes must be a whole number from 1 to {settings.PET_SIMULATE_MAX_MINUTES}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        ticks = scheduler.is_enabled() and pet.catch_up()
+        if ticks:
+            pet.save(event='tick', event_data={'ticks': ticks})
         
         # Calculate how many complete 5-minute intervals to simulate
         intervals = minutes // 5
@@ -199,7 +165,7 @@ class PetViewSet(viewsets.ModelViewSet):
             pet._check_evolution()
             
             # Save changes to persist state between intervals
-            pet.save()
+            pet.save(event='simulation', event_data={'minutes': 5})
         
         # Handle any remainder minutes (less than 5)
         if remainder > 0 and pet.status != 'deceased':
@@ -211,7 +177,7 @@ class PetViewSet(viewsets.ModelViewSet):
             pet.last_interaction = timezone.now()
             pet.last_stat_update = timezone.now()
             
-            pet.save()
+            pet.save(event='simulation', event_data={'minutes': remainder})
     
         # Check for evolution
         pet._check_evolution()
@@ -220,6 +186,7 @@ class PetViewSet(viewsets.ModelViewSet):
         pet._check_critical_stats()
 
         pet.save()
+        schedule_critical_alert(pet)
         
         # Get fresh data after all updates
         pet = self.get_object()
@@ -228,20 +195,16 @@ class PetViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['post'])
     def check_stats(self, request):
-        pets = Pet.objects.filter(owner=request.user)
-        warnings_sent = 0
+        # One query: the pets, plus each warning worked out in SQL
+        pets, warnings_by_pet = check_pets_stats(self.get_queryset())
         
-        for pet in pets:
-            # Only check living pets
-            if pet.status != 'deceased':
-                pet._check_critical_stats()
-                warnings_sent += 1
+        # One message for all of the owner's pets instead of one per pet
+        notify_critical_stats(request.user.id, warnings_by_pet)
         
         # Return the updated pets along with a count of pets checked
-        serializer = self.get_serializer(pets, many=True)
         return Response({
-            'pets': serializer.data,
-            'stats_checked': warnings_sent
+            'pets': pets,
+            'stats_checked': len(warnings_by_pet)
         })
 
 
@@ -249,4 +212,148 @@ class InteractionViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = InteractionSerializer
     
     def get_queryset(self):
-        return Interaction.objects.filter(pet__owner=self.request.user)
\ No newline at end of file
+        return Interaction.objects.filter(pet__owner=self.request.user)
+
+
+class ArchivedPetViewSet(viewsets.ReadOnlyModelViewSet):
+    """Pets moved to the archive some time after they passed away"""
+    
+    def get_queryset(self):
+        queryset = ArchivedPet.objects.filter(owner=self.request.user).select_related('owner')
+        if self.action == 'list':
+            # The packed interaction history is only returned for a single pet
+            queryset = queryset.defer('interactions')
+        return queryset.order_by('-deceased_at')
+    
+    def get_serializer_class(self):
+        if self.action == 'retrieve':
+            return ArchivedPetDetailSerializer
+        return ArchivedPetSerializer
+
+
+class MetricsView(APIView):
+    """In-process counters and gauges for this server process (staff only)"""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(metrics.snapshot())
+
+
+class ExportView(APIView):
+    """
+    Stream every pet or interaction as NDJSON or CSV (staff only), optionally
+    limited to ``?since=``/``?until=`` (ISO 8601, creation/interaction time)
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, kind, file_format):
+        try:
+            since, until = export.parse_time_range(
+                request.query_params.get('since'), request.query_params.get('until')
+            )
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # An ASGI server needs an async iterator to stream the response
+        iter_export = export.aiter_export if isinstance(request._request, ASGIRequest) else export.iter_export
+        response = StreamingHttpResponse(
+            iter_export(kind, file_format, since, until),
+            content_type=export.FORMATS[file_format],
+        )
+        response['Content-Disposition'] = f'attachment; filename="{kind}.{file_format}"'
+        return response
+
+
+ANALYTICS_DEFAULT_DAYS = 30
+
+
+def analytics_day_range(params):
+    """(first, last) day from ?since=/?until= (YYYY-MM-DD, inclusive); raises ValueError"""
+    today = timezone.now().date()
+    days = {}
+    for name, default in (('since', today - timedelta(days=ANALYTICS_DEFAULT_DAYS - 1)), ('until', today)):
+        value = params.get(name)
+        days[name] = parse_date(value) if value else default
+        if days[name] is None:
+            raise ValueError(f"{name} must be a date (YYYY-MM-DD)")
+    return days['since'], days['until']
+
+
+class AnalyticsView(APIView):
+    """Base for the views over the daily interaction rollups (see rollups.py)"""
+
+    def get(self, request):
+        # get_rows() raises ValueError for bad filters too
+        try:
+            since, until = analytics_day_range(request.query_params)
+            rows = self.get_rows(request, since, until)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(rows)
+
+
+class ActionAnalyticsView(AnalyticsView):
+    """Interactions per day, pet type and action (staff only); ?pet_type= and ?action= filter"""
+    permission_classes = [IsAdminUser]
+
+    def get_rows(self, request, since, until):
+        rows = DailyActionCount.objects.filter(day__range=(since, until))
+        for param in ('pet_type', 'action'):
+            if request.query_params.get(param):
+                rows = rows.filter(**{param: request.query_params[param]})
+        return list(rows.order_by('day', 'pet_type', 'action').values('day', 'pet_type', 'action', 'count'))
+
+
+class OwnerAnalyticsView(AnalyticsView):
+    """
+    Owners of living pets, least active first (staff only): their interactions,
+    active days and last active day in the range. ?limit= defaults to 100.
+    Living pets come from OwnerPetCount, as of the last rollup run.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get_rows(self, request, since, until):
+        try:
+            limit = int(request.query_params.get('limit', 100))
+        except ValueError:
+            limit = 100
+
+        # Ranked and limited in SQL, reading only the rollup tables
+        rows = OwnerPetCount.objects.filter(living_pets__gt=0).alias(
+            # The day range goes in the join, so only those days are read
+            activity=FilteredRelation(
+                'owner__daily_activity', condition=Q(owner__daily_activity__day__range=(since, until))
+            ),
+        ).annotate(
+            interactions=Coalesce(Sum('activity__count'), 0),
+            active_days=Count('activity__day', distinct=True),
+            last_active_day=Max('activity__day'),
+            per_pet=Cast('interactions', FloatField()) / F('living_pets'),
+        ).order_by('per_pet', 'active_days', 'owner_id')
+        return [
+            {
+                'owner_id': row['owner_id'],
+                'living_pets': row['living_pets'],
+                'interactions': row['interactions'],
+                'active_days': row['active_days'],
+                'last_active_day': row['last_active_day'],
+                'username': row['owner__username'],
+            }
+            for row in rows.values(
+                'owner_id', 'living_pets', 'interactions', 'active_days', 'last_active_day', 'owner__username'
+            )[:max(limit, 0)]
+        ]
+
+
+class PetAnalyticsView(AnalyticsView):
+    """The user's interactions per day, pet and action, including archived pets; ?pet= filters"""
+
+    def get_rows(self, request, since, until):
+        rows = DailyPetActivity.objects.filter(owner=request.user, day__range=(since, until))
+        if request.query_params.get('pet'):
+            try:
+                pet_id = int(request.query_params['pet'])
+            except ValueError:
+                raise ValueError("pet must be a pet id") from None
+            rows = rows.filter(pet_id=pet_id)
+        return list(rows.order_by('day', 'pet_id', 'action').values('day', 'pet_id', 'action', 'count'))
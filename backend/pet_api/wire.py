@@ -0,0 +1,117 @@
+# pet_api/wire.py
+"""
+WebSocket wire formats.
+
+Clients pick an encoding by offering a subprotocol when connecting:
+
+* ``pets.json`` (or no subprotocol): the original JSON text frames.
+* ``pets.msgpack``: MessagePack binary frames using the compact schema below.
+  ``pet_update`` payloads use short field codes, and the float ``timestamp``
+  becomes integer milliseconds.
+
+Compression (permessage-deflate) is negotiated by the ASGI server, not here.
+"""
+import json
+
+import msgpack
+
+JSON = 'pets.json'
+MSGPACK = 'pets.msgpack'
+SUPPORTED = (JSON, MSGPACK)
+
+# Message and update types that travel as small integers
+TYPE_CODES = {
+    'pet_update': 1,
+    'connection_established': 2,
+    'subscribed': 3,
+    'unsubscribed': 4,
+    'echo': 5,
+    'error': 6,
+}
+UPDATE_TYPE_CODES = {
+    'critical_stats': 1,
+    'status_change': 2,
+    'evolution': 3,
+    'critical_stats_batch': 4,
+}
+
+# Top-level and data fields and their short codes
+FIELD_CODES = {
+    'type': 't',
+    'pet_id': 'p',
+    'update_type': 'u',
+    'data': 'd',
+    'message': 'm',
+}
+DATA_FIELD_CODES = {
+    'warnings': 'w',
+    'pets': 'ps',
+    'message': 'm',
+    'old_status': 'os',
+    'new_status': 'ns',
+    'old_stage': 'og',
+    'new_stage': 'ng',
+    'timestamp': 'ts',
+}
+
+_TYPES = {code: name for name, code in TYPE_CODES.items()}
+_UPDATE_TYPES = {code: name for name, code in UPDATE_TYPE_CODES.items()}
+_FIELDS = {code: name for name, code in FIELD_CODES.items()}
+_DATA_FIELDS = {code: name for name, code in DATA_FIELD_CODES.items()}
+
+
+def negotiate(subprotocols):
+    """Pick the first supported subprotocol the client offered, or None for plain JSON"""
+    for subprotocol in subprotocols or ():
+        if subprotocol in SUPPORTED:
+            return subprotocol
+    return None
+
+
+def compact(message):
+    """Rewrite a message dict using the short field codes"""
+    out = {}
+    for key, value in message.items():
+        if key == 'type':
+            value = TYPE_CODES.get(value, value)
+        elif key == 'update_type':
+            value = UPDATE_TYPE_CODES.get(value, value)
+        elif key == 'data' and isinstance(value, dict):
+            value = {
+                DATA_FIELD_CODES.get(k, k): round(v * 1000) if k == 'timestamp' else v
+                for k, v in value.items()
+            }
+        out[FIELD_CODES.get(key, key)] = value
+    return out
+
+
+def expand(message):
+    """Inverse of compact()"""
+    out = {}
+    for key, value in message.items():
+        key = _FIELDS.get(key, key)
+        if key == 'type':
+            value = _TYPES.get(value, value)
+        elif key == 'update_type':
+            value = _UPDATE_TYPES.get(value, value)
+        elif key == 'data' and isinstance(value, dict):
+            value = {
+                _DATA_FIELDS.get(k, k): v / 1000 if k == 'ts' else v
+                for k, v in value.items()
+            }
+        out[key] = value
+    return out
+
+
+def encode(message, encoding=None):
+    """Return the ``send`` kwargs (text_data or bytes_data) for a message"""
+    if encoding == MSGPACK:
+        return {'bytes_data': msgpack.packb(compact(message))}
+    return {'text_data': json.dumps(message)}
+
+
+def decode(text_data=None, bytes_data=None):
+    """Parse an incoming frame in either format"""
+    if bytes_data is not None:
+        return expand(msgpack.unpackb(bytes_data))
+    return json.loads(text_data)
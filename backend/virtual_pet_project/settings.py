@@ -83,6 +83,11 @@ WSGI_APPLICATION = 'virtual_pet_project.wsgi.application'
 
 ASGI_APPLICATION = 'virtual_pet_project.asgi.application'
 
+# With several Redis hosts, 'pet_api.channel_layers.ShardedRedisChannelLayer'
+# spreads groups and process channels over them with a consistent-hash ring, so
+# adding a shard only moves ~1/N of the groups. Name the shards in
+# "shard_names" (same order as hosts) to be able to move one to a new address
+# without moving its groups.
 CHANNEL_LAYERS = {
     'default': {
         'BACKEND': 'channels_redis.core.RedisChannelLayer',
@@ -92,6 +97,17 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Django's default per-process cache. Idempotency keys (and the pet cache) are
+# then only seen by the worker that stored them; with several workers, point
+# this at a shared backend, e.g.
+#     'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+#     'LOCATION': 'redis://127.0.0.1:6379/2',
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
 # Database configuration
 DATABASES = {
     'default': {
@@ -184,6 +200,7 @@ CORS_ALLOW_HEADERS = [
     'authorization',
     'content-type',
     'dnt',
+    'idempotency-key',
     'origin',
     'user-agent',
     'x-csrftoken',
@@ -198,10 +215,142 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
 
+# Redis database for pet_api's own bookkeeping (kept apart from the Celery broker)
+PET_REDIS_URL = 'redis://localhost:6379/1'
+
+# Adaptive scheduler: only wake pets that are about to change state instead of
+# ticking everyone every 5 minutes. Stats shown between events can lag by at
+# most PET_SCHEDULER_MAX_DEFER.
+PET_ADAPTIVE_SCHEDULER = False
+PET_SCHEDULER_MAX_DEFER = timedelta(hours=1)
+PET_SCHEDULER_BATCH_SIZE = 500
+
+# Send critical stat warnings at the moment a stat crosses the threshold instead
+# of on the next tick. Alerts further out than the max delay are re-planned.
+# Off by default: needs Redis (PET_REDIS_URL) and Celery ETA tasks.
+PET_EXACT_CRITICAL_ALERTS = False
+PET_CRITICAL_ALERT_MAX_DELAY = timedelta(hours=1)
+
+# Only publish WebSocket updates for owners with a live connection. Connections
+# heartbeat every PET_PRESENCE_HEARTBEAT seconds and expire after PET_PRESENCE_TTL.
+# Off by default: needs Redis (PET_REDIS_URL); without it every update is published.
+PET_PRESENCE_TRACKING = False
+PET_PRESENCE_HEARTBEAT = 30
+PET_PRESENCE_TTL = 90
+PET_PRESENCE_CACHE_SECONDS = 2
+
+# Publish WebSocket updates from a background event loop per process instead of
+# an async_to_sync hop per message. Updates beyond the queue size are dropped.
+# Off by default, which keeps the synchronous send.
+PET_ASYNC_NOTIFICATIONS = False
+PET_NOTIFICATION_QUEUE_SIZE = 10000
+PET_NOTIFICATION_BATCH_SIZE = 100
+
+# Outbound updates waiting for each WebSocket client. Pending updates for the
+# same pet and update_type are coalesced; when the queue is full the policy is
+# 'drop_oldest', 'drop_newest' or 'disconnect'.
+PET_WS_OUTBOX_SIZE = 100
+PET_WS_OVERFLOW_POLICY = 'drop_oldest'
+
+# Deceased pets are moved to the ArchivedPet table this long after they died,
+# PET_ARCHIVE_BATCH_SIZE pets per transaction
+PET_ARCHIVE_AFTER = timedelta(days=30)
+PET_ARCHIVE_BATCH_SIZE = 500
+
+# Log every change to a pet as a PetEvent, with a full PetSnapshot every
+# PET_SNAPSHOT_EVERY events so replaying a pet's history stays cheap. Every
+# tick writes an event per pet (about 288 rows per pet per day on top of the
+# tick's UPDATE), so a daily task drops events and snapshots that a snapshot
+# older than PET_EVENT_RETENTION covers, PET_EVENT_COMPACT_BATCH_SIZE pets per
+# transaction. History can be replayed as far back as that snapshot. Off by
+# default because of that extra write load on the tick path.
+PET_EVENT_LOG = False
+PET_SNAPSHOT_EVERY = 50
+PET_EVENT_RETENTION = timedelta(days=7)
+PET_EVENT_COMPACT_BATCH_SIZE = 500
+
+# Responses to interact/simulate_time requests sent with an Idempotency-Key
+# header are kept this long (seconds), so retries don't apply an action twice.
+# A duplicate that arrives while the first is running waits up to
+# PET_IDEMPOTENCY_WAIT seconds for its result.
+PET_IDEMPOTENCY_TTL = 24 * 60 * 60
+PET_IDEMPOTENCY_LOCK_TIMEOUT = 30
+PET_IDEMPOTENCY_WAIT = 10
+
+# Token buckets per user and action. Requests are charged by cost: 1 per
+# interaction, 1 + one per simulated 5-minute interval for simulate_time and
+# 1 + one per living pet for check_stats. PET_THROTTLE_BACKEND is 'redis'
+# (shared by all workers) or 'local' (per process). Off by default.
+PET_THROTTLING = False
+PET_THROTTLE_BACKEND = 'redis'
+PET_THROTTLE_RATES = {
+    'interact': {'capacity': 30, 'refill_per_second': 0.5},
+    'simulate_time': {'capacity': 300, 'refill_per_second': 1},
+    'check_stats': {'capacity': 200, 'refill_per_second': 2},
+}
+PET_SIMULATE_MAX_MINUTES = 24 * 60
+
+# Cache each owner's serialized pets (list and detail responses) for up to
+# PET_LIST_CACHE_TTL seconds. Any write to a pet or its owner invalidates them.
+# Off by default; with several workers it needs a shared CACHES backend.
+PET_LIST_CACHE = False
+PET_LIST_CACHE_TTL = 300
+
+# update_all_pets ticks PET_TICK_BATCH_SIZE pets per transaction under a Redis
+# lock held for PET_TICK_LOCK_TIMEOUT seconds past the last batch. Failed ticks
+# are retried by retry_failed_ticks up to PET_TICK_MAX_ATTEMPTS times.
+PET_TICK_BATCH_SIZE = 500
+PET_TICK_LOCK_TIMEOUT = 300
+PET_TICK_MAX_ATTEMPTS = 5
+
+# Exports read PET_EXPORT_CHUNK_SIZE rows at a time from a server-side cursor;
+# imports write PET_IMPORT_BATCH_SIZE rows per transaction
+PET_EXPORT_CHUNK_SIZE = 2000
+PET_IMPORT_BATCH_SIZE = 5000
+
+# The daily interaction rollups behind api/analytics/ count PET_ROLLUP_BATCH_SIZE
+# interactions per transaction, leaving the last PET_ROLLUP_LAG for the next run
+PET_ROLLUP_BATCH_SIZE = 10000
+PET_ROLLUP_LAG = timedelta(minutes=1)
+
+# Opt-in sampling profiler (see pet_api/profiling.py). Captures this fraction of
+# update_all_pets runs, Pet.update_stats calls and PetViewSet requests, sampling
+# the stack every PET_PROFILE_INTERVAL seconds. The newest PET_PROFILE_MAX_FILES
+# captures are kept in PET_PROFILE_DIR; summarise them with profile_summary.
+PET_PROFILING = False
+PET_PROFILE_SAMPLE_RATE = 0.01
+PET_PROFILE_INTERVAL = 0.005
+PET_PROFILE_DIR = BASE_DIR / 'profiles'
+PET_PROFILE_MAX_FILES = 200
+
 # Set up Celery to run this task periodically
-CELERY_BEAT_SCHEDULE = {
-    'update_pets_every_5_minutes': {
-        'task': 'pet_api.tasks.update_all_pets',
-        'schedule': timedelta(minutes=5),
-    },
+if PET_ADAPTIVE_SCHEDULER:
+    CELERY_BEAT_SCHEDULE = {
+        'process_due_pets_every_minute': {
+            'task': 'pet_api.tasks.process_due_pets',
+            'schedule': timedelta(minutes=1),
+        },
+    }
+else:
+    CELERY_BEAT_SCHEDULE = {
+        'update_pets_every_5_minutes': {
+            'task': 'pet_api.tasks.update_all_pets',
+            'schedule': timedelta(minutes=5),
+        },
+        'retry_failed_ticks_every_5_minutes': {
+            'task': 'pet_api.tasks.retry_failed_ticks',
+            'schedule': timedelta(minutes=5),
+        },
+    }
+CELERY_BEAT_SCHEDULE['archive_deceased_pets_daily'] = {
+    'task': 'pet_api.tasks.archive_deceased_pets',
+    'schedule': timedelta(days=1),
+}
+CELERY_BEAT_SCHEDULE['compact_pet_events_daily'] = {
+    'task': 'pet_api.tasks.compact_pet_events',
+    'schedule': timedelta(days=1),
+}
+CELERY_BEAT_SCHEDULE['rollup_interactions_every_10_minutes'] = {
+    'task': 'pet_api.tasks.rollup_interactions',
+    'schedule': timedelta(minutes=10),
 }
@@ -25,7 +25,7 @@ const PetDetail = () => {
   const [lastRefreshed, setLastRefreshed] = useState(null);
   
   // Use the shared WebSocket context
-  const { connected, relevantMessages, getPetCriticalWarnings, isDuplicateMessage } = useWebSocket();
+  const { connected, relevantMessages, getPetCriticalWarnings, isDuplicateMessage, subscribeToPet, unsubscribeFromPet } = useWebSocket();
   
   // Ref to store the interval ID for cleanup
   const refreshIntervalRef = useRef(null);
@@ -68,6 +68,13 @@ const PetDetail = () => {
     }
   }, [id]);
 
+  // This page only shows one pet, so only ask the server for that pet's updates
+  useEffect(() => {
+    const petId = parseInt(id, 10);
+    subscribeToPet(petId);
+    return () => unsubscribeFromPet(petId);
+  }, [id, subscribeToPet, unsubscribeFromPet]);
+
   // Update the WebSocket message handler
   useEffect(() => {
     if (relevantMessages && relevantMessages.length > 0 && pet) {
@@ -15,6 +15,8 @@ export const WebSocketProvider = ({ children }) => {
   // Add a new state to track processed message timestamps
   const [processedMessageTimestamps, setProcessedMessageTimestamps] = useState({});
   const socketRef = useRef(null);
+  // Pets this tab asked for; re-sent after a reconnect
+  const subscribedPetsRef = useRef(new Set());
   const reconnectAttemptsRef = useRef(0);
   const maxReconnectAttempts = 5;
   
@@ -42,6 +44,11 @@ export const WebSocketProvider = ({ children }) => {
       console.log('WebSocket connection established');
       setConnected(true);
       reconnectAttemptsRef.current = 0; // Reset counter on successful connection
+      
+      // Restore per-pet subscriptions from before the reconnect
+      subscribedPetsRef.current.forEach(petId => {
+        socket.send(JSON.stringify({ action: 'subscribe', pet_id: petId }));
+      });
     };
     
     socket.onmessage = (e) => {
@@ -50,6 +57,20 @@ export const WebSocketProvider = ({ children }) => {
         console.log('RAW WebSocket message received:', e.data);
         console.log('Parsed WebSocket message:', data);
         
+        // check_stats sends the warnings of all pets in one message; handle
+        // each pet's warnings as its own critical_stats update
+        if (data.type === 'pet_update' && data.update_type === 'critical_stats_batch') {
+          data.data.pets.forEach(entry => socket.onmessage({
+            data: JSON.stringify({
+              type: 'pet_update',
+              pet_id: entry.pet_id,
+              update_type: 'critical_stats',
+              data: { warnings: entry.warnings, timestamp: data.data.timestamp }
+            })
+          }));
+          return;
+        }
+        
         // Special handling for critical stats to ensure they always get processed
         if (data.type === 'pet_update' && data.update_type === 'critical_stats') {
           console.log('CRITICAL STATS UPDATE RECEIVED:', JSON.stringify(data));
@@ -192,6 +213,22 @@ export const WebSocketProvider = ({ children }) => {
     return false;
   };
   
+  // Only receive updates for the given pet on this connection
+  const subscribeToPet = useCallback((petId) => {
+    subscribedPetsRef.current.add(petId);
+    if (socketRef.current && socketRef.current.readyState === WebSocket.OPEN) {
+      socketRef.current.send(JSON.stringify({ action: 'subscribe', pet_id: petId }));
+    }
+  }, []);
+  
+  // Go back to updates for all of the owner's pets once nothing is subscribed
+  const unsubscribeFromPet = useCallback((petId) => {
+    subscribedPetsRef.current.delete(petId);
+    if (socketRef.current && socketRef.current.readyState === WebSocket.OPEN) {
+      socketRef.current.send(JSON.stringify({ action: 'unsubscribe', pet_id: petId }));
+    }
+  }, []);
+  
   // Clean up old processed message timestamps after a certain period
   useEffect(() => {
     const cleanupInterval = setInterval(() => {
@@ -299,6 +336,8 @@ export const WebSocketProvider = ({ children }) => {
       connected, 
       messages, // Keep original messages for reference
       sendMessage,
+      subscribeToPet,
+      unsubscribeFromPet,
       getPetCriticalWarnings,
       relevantMessages: getFilteredMessages(), // Only include current relevant messages
       latestMessages: messages.slice(-20), // Keep this for backward compatibility
@@ -33,6 +33,29 @@ api.interceptors.response.use(
   }
 );
 
+// Unique key for one user action; retries reuse it so the server applies the action once
+const newIdempotencyKey = () => (
+  window.crypto && window.crypto.randomUUID
+    ? window.crypto.randomUUID()
+    : `${Date.now()}-${Math.random().toString(36).slice(2)}`
+);
+
+// POST with an Idempotency-Key, retrying when the request never got a response
+const postIdempotent = async (url, data, retries = 2) => {
+  const headers = { 'Idempotency-Key': newIdempotencyKey() };
+  for (let attempt = 0; ; attempt++) {
+    try {
+      return await api.post(url, data, { headers });
+    } catch (error) {
+      if (error.response || attempt >= retries) {
+        throw error;
+      }
+      console.log(`Retrying ${url} after network error (attempt ${attempt + 1})`);
+      await new Promise(resolve => setTimeout(resolve, 500 * (attempt + 1)));
+    }
+  }
+};
+
 // Helper function to validate pet data - ensures data consistency
 const validatePetData = (petData) => {
   // Basic validation
@@ -113,7 +136,7 @@ export const createPet = async (petData) => {
 
 export const interactWithPet = async (petId, action) => {
   try {
-    const response = await api.post(`/pets/${petId}/interact/`, { action });
+    const response = await postIdempotent(`/pets/${petId}/interact/`, { action });
     const validatedPet = validatePetData(response.data);
     
     if (!validatedPet) {
@@ -129,7 +152,7 @@ export const interactWithPet = async (petId, action) => {
 
 export const simulateTime = async (petId, minutes = 5) => {
   try {
-    const response = await api.post(`/pets/${petId}/simulate_time/`, { minutes });
+    const response = await postIdempotent(`/pets/${petId}/simulate_time/`, { minutes });
     const validatedPet = validatePetData(response.data);
     
     if (!validatedPet) {